@@ -1 +1,4 @@
-from .app import run_app
+def run_app(*args, **kwargs):
+    # 延迟导入界面，进程池的子进程导入app包下的模块时不会加载Qt应用
+    from .app import run_app as _run_app
+    return _run_app(*args, **kwargs)
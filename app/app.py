@@ -6,6 +6,7 @@ import qtmodern.styles
 from PyQt5.Qt import QApplication
 from hbutils.model import int_enum_loads
 
+from .config import AUTOSAVE_DIR, DIAGRAM_CACHE_DIR, EXPORT_CACHE_DIR
 from .widget import AppMainWindow
 
 
@@ -35,7 +36,8 @@ def run_app(argv=None, theme: Union[str, AppTheme] = 'nothing'):
     app = QApplication(argv or sys.argv)
     AppTheme.loads(theme)(app)
 
-    main_window = AppMainWindow()
+    main_window = AppMainWindow(autosave_dir=AUTOSAVE_DIR, export_cache_dir=EXPORT_CACHE_DIR,
+                                diagram_cache_dir=DIAGRAM_CACHE_DIR)
     main_window.show()
 
     sys.exit(app.exec_())
@@ -0,0 +1,64 @@
+import os
+import sys
+
+import click
+
+from .config import DIAGRAM_CACHE_DIR, EXPORT_CACHE_DIR
+from .utils.batch_convert import OUTPUT_SUFFIXES, ConvertResult, plan_tasks, run_tasks
+
+CONTEXT_SETTINGS = dict(help_option_names=['-h', '--help'])
+
+
+@click.group(context_settings=CONTEXT_SETTINGS, invoke_without_command=True)
+@click.option('--theme', type=click.Choice(['nothing', 'light', 'dark'], case_sensitive=False), default='nothing',
+              show_default=True, help='Theme of the GUI.')
+@click.pass_context
+def cli(ctx: click.Context, theme: str):
+    """
+    State chart editor. Launches the GUI when no command is given.
+    """
+    if ctx.invoked_subcommand is None:
+        # 只有启动界面时才导入Qt应用相关的模块
+        from .app import run_app
+        run_app(sys.argv[:1], theme=theme)
+
+
+@cli.command('batch', context_settings=CONTEXT_SETTINGS)
+@click.argument('inputs', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('-o', '--output-dir', type=click.Path(file_okay=False), default=None,
+              help='Directory of the outputs, next to the inputs by default.')
+@click.option('-f', '--format', 'formats', type=click.Choice(list(OUTPUT_SUFFIXES)), multiple=True,
+              help='Output formats, can be given multiple times. All formats by default.')
+@click.option('-r', '--recursive', is_flag=True, default=False, help='Search input directories recursively.')
+@click.option('-j', '--jobs', type=click.IntRange(min=1), default=None,
+              help='Number of worker processes, the number of CPUs by default.')
+@click.option('--force', is_flag=True, default=False, help='Convert even if the outputs are newer than the inputs.')
+@click.option('--cache-dir', type=click.Path(file_okay=False), default=EXPORT_CACHE_DIR, show_default=True,
+              help='Cache of exported documents and graphs, keyed by the structure of the state chart.')
+@click.option('--diagram-cache-dir', type=click.Path(file_okay=False), default=DIAGRAM_CACHE_DIR, show_default=True,
+              help='Cache of rendered graphs, keyed by the PlantUML source.')
+@click.option('--no-cache', is_flag=True, default=False, help='Do not use the export and graph caches.')
+def batch(inputs, output_dir, formats, recursive, jobs, force, cache_dir, diagram_cache_dir, no_cache):
+    """
+    Convert state chart JSON files (or directories of them) to docx/xlsx/puml/png without the GUI.
+
+    Outputs newer than their inputs are skipped. The exit code is 1 if any output failed.
+    """
+    tasks, skipped = plan_tasks(inputs, output_dir, formats or list(OUTPUT_SUFFIXES),
+                                recursive=recursive, force=force)
+    click.echo(f'{sum(len(targets) for _, targets in tasks)} output(s) to convert, '
+               f'{len(skipped)} up to date.', err=True)
+
+    def on_result(result: ConvertResult):
+        if result.status == ConvertResult.FAILED:
+            click.secho(f'FAILED     {result.output_path}: {result.message}', fg='red', err=True)
+        else:
+            click.echo(f'converted  {os.path.relpath(result.output_path)}{" (cached)" if result.cached else ""}',
+                       err=True)
+
+    results = run_tasks(tasks, jobs=jobs, on_result=on_result, cache_dir=None if no_cache else cache_dir,
+                        diagram_cache_dir=None if no_cache else diagram_cache_dir)
+    failed = [result for result in results if result.status == ConvertResult.FAILED]
+    click.echo(f'{len(results) - len(failed)} converted, {len(skipped)} skipped, {len(failed)} failed.', err=True)
+    if failed:
+        sys.exit(1)
@@ -1 +1,2 @@
-from .meta import PLANTUML_JAR_PATH
\ No newline at end of file
+from .meta import PLANTUML_JAR_PATH, AUTOSAVE_DIR, EXPORT_CACHE_DIR, EXPORT_CACHE_MAX_BYTES, DIAGRAM_CACHE_DIR, \
+    DIAGRAM_CACHE_MAX_BYTES, WORD_EXPORT_WORKERS
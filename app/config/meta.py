@@ -2,6 +2,7 @@
 Overview:
     Meta information for app package.
 """
+import os
 
 #: Title of this project (should be `app`).
 __TITLE__ = "pyqt5-demo"
@@ -18,4 +19,19 @@ __AUTHOR__ = "HansBug"
 #: Email of the authors'.
 __AUTHOR_EMAIL__ = "hansbug@buaa.edu.cn"
 
-PLANTUML_JAR_PATH = "app/resources/plantuml.jar"
\ No newline at end of file
+PLANTUML_JAR_PATH = "app/resources/plantuml.jar"
+
+#: 自动保存的快照和修改日志所在的目录
+AUTOSAVE_DIR = os.path.join(os.path.expanduser('~'), '.fcstm_ui', 'autosave')
+
+#: 导出的文档的缓存目录和容量上限（字节）
+EXPORT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.fcstm_ui', 'export_cache')
+EXPORT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+#: 渲染的状态机图的缓存目录和容量上限（字节）
+DIAGRAM_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.fcstm_ui', 'diagram_cache')
+DIAGRAM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+#: 导出Word文档时生成状态详细信息表的进程数，为None时在导出线程中生成。
+#: 生成表格只占导出时间的一小部分，实测进程池在各种规模下都比串行更慢，因此默认不使用
+WORD_EXPORT_WORKERS = None
@@ -1 +1,4 @@
-from .create_formLayout_dialog import create_formlayout_dialog
\ No newline at end of file
+def create_formlayout_dialog(*args, **kwargs):
+    # 延迟导入Qt控件，进程池的子进程导入app.utils下的转换模块时不会加载PyQt5
+    from .create_formLayout_dialog import create_formlayout_dialog as _create_formlayout_dialog
+    return _create_formlayout_dialog(*args, **kwargs)
@@ -0,0 +1,26 @@
+import os
+import uuid
+from contextlib import contextmanager
+from typing import Iterator
+
+
+@contextmanager
+def atomic_write(file_path: str) -> Iterator[str]:
+    """
+    原子地写入文件
+
+    产生与目标文件在同一目录下的临时文件路径（文件由调用者创建），写入代码正常结束后将临时文件落盘并替换目标文件；
+    写入过程中抛出异常（包括取消）时删除临时文件，目标文件保持原样，不会留下写了一半的文件。
+    """
+    directory, file_name = os.path.split(os.path.abspath(file_path))
+    # 保留原来的后缀，部分写入函数根据后缀判断格式
+    temp_path = os.path.join(directory, f'.{file_name}.{uuid.uuid4().hex}{os.path.splitext(file_name)[1]}')
+    try:
+        yield temp_path
+        with open(temp_path, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,200 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from pyfcstm.model import Statechart
+
+from app.config import DIAGRAM_CACHE_MAX_BYTES, EXPORT_CACHE_MAX_BYTES
+from .atomic_write import atomic_write
+from .binary_statechart import FILE_SUFFIX as BINARY_SUFFIX, BinaryStatechartReader, is_binary_statechart
+from .diagram_cache import DiagramCache
+from .export_cache import ExportCache, statechart_hash
+from .export_to_excel import export_statechart_to_excel
+from .export_to_word import export_statechart_to_word
+from .show_state_graph import ShowStateGraph
+from .streaming_json import read_statechart_streaming
+
+#: 输出格式: 文件后缀
+OUTPUT_SUFFIXES: Dict[str, str] = {
+    'docx': '.docx',
+    'xlsx': '.xlsx',
+    'puml': '.puml',
+    'png': '.png',
+}
+#: 目录中作为输入的文件后缀
+INPUT_SUFFIXES = ('.json', BINARY_SUFFIX)
+
+#: 一个输入文件的转换任务：(输入文件, [(输出格式, 输出文件), ...])
+ConvertTask = Tuple[str, List[Tuple[str, str]]]
+
+
+class ConvertResult:
+    """一个输出文件的转换结果，status为 'converted' / 'skipped' / 'failed'，cached表示从导出缓存中复制"""
+    CONVERTED = 'converted'
+    SKIPPED = 'skipped'
+    FAILED = 'failed'
+
+    def __init__(self, input_path: str, output_path: str, status: str, message: str = '', cached: bool = False):
+        self.input_path = input_path
+        self.output_path = output_path
+        self.status = status
+        self.message = message
+        self.cached = cached
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.status} {self.output_path!r}>'
+
+
+def is_up_to_date(input_path: str, output_path: str) -> bool:
+    """输出文件存在且比输入文件新"""
+    try:
+        return os.path.getmtime(output_path) > os.path.getmtime(input_path)
+    except OSError:
+        return False
+
+
+def _iter_input_files(inputs: Iterable[str], recursive: bool) -> Iterator[Tuple[str, str]]:
+    """产生 (输入文件, 相对于输出目录的文件名主干)，目录中的文件保留子目录结构"""
+    for input_path in inputs:
+        if not os.path.isdir(input_path):
+            yield input_path, os.path.splitext(os.path.basename(input_path))[0]
+            continue
+        for dir_path, dir_names, file_names in os.walk(input_path):
+            dir_names.sort()
+            if not recursive:
+                dir_names.clear()
+            for file_name in sorted(file_names):
+                if os.path.splitext(file_name)[1].lower() in INPUT_SUFFIXES:
+                    file_path = os.path.join(dir_path, file_name)
+                    yield file_path, os.path.splitext(os.path.relpath(file_path, input_path))[0]
+
+
+def plan_tasks(inputs: Iterable[str], output_dir: Optional[str], formats: Sequence[str],
+               recursive: bool = False, force: bool = False) -> Tuple[List[ConvertTask], List[ConvertResult]]:
+    """
+    确定需要生成的输出文件
+
+    输出文件默认与输入文件放在一起；指定output_dir时放入该目录，输入目录中的子目录结构保持不变。
+    比输入文件新的输出文件直接跳过（force为True时除外），返回 (待转换的任务, 跳过的结果)。
+    """
+    tasks: List[ConvertTask] = []
+    skipped: List[ConvertResult] = []
+    for input_path, stem in _iter_input_files(inputs, recursive):
+        if output_dir is None:
+            output_stem = os.path.splitext(input_path)[0]
+        else:
+            output_stem = os.path.join(output_dir, stem)
+        targets = []
+        for output_format in formats:
+            output_path = output_stem + OUTPUT_SUFFIXES[output_format]
+            if not force and is_up_to_date(input_path, output_path):
+                skipped.append(ConvertResult(input_path, output_path, ConvertResult.SKIPPED))
+            else:
+                targets.append((output_format, output_path))
+        if targets:
+            tasks.append((input_path, targets))
+    return tasks, skipped
+
+
+def load_statechart(file_path: str) -> Statechart:
+    """读取JSON或二进制状态机文件"""
+    if is_binary_statechart(file_path):
+        with BinaryStatechartReader(file_path) as reader:
+            return reader.to_statechart()
+    state_chart, _ = read_statechart_streaming(file_path)
+    return state_chart
+
+
+def _write_output(state_chart: Statechart, output_format: str, file_path: str,
+                  plantuml_code: Callable[[], str], diagram_cache: Optional[DiagramCache]):
+    if output_format == 'docx':
+        # 已经在进程池中按文件并行，单个文件不再使用进程池
+        if not export_statechart_to_word(state_chart, file_path):
+            raise RuntimeError("导出Word文档时发生错误")
+    elif output_format == 'xlsx':
+        if not export_statechart_to_excel(state_chart, file_path):
+            raise RuntimeError("导出Excel文档时发生错误")
+    elif output_format == 'puml':
+        with open(file_path, 'w', encoding='utf-8') as f:
+            f.write(plantuml_code())
+    elif output_format == 'png':
+        ShowStateGraph.dump_png(plantuml_code(), file_path, cache=diagram_cache)
+    else:
+        raise ValueError(f"未知的输出格式：{output_format!r}")
+
+
+def convert_file(task: ConvertTask, cache_dir: Optional[str] = None, diagram_cache_dir: Optional[str] = None,
+                 diagram_cache_max_bytes: int = DIAGRAM_CACHE_MAX_BYTES,
+                 cache_max_bytes: int = EXPORT_CACHE_MAX_BYTES) -> List[ConvertResult]:
+    """
+    转换一个输入文件，在进程池中执行
+
+    输入文件只读取一次，PlantUML代码最多生成一次；每个输出文件原子地写入，失败的输出不影响其他输出。
+    指定cache_dir时按状态机的结构哈希使用 :class:`ExportCache`，内容没有变化的文档直接从缓存复制；
+    指定diagram_cache_dir时状态机图按PlantUML代码缓存在 :class:`DiagramCache` 中。
+    """
+    input_path, targets = task
+    try:
+        state_chart = load_statechart(input_path)
+    except Exception as e:
+        return [ConvertResult(input_path, output_path, ConvertResult.FAILED, f"读取失败：{e}")
+                for _, output_path in targets]
+
+    cache = ExportCache(cache_dir, cache_max_bytes) if cache_dir is not None else None
+    digest = statechart_hash(state_chart) if cache is not None else None
+    diagram_cache = DiagramCache(diagram_cache_dir, diagram_cache_max_bytes) \
+        if diagram_cache_dir is not None else None
+    plantuml_codes = []
+
+    def plantuml_code() -> str:
+        if not plantuml_codes:
+            plantuml_codes.append(ShowStateGraph.generate_plantuml_statechart(state_chart))
+        return plantuml_codes[0]
+
+    results = []
+    for output_format, output_path in targets:
+        def exporter(state_chart_: Statechart, file_path: str):
+            _write_output(state_chart_, output_format, file_path, plantuml_code, diagram_cache)
+
+        suffix = OUTPUT_SUFFIXES[output_format]
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+            with atomic_write(output_path) as temp_path:
+                if cache is not None and cache.is_cacheable(suffix):
+                    cached = cache.export(state_chart, suffix, temp_path, exporter, digest=digest)
+                else:
+                    exporter(state_chart, temp_path)
+                    cached = False
+        except Exception as e:
+            results.append(ConvertResult(input_path, output_path, ConvertResult.FAILED, str(e)))
+        else:
+            results.append(ConvertResult(input_path, output_path, ConvertResult.CONVERTED, cached=cached))
+    return results
+
+
+def run_tasks(tasks: Sequence[ConvertTask], jobs: Optional[int] = None,
+              on_result: Optional[Callable[[ConvertResult], None]] = None,
+              cache_dir: Optional[str] = None, diagram_cache_dir: Optional[str] = None) -> List[ConvertResult]:
+    """
+    将各个输入文件分配到进程池中转换，按完成顺序调用on_result
+
+    jobs为1时在当前进程中依次转换。缓存目录可以由多个进程共享。
+    """
+    results = []
+
+    def _collect(file_results: List[ConvertResult]):
+        for result in file_results:
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+    if jobs == 1 or len(tasks) <= 1:
+        for task in tasks:
+            _collect(convert_file(task, cache_dir, diagram_cache_dir))
+        return results
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(convert_file, task, cache_dir, diagram_cache_dir) for task in tasks]
+        for future in as_completed(futures):
+            _collect(future.result())
+    return results
@@ -0,0 +1,368 @@
+import mmap
+import struct
+from typing import Dict, Iterable, List, Optional, Set
+
+from pyfcstm.model import CompositeState, Event, NormalState, PseudoState, State, Statechart, Transition
+
+#: 文件头：魔数, 版本, 保留, 字符串数, 状态数, 顶层状态数, 事件数, 迁移数, 前言行数, 状态机名称, 根状态,
+#: 以及字符串偏移表、字符串数据、状态、事件、迁移、前言各段在文件中的偏移
+_HEADER = struct.Struct('<8sHHIIIIIIIi6Q')
+#: 状态记录：id, 名称, 类型, 描述, on_entry, on_during, on_exit, 最小/最大时间锁, 父状态, 初始子状态, 第一个子状态, 子状态数量
+_STATE = struct.Struct('<IIB3xIIIIqqiiII')
+#: 事件记录：id, 名称, 产生条件
+_EVENT = struct.Struct('<III')
+#: 迁移记录：源状态, 目标状态, 事件，均为记录下标，-1表示不存在
+_TRANSITION = struct.Struct('<iii')
+_U32 = struct.Struct('<I')
+_U64 = struct.Struct('<Q')
+
+MAGIC = b'FCSTMBIN'
+VERSION = 1
+FILE_SUFFIX = '.fcstmb'
+
+_NO_STRING = 0xFFFFFFFF
+_NO_INT = -2 ** 63
+_NO_INDEX = -1
+
+_STATE_TYPES = [NormalState, CompositeState, PseudoState]
+
+
+def is_binary_statechart(file_path: str) -> bool:
+    """根据文件头判断是否为二进制状态机文件"""
+    try:
+        with open(file_path, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+class _StringTable:
+    """写入时对字符串去重，每个不同的字符串只保存一次"""
+
+    def __init__(self):
+        self.d_string_index: Dict[str, int] = {}
+        self.strings: List[bytes] = []
+
+    def intern(self, value: Optional[str]) -> int:
+        if value is None:
+            return _NO_STRING
+        index = self.d_string_index.get(value, None)
+        if index is None:
+            index = len(self.strings)
+            self.d_string_index[value] = index
+            self.strings.append(value.encode('utf-8'))
+        return index
+
+
+def _ordered_states(state_chart: Statechart) -> List[State]:
+    """按层次遍历排列状态：顶层状态在最前面，同一复合状态的子状态连续存放"""
+    child_ids: Set[str] = set()
+    for state in state_chart.states:
+        if isinstance(state, CompositeState):
+            child_ids.update(child_state.id for child_state in state.states)
+    ordered = [state for state in state_chart.states if state.id not in child_ids]
+    visited = {state.id for state in ordered}
+    index = 0
+    while index < len(ordered):
+        state = ordered[index]
+        index += 1
+        if isinstance(state, CompositeState):
+            for child_state in state.states:
+                if child_state.id not in visited:
+                    visited.add(child_state.id)
+                    ordered.append(child_state)
+    return ordered
+
+
+def _int_or_none(value: Optional[int]) -> int:
+    return _NO_INT if value is None else int(value)
+
+
+def write_binary_statechart(state_chart: Statechart, file_path: str):
+    """将状态机保存为二进制格式"""
+    strings = _StringTable()
+    states = _ordered_states(state_chart)
+    d_id_index = {state.id: index for index, state in enumerate(states)}
+    events = list(state_chart.events)
+    d_event_id_index = {event.id: index for index, event in enumerate(events)}
+    top_level_count = len(states) - sum(len(state.states) for state in states if isinstance(state, CompositeState))
+
+    state_records = bytearray()
+    parent_indexes = [_NO_INDEX] * len(states)
+    first_children = [0] * len(states)
+    for index, state in enumerate(states):
+        if isinstance(state, CompositeState):
+            children = [d_id_index[child_state.id] for child_state in state.states]
+            first_children[index] = children[0] if children else 0
+            for child_index in children:
+                parent_indexes[child_index] = index
+    for index, state in enumerate(states):
+        initial_index = _NO_INDEX
+        child_count = 0
+        if isinstance(state, CompositeState):
+            child_count = len(state.states)
+            initial_index = d_id_index.get(state.initial_state_id, _NO_INDEX)
+        state_records += _STATE.pack(
+            strings.intern(state.id), strings.intern(state.name), _STATE_TYPES.index(type(state)),
+            strings.intern(state.description), strings.intern(state.on_entry), strings.intern(state.on_during),
+            strings.intern(state.on_exit), _int_or_none(state.min_time_lock), _int_or_none(state.max_time_lock),
+            parent_indexes[index], initial_index, first_children[index], child_count,
+        )
+
+    event_records = bytearray()
+    for event in events:
+        event_records += _EVENT.pack(strings.intern(event.id), strings.intern(event.name), strings.intern(event.guard))
+
+    transition_records = bytearray()
+    transition_count = 0
+    for transition in state_chart.transitions:
+        transition_records += _TRANSITION.pack(
+            d_id_index.get(transition.src_state_id, _NO_INDEX),
+            d_id_index.get(transition.dst_state_id, _NO_INDEX),
+            d_event_id_index.get(transition.event_id, _NO_INDEX),
+        )
+        transition_count += 1
+
+    preamble = list(state_chart.preamble or [])
+    preamble_records = b''.join(_U32.pack(strings.intern(line)) for line in preamble)
+    name_sid = strings.intern(state_chart.name)
+    if state_chart.root_state_id not in d_id_index:
+        raise ValueError(f"根状态 {state_chart.root_state_id!r} 不在状态机的状态中")
+    root_index = d_id_index[state_chart.root_state_id]
+
+    string_offsets = bytearray()
+    offset = 0
+    for data in strings.strings:
+        string_offsets += _U64.pack(offset)
+        offset += len(data)
+    string_offsets += _U64.pack(offset)
+
+    sections = [bytes(string_offsets), b''.join(strings.strings), bytes(state_records), bytes(event_records),
+                bytes(transition_records), preamble_records]
+    section_offsets = []
+    offset = _HEADER.size
+    for section in sections:
+        section_offsets.append(offset)
+        offset += len(section)
+    header = _HEADER.pack(MAGIC, VERSION, 0, len(strings.strings), len(states), top_level_count, len(events),
+                          transition_count, len(preamble), name_sid, root_index, *section_offsets)
+    with open(file_path, 'wb') as f:
+        f.write(header)
+        for section in sections:
+            f.write(section)
+
+
+class StateRecord:
+    """二进制文件中的一条状态记录，字符串按需从字符串表中读取"""
+    __slots__ = ('index', 'id_sid', 'name_sid', 'type_index', 'description_sid', 'on_entry_sid', 'on_during_sid',
+                 'on_exit_sid', 'min_time_lock', 'max_time_lock', 'parent_index', 'initial_index', 'first_child',
+                 'child_count')
+
+    def __init__(self, index: int, values):
+        self.index = index
+        (self.id_sid, self.name_sid, self.type_index, self.description_sid, self.on_entry_sid, self.on_during_sid,
+         self.on_exit_sid, self.min_time_lock, self.max_time_lock, self.parent_index, self.initial_index,
+         self.first_child, self.child_count) = values
+
+    @property
+    def is_composite(self) -> bool:
+        return _STATE_TYPES[self.type_index] is CompositeState
+
+    @property
+    def child_indexes(self) -> range:
+        return range(self.first_child, self.first_child + self.child_count)
+
+
+class BinaryStatechartReader:
+    """
+    通过mmap读取二进制状态机文件
+
+    打开文件只读取文件头，状态、事件、迁移记录和字符串都在访问时才解码，解码后的字符串会被缓存。
+    """
+
+    def __init__(self, file_path: str):
+        self._file = open(file_path, 'rb')
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        if len(self._mm) < _HEADER.size:
+            self.close()
+            raise ValueError("不是有效的二进制状态机文件")
+        (magic, version, _, self.string_count, self.state_count, self.top_level_count, self.event_count,
+         self.transition_count, self.preamble_count, self._name_sid, self.root_index, self._string_offsets_offset,
+         self._string_data_offset, self._states_offset, self._events_offset, self._transitions_offset,
+         self._preamble_offset) = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("不是有效的二进制状态机文件")
+        if version != VERSION:
+            self.close()
+            raise ValueError(f"不支持的二进制状态机文件版本：{version}")
+        self._strings: List[Optional[str]] = [None] * self.string_count
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def string(self, sid: int) -> Optional[str]:
+        if sid == _NO_STRING:
+            return None
+        value = self._strings[sid]
+        if value is None:
+            start, = _U64.unpack_from(self._mm, self._string_offsets_offset + sid * _U64.size)
+            end, = _U64.unpack_from(self._mm, self._string_offsets_offset + (sid + 1) * _U64.size)
+            value = self._mm[self._string_data_offset + start:self._string_data_offset + end].decode('utf-8')
+            self._strings[sid] = value
+        return value
+
+    @property
+    def name(self) -> str:
+        return self.string(self._name_sid)
+
+    @property
+    def preamble(self) -> List[str]:
+        return [self.string(_U32.unpack_from(self._mm, self._preamble_offset + index * _U32.size)[0])
+                for index in range(self.preamble_count)]
+
+    def state_record(self, index: int) -> StateRecord:
+        return StateRecord(index, _STATE.unpack_from(self._mm, self._states_offset + index * _STATE.size))
+
+    def state_id(self, index: int) -> str:
+        id_sid, = _U32.unpack_from(self._mm, self._states_offset + index * _STATE.size)
+        return self.string(id_sid)
+
+    def top_level_state_indexes(self) -> range:
+        return range(self.top_level_count)
+
+    def event_record(self, index: int):
+        """返回 (id, 名称, 产生条件)"""
+        return tuple(map(self.string, _EVENT.unpack_from(self._mm, self._events_offset + index * _EVENT.size)))
+
+    def transition_record(self, index: int):
+        """返回 (源状态下标, 目标状态下标, 事件下标)"""
+        return _TRANSITION.unpack_from(self._mm, self._transitions_offset + index * _TRANSITION.size)
+
+    def decode_state(self, record: StateRecord) -> State:
+        """将状态记录解码为状态对象，复合状态的子状态不会被解码"""
+        state_type = _STATE_TYPES[record.type_index]
+        return state_type(
+            name=self.string(record.name_sid),
+            description=self.string(record.description_sid),
+            min_time_lock=None if record.min_time_lock == _NO_INT else record.min_time_lock,
+            max_time_lock=None if record.max_time_lock == _NO_INT else record.max_time_lock,
+            on_entry=self.string(record.on_entry_sid),
+            on_during=self.string(record.on_during_sid),
+            on_exit=self.string(record.on_exit_sid),
+            id_=self.string(record.id_sid),
+        )
+
+    def to_statechart(self) -> Statechart:
+        """解码整个文件"""
+        if self.root_index == _NO_INDEX:
+            raise ValueError("二进制状态机文件中没有根状态")
+        records = [self.state_record(index) for index in range(self.state_count)]
+        states = [self.decode_state(record) for record in records]
+        for record, state in zip(records, states):
+            if record.is_composite:
+                for child_index in record.child_indexes:
+                    state.states.add(states[child_index])
+                if record.initial_index != _NO_INDEX:
+                    state.initial_state = states[record.initial_index]
+        state_chart = Statechart(name=self.name, root_state=states[self.root_index], states=states)
+        events = []
+        for index in range(self.event_count):
+            event_id, event_name, event_guard = self.event_record(index)
+            event = Event(event_name, event_guard, id_=event_id)
+            state_chart.events.add(event)
+            events.append(event)
+        for index in range(self.transition_count):
+            src_index, dst_index, event_index = self.transition_record(index)
+            state_chart.transitions.add(Transition(
+                states[src_index] if src_index != _NO_INDEX else None,
+                states[dst_index] if dst_index != _NO_INDEX else None,
+                events[event_index] if event_index != _NO_INDEX else None,
+            ))
+        preamble = self.preamble
+        if preamble:
+            state_chart.preamble = preamble
+        return state_chart
+
+
+def read_binary_statechart(file_path: str) -> Statechart:
+    with BinaryStatechartReader(file_path) as reader:
+        return reader.to_statechart()
+
+
+class BinaryStatechartView:
+    """
+    二进制状态机文件的只读层次结构视图，可以直接作为 :class:`StateTreeModel` 的数据源
+
+    只有被访问到的状态才会被解码，展开节点时才读取其子状态的记录。
+    """
+    revision = 0
+
+    def __init__(self, reader: BinaryStatechartReader):
+        self.reader = reader
+        self.d_id_index: Dict[str, int] = {}  # 已经访问过的状态id: 记录下标
+        self._d_index_state: Dict[int, State] = {}
+
+    def _state_ids(self, indexes: Iterable[int]) -> List[str]:
+        state_ids = []
+        for index in indexes:
+            state_id = self.reader.state_id(index)
+            self.d_id_index[state_id] = index
+            state_ids.append(state_id)
+        return state_ids
+
+    def child_state_ids(self, state_id: Optional[str]) -> List[str]:
+        if state_id is None:
+            return self._state_ids(self.reader.top_level_state_indexes())
+        index = self.d_id_index.get(state_id, None)
+        if index is None:
+            return []
+        return self._state_ids(self.reader.state_record(index).child_indexes)
+
+    def has_child_states(self, state_id: Optional[str]) -> bool:
+        if state_id is None:
+            return self.reader.top_level_count > 0
+        index = self.d_id_index.get(state_id, None)
+        return index is not None and self.reader.state_record(index).child_count > 0
+
+    def father_state_id(self, state_id: str) -> Optional[str]:
+        index = self.d_id_index.get(state_id, None)
+        if index is None:
+            return None
+        parent_index = self.reader.state_record(index).parent_index
+        return None if parent_index == _NO_INDEX else self._state_ids([parent_index])[0]
+
+    def get_state(self, state_id: str) -> Optional[State]:
+        index = self.d_id_index.get(state_id, None)
+        if index is None:
+            return None
+        state = self._d_index_state.get(index, None)
+        if state is None:
+            state = self.reader.decode_state(self.reader.state_record(index))
+            self._d_index_state[index] = state
+        return state
+
+    def is_initial_state(self, state: State) -> bool:
+        index = self.d_id_index.get(state.id, None)
+        if index is None:
+            return False
+        parent_index = self.reader.state_record(index).parent_index
+        if parent_index == _NO_INDEX:
+            return index == self.reader.root_index
+        return self.reader.state_record(parent_index).initial_index == index
+
+    def changed_subtrees_since(self, revision: int) -> Set[Optional[str]]:
+        return set()
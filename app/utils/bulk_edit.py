@@ -0,0 +1,171 @@
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from pyfcstm.model import CompositeState, Event, State, Transition
+
+from .transition_index import TransitionKey
+from .undo_history import AddEventDelta, AddStateDelta, AddTransitionDelta
+
+if TYPE_CHECKING:
+    from .fcstm_state_chart import FcstmStateChart
+
+StateRef = Union[State, str]
+EventRef = Union[Event, str]
+
+
+class BulkConflict:
+    """批量修改中无法应用的一项"""
+
+    def __init__(self, kind: str, index: int, item, reason: str):
+        self.kind = kind  # 'state' / 'event' / 'transition'
+        self.index = index  # 在对应输入列表中的位置
+        self.item = item
+        self.reason = reason
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.kind}[{self.index}]: {self.reason}>'
+
+
+class BulkEditReport:
+    """批量修改的结果，``committed`` 为False时状态机没有任何修改"""
+
+    def __init__(self):
+        self.conflicts: List[BulkConflict] = []
+        self.added_states: List[State] = []
+        self.added_events: List[Event] = []
+        self.added_transitions: List[Transition] = []
+        self.committed = False
+
+    def __bool__(self):
+        return not self.conflicts
+
+    def __repr__(self):
+        return (f'<{type(self).__name__} committed={self.committed}, states={len(self.added_states)}, '
+                f'events={len(self.added_events)}, transitions={len(self.added_transitions)}, '
+                f'conflicts={len(self.conflicts)}>')
+
+
+class _NameIndex:
+    """按名称查找对象，名称重复时查找结果为不唯一"""
+
+    def __init__(self, objs: Iterable = ()):
+        self._d_name_obj: Dict[str, object] = {}
+        self._ambiguous_names: Set[str] = set()
+        for obj in objs:
+            self.add(obj)
+
+    def add(self, obj):
+        if obj.name in self._d_name_obj:
+            self._ambiguous_names.add(obj.name)
+        self._d_name_obj[obj.name] = obj
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._d_name_obj
+
+    def lookup(self, name: str) -> Tuple[Optional[object], Optional[str]]:
+        """返回 (对象, 错误信息)"""
+        if name in self._ambiguous_names:
+            return None, f"名称 '{name}' 不唯一"
+        obj = self._d_name_obj.get(name, None)
+        if obj is None:
+            return None, f"'{name}' 不存在"
+        return obj, None
+
+
+def bulk_add(fcstm_state_chart: 'FcstmStateChart',
+             states: Iterable[Tuple[Optional[StateRef], State]] = (),
+             events: Iterable[Tuple[str, str]] = (),
+             transitions: Iterable[Tuple[StateRef, StateRef, EventRef]] = (),
+             atomic: bool = True) -> BulkEditReport:
+    """
+    批量添加状态、事件和迁移
+
+    所有输入先通过索引一次性检查，冲突记录在返回的报告中而不是弹出对话框。
+    ``atomic`` 为True时只要存在冲突就不做任何修改，否则跳过冲突项、应用其余部分。
+    修改在一个 ``batch`` 中完成：只刷新一次树和表格，并作为一步撤销。
+
+    :param states: [(父状态或父状态名称，None表示顶层状态, 新状态), ...]，父状态可以是同一批中较早添加的状态
+    :param events: [(事件名称, 事件产生条件), ...]
+    :param transitions: [(源状态, 目标状态, 事件), ...]，均可以用名称表示，可以引用同一批中添加的状态和事件
+    """
+    report = BulkEditReport()
+    state_names = _NameIndex(fcstm_state_chart.state_chart.states)
+    event_names = _NameIndex(fcstm_state_chart.state_chart.events)
+    state_ids = set(fcstm_state_chart.d_id_state)
+
+    new_states: List[Tuple[Optional[CompositeState], State]] = []
+    for index, (father_ref, new_state) in enumerate(states):
+        father_state = None
+        if father_ref is not None:
+            father_state, error = _resolve(father_ref, state_names, state_ids)
+            if error is None and not isinstance(father_state, CompositeState):
+                error = "只有composite类型能拥有子状态"
+            if error is not None:
+                report.conflicts.append(BulkConflict('state', index, (father_ref, new_state), error))
+                continue
+        if new_state.id in state_ids:
+            report.conflicts.append(BulkConflict('state', index, (father_ref, new_state), "状态已经存在"))
+            continue
+        state_ids.add(new_state.id)
+        state_names.add(new_state)
+        new_states.append((father_state, new_state))
+
+    new_events: List[Event] = []
+    for index, (event_name, event_guard) in enumerate(events):
+        if not event_name:
+            report.conflicts.append(BulkConflict('event', index, (event_name, event_guard), "事件名称不能为空"))
+            continue
+        if event_name in event_names:
+            report.conflicts.append(BulkConflict('event', index, (event_name, event_guard), "事件名称已经存在"))
+            continue
+        new_event = Event(event_name, event_guard)
+        event_names.add(new_event)
+        new_events.append(new_event)
+
+    event_ids = set(fcstm_state_chart.d_id_event) | {event.id for event in new_events}
+    transition_keys: Set[TransitionKey] = set()
+    new_transitions: List[Tuple[State, State, Event]] = []
+    for index, (src_ref, dst_ref, event_ref) in enumerate(transitions):
+        src_state, error = _resolve(src_ref, state_names, state_ids)
+        if error is None:
+            dst_state, error = _resolve(dst_ref, state_names, state_ids)
+        if error is None:
+            event, error = _resolve(event_ref, event_names, event_ids)
+        if error is None:
+            key = (src_state.id, dst_state.id, event.id)
+            if key in fcstm_state_chart.transition_index or key in transition_keys:
+                error = "迁移已经存在"
+            else:
+                transition_keys.add(key)
+        if error is not None:
+            report.conflicts.append(BulkConflict('transition', index, (src_ref, dst_ref, event_ref), error))
+            continue
+        new_transitions.append((src_state, dst_state, event))
+
+    if atomic and report.conflicts:
+        return report
+
+    with fcstm_state_chart.batch():
+        fcstm_state_chart._insert_states(new_states)
+        for father_state, new_state in new_states:
+            fcstm_state_chart._record(AddStateDelta(father_state, new_state))
+        for event in new_events:
+            fcstm_state_chart._insert_event(event)
+            fcstm_state_chart._record(AddEventDelta(event))
+        for src_state, dst_state, event in new_transitions:
+            transition = Transition(src_state, dst_state, event)
+            fcstm_state_chart._insert_transition(transition)
+            fcstm_state_chart._record(AddTransitionDelta(transition))
+            report.added_transitions.append(transition)
+    report.added_states = [new_state for _, new_state in new_states]
+    report.added_events = new_events
+    report.committed = True
+    return report
+
+
+def _resolve(ref, names: _NameIndex, ids: Set[str]):
+    """将对象或名称解析为对象，对象必须已经在状态机中或在同一批中添加"""
+    if isinstance(ref, str):
+        return names.lookup(ref)
+    if ref is None or ref.id not in ids:
+        return None, f"{getattr(ref, 'name', ref)!r} 不存在"
+    return ref, None
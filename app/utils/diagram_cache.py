@@ -0,0 +1,68 @@
+import hashlib
+import os
+from typing import Optional
+
+from app.config import PLANTUML_JAR_PATH
+
+from .lru_directory import LruDirectory
+
+#: 渲染方式（PlantUML参数、图片格式等）变化时增加版本号，使旧的缓存失效
+RENDERER_VERSION = 1
+
+
+def renderer_signature(plantuml_jar: str = PLANTUML_JAR_PATH) -> str:
+    """渲染器的标识：渲染版本号加上plantuml.jar的大小和修改时间，替换jar之后缓存自动失效"""
+    try:
+        stat = os.stat(plantuml_jar)
+    except OSError:
+        return f'{RENDERER_VERSION}:missing'
+    return f'{RENDERER_VERSION}:{stat.st_size}:{stat.st_mtime_ns}'
+
+
+class DiagramCache(LruDirectory):
+    """磁盘上的状态机图缓存，按PlantUML代码和渲染器的哈希查找，界面和批量导出共享同一个目录"""
+
+    def __init__(self, directory: str, max_bytes: int, renderer: Optional[str] = None):
+        """
+        :param max_bytes: 缓存文件的总大小上限
+        :param renderer: 渲染器标识，默认为 :func:`renderer_signature`
+        """
+        super().__init__(directory, max_bytes, ('.png',))
+        self.renderer = renderer if renderer is not None else renderer_signature()
+        self.hit_count = 0
+        self.miss_count = 0
+
+    def key(self, plantuml_code: str) -> str:
+        digest = hashlib.sha256()
+        digest.update(self.renderer.encode('utf-8') + b'\0')
+        digest.update(plantuml_code.encode('utf-8'))
+        return digest.hexdigest()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f'{key}.png')
+
+    def get(self, plantuml_code: str) -> Optional[bytes]:
+        """返回缓存的图片数据，不存在时返回None"""
+        entry_path = self.entry_path(self.key(plantuml_code))
+        try:
+            with open(entry_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            self.miss_count += 1
+            return None
+        self.touch(entry_path)
+        self.hit_count += 1
+        return data
+
+    def put(self, plantuml_code: str, data: bytes):
+        """写入缓存，超出容量时淘汰最久没有使用的图片；单张图片超过容量时不缓存"""
+        entry_path = self.entry_path(self.key(plantuml_code))
+        if os.path.exists(entry_path):
+            # 其他进程已经写入了同样的图片
+            return
+
+        def write(temp_path: str):
+            with open(temp_path, 'wb') as f:
+                f.write(data)
+
+        self.store(entry_path, len(data), write)
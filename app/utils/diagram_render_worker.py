@@ -0,0 +1,63 @@
+import threading
+from typing import Optional
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+from .diagram_cache import DiagramCache
+from .plantuml_daemon import PlantumlRenderCanceled
+from .show_state_graph import ShowStateGraph
+
+
+class DiagramRenderWorker(QObject):
+    """
+    在工作线程中渲染状态机图
+
+    PlantUML代码在主线程中生成（需要读取正在编辑的状态机），工作线程只负责查找缓存和调用渲染进程，
+    渲染期间界面保持响应。PlantUML不报告渲染进度，因此只报告阶段；取消时结束渲染进程，下次渲染时重新启动。
+    """
+    stage_changed = pyqtSignal(str)
+    #: PNG图片数据
+    finished = pyqtSignal(bytes)
+    failed = pyqtSignal(str)
+    canceled = pyqtSignal()
+
+    def __init__(self, plantuml_code: str, cache: Optional[DiagramCache] = None):
+        QObject.__init__(self)
+        self.plantuml_code = plantuml_code
+        self.cache = cache
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """请求取消渲染，可以从任意线程调用"""
+        self._cancel_event.set()
+
+    def is_canceled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def run(self):
+        try:
+            self.stage_changed.emit("正在渲染状态机图")
+            data = ShowStateGraph.render_png(self.plantuml_code, cache=self.cache, cancel_event=self._cancel_event)
+        except PlantumlRenderCanceled:
+            self.canceled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            # 渲染完成之后才取消的，结果同样丢弃
+            if self._cancel_event.is_set():
+                self.canceled.emit()
+            else:
+                self.finished.emit(data)
+
+
+def start_diagram_render_worker(worker: DiagramRenderWorker, parent=None) -> QThread:
+    """在新的QThread中运行worker，线程在worker结束后自动退出并释放"""
+    thread = QThread(parent)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    for signal in (worker.finished, worker.failed, worker.canceled):
+        signal.connect(thread.quit)
+    thread.finished.connect(worker.deleteLater)
+    thread.finished.connect(thread.deleteLater)
+    thread.start()
+    return thread
@@ -0,0 +1,234 @@
+import json
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from pyfcstm.model import Statechart
+
+from .atomic_write import atomic_write
+from .fcstm_state_chart import FcstmStateChart
+from .state_chart_change import StateChartChange
+from .statechart_snapshot import SnapshotOp, StatechartSnapshot, snapshot_model, state_record
+
+SNAPSHOT_FILE_NAME = 'snapshot.json'
+JOURNAL_FILE_NAME = 'journal.jsonl'
+FORMAT_VERSION = 1
+
+
+def change_to_ops(fcstm_state_chart: FcstmStateChart, change: StateChartChange) -> List[SnapshotOp]:
+    """将一次修改通知转换为日志记录，只读取受影响的对象"""
+    ops = []
+    state_ids = change.states_added | change.states_modified
+    # 子状态增删或初始状态变化的复合状态需要更新子状态列表
+    state_ids.update(state_id for state_id in change.subtrees if state_id is not None)
+    for state_id in state_ids:
+        state = fcstm_state_chart.get_state(state_id)
+        if state is not None:
+            ops.append(['state', state_id, state_record(fcstm_state_chart, state)])
+    for state_id in change.states_removed:
+        if fcstm_state_chart.get_state(state_id) is None:
+            ops.append(['del_state', state_id])
+    for event_id in change.events_added | change.events_modified:
+        event = fcstm_state_chart.get_event(event_id)
+        if event is not None:
+            ops.append(['event', event_id, event.name, event.guard])
+    for event_id in change.events_removed:
+        if fcstm_state_chart.get_event(event_id) is None:
+            ops.append(['del_event', event_id])
+    for key in change.transitions_removed:
+        ops.append(['del_transition', list(key)])
+    for key in change.transitions_added:
+        ops.append(['transition', list(key)])
+    return ops
+
+
+def _write_json_atomic(file_path: str, data):
+    """原子地写入JSON文件，中途崩溃时旧文件保持完整"""
+    with atomic_write(file_path) as temp_path:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+
+def _read_model(directory: str) -> Optional[StatechartSnapshot]:
+    """读取快照并回放日志，没有快照时返回None"""
+    snapshot_path = os.path.join(directory, SNAPSHOT_FILE_NAME)
+    if not os.path.exists(snapshot_path):
+        return None
+    with open(snapshot_path, 'r', encoding='utf-8') as f:
+        snapshot = json.load(f)
+    if snapshot.get('format') != FORMAT_VERSION:
+        raise ValueError(f"不支持的自动保存格式：{snapshot.get('format')!r}")
+    generation = snapshot['generation']
+    model = StatechartSnapshot(snapshot['model'])
+    journal_path = os.path.join(directory, JOURNAL_FILE_NAME)
+    if os.path.exists(journal_path):
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能只写了一半
+                    break
+                # 压缩完成但日志尚未清空时，旧代的记录已经包含在快照中
+                if entry['generation'] >= generation:
+                    model.apply(entry['ops'])
+    return model
+
+
+def has_autosave(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, SNAPSHOT_FILE_NAME))
+
+
+def recover_statechart(directory: str) -> Optional[Statechart]:
+    """在最近一次快照上回放日志，恢复崩溃前的状态机，没有自动保存时返回None"""
+    model = _read_model(directory)
+    return None if model is None else model.to_statechart()
+
+
+def discard_autosave(directory: str):
+    for file_name in (SNAPSHOT_FILE_NAME, JOURNAL_FILE_NAME):
+        file_path = os.path.join(directory, file_name)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+
+
+class EditJournal:
+    """
+    状态机修改的追加式日志，用于崩溃后恢复
+
+    ``start`` 订阅FcstmStateChart的修改通知，每次通知在界面线程中只把受影响的对象转换为几条记录放入队列。
+    作为基准的快照最好在构造状态机的工作线程中预先生成（见 :class:`StatechartImportWorker` ），
+    避免打开大型状态机时在界面线程中遍历整个模型。
+    文件操作全部在写入线程中进行：记录追加到日志文件，每 ``sync_interval`` 秒最多fsync一次；
+    日志超过 ``compact_size`` 字节后，写入线程将自己维护的模型镜像写成新的快照并清空日志。
+    """
+    DEFAULT_SYNC_INTERVAL = 1.0
+    DEFAULT_COMPACT_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, directory: str, sync_interval: float = DEFAULT_SYNC_INTERVAL,
+                 compact_size: int = DEFAULT_COMPACT_SIZE):
+        self.directory = directory
+        self.sync_interval = sync_interval
+        self.compact_size = compact_size
+        self.fcstm_state_chart: Optional[FcstmStateChart] = None
+        self.compaction_count = 0
+        # 写入线程出错后保存异常，之后的修改不再记录
+        self.error: Optional[Exception] = None
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='EditJournal', daemon=True)
+        self._thread.start()
+
+    def start(self, fcstm_state_chart: FcstmStateChart, base_model: Optional[Dict[str, Any]] = None):
+        """
+        开始记录新的状态机，之前的快照和日志被替换
+
+        :param base_model: 预先生成的 ``snapshot_model(fcstm_state_chart)`` ，生成之后状态机不能被修改过；
+            为None时在当前线程中生成
+        """
+        self.stop()
+        self.fcstm_state_chart = fcstm_state_chart
+        if base_model is None:
+            base_model = snapshot_model(fcstm_state_chart)
+        self._queue.put(('base', base_model))
+        fcstm_state_chart.subscribe(self._on_state_chart_changed)
+
+    def stop(self):
+        """停止记录当前状态机，已经写入的内容保留"""
+        if self.fcstm_state_chart is not None:
+            self.fcstm_state_chart.unsubscribe(self._on_state_chart_changed)
+            self.fcstm_state_chart = None
+
+    def record_meta(self, name: str, preamble: List[str]):
+        """记录状态机名称和前言的修改"""
+        if self.fcstm_state_chart is not None:
+            self._queue.put(('ops', [['meta', name, list(preamble)]]))
+
+    def _on_state_chart_changed(self, change: StateChartChange):
+        ops = change_to_ops(self.fcstm_state_chart, change)
+        if ops:
+            self._queue.put(('ops', ops))
+
+    def sync(self, timeout: Optional[float] = None) -> bool:
+        """等待队列中的记录全部写入并落盘"""
+        done = threading.Event()
+        self._queue.put(('sync', done))
+        return done.wait(timeout)
+
+    def close(self, discard: bool = False, timeout: Optional[float] = None):
+        """停止写入线程，``discard`` 为True时删除自动保存（正常退出时不需要恢复）"""
+        self.stop()
+        self._queue.put(('close', discard))
+        self._thread.join(timeout)
+
+    def _run(self):
+        try:
+            self._write_loop()
+        except Exception as e:
+            # 写入失败（例如磁盘已满）时停止自动保存，不影响编辑
+            self.error = e
+            while True:
+                kind, payload = self._queue.get()
+                if kind == 'sync':
+                    payload.set()
+                elif kind == 'close':
+                    return
+
+    def _write_loop(self):
+        os.makedirs(self.directory, exist_ok=True)
+        journal_path = os.path.join(self.directory, JOURNAL_FILE_NAME)
+        model, generation = None, 0
+        journal_file = None
+        dirty = False
+        sync_deadline = 0.0
+        while True:
+            timeout = max(0.0, sync_deadline - time.monotonic()) if dirty else None
+            try:
+                kind, payload = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                kind, payload = None, None
+
+            if kind == 'base':
+                # 先清空旧日志再写快照，中途崩溃时不会把旧日志回放到新快照上
+                if journal_file is not None:
+                    journal_file.close()
+                journal_file = open(journal_path, 'w', encoding='utf-8')
+                model = StatechartSnapshot(payload)
+                generation = self._compact(model, 0)
+                dirty = False
+            elif kind == 'ops' and journal_file is not None:
+                model.apply(payload)
+                journal_file.write(json.dumps({'generation': generation, 'ops': payload}, ensure_ascii=False))
+                journal_file.write('\n')
+                if not dirty:
+                    dirty = True
+                    sync_deadline = time.monotonic() + self.sync_interval
+
+            if journal_file is not None and (kind in ('sync', 'close') or
+                                             (dirty and time.monotonic() >= sync_deadline)):
+                journal_file.flush()
+                os.fsync(journal_file.fileno())
+                dirty = False
+                if journal_file.tell() >= self.compact_size:
+                    # 先写新一代的快照再清空日志，中途崩溃时旧代的记录在回放时被跳过
+                    journal_file.close()
+                    generation = self._compact(model, generation)
+                    journal_file = open(journal_path, 'w', encoding='utf-8')
+
+            if kind == 'sync':
+                payload.set()
+            elif kind == 'close':
+                if journal_file is not None:
+                    journal_file.close()
+                if payload:
+                    discard_autosave(self.directory)
+                return
+
+    def _compact(self, model: StatechartSnapshot, generation: int) -> int:
+        """将模型写成新一代的快照，之后日志可以清空"""
+        generation += 1
+        _write_json_atomic(os.path.join(self.directory, SNAPSHOT_FILE_NAME),
+                           {'format': FORMAT_VERSION, 'generation': generation, 'model': model.to_data()})
+        self.compaction_count += 1
+        return generation
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import shutil
+from typing import Callable, Dict, Optional
+
+from pyfcstm.model import CompositeState, NormalState, PseudoState, Statechart
+
+from .lru_directory import LruDirectory
+
+#: 可以缓存的导出格式（文件后缀）: 导出器版本，导出内容发生变化时必须增加对应的版本号。
+#: JSON和二进制格式中包含状态id，而结构哈希与id无关，因此不缓存；
+#: 状态机图按PlantUML代码缓存在 :class:`DiagramCache` 中。
+EXPORTER_VERSIONS: Dict[str, int] = {
+    '.docx': 1,
+    '.xlsx': 2,
+    '.puml': 1,
+}
+
+_STATE_TYPE_NAMES = {NormalState: 'normal', CompositeState: 'composite', PseudoState: 'pseudo'}
+
+
+def _dump(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=str).encode('utf-8') + b'\n'
+
+
+def statechart_hash(state_chart: Statechart) -> str:
+    """
+    状态机的结构哈希（SHA-256十六进制字符串）
+
+    包含名称、前导代码，以及按迭代顺序的状态、事件和迁移的全部内容；状态和事件之间的引用以其在列表中的序号表示，
+    因此与对象id无关，同一个状态机重新读取后哈希不变。导出文件中各项的顺序与迭代顺序相同，所以顺序也计入哈希。
+    """
+    states = list(state_chart.states)
+    d_id_index = {state.id: index for index, state in enumerate(states)}
+
+    digest = hashlib.sha256()
+    digest.update(_dump(['statechart', state_chart.name, list(state_chart.preamble or []),
+                         d_id_index.get(state_chart.root_state_id, None)]))
+    for state in states:
+        record = [_STATE_TYPE_NAMES.get(type(state), type(state).__name__), state.name, state.description,
+                  state.min_time_lock, state.max_time_lock, state.on_entry, state.on_during, state.on_exit]
+        if isinstance(state, CompositeState):
+            record.append([d_id_index.get(child_state.id, None) for child_state in state.states])
+            record.append(d_id_index.get(state.initial_state_id, None))
+        digest.update(_dump(['state'] + record))
+    for event in state_chart.events:
+        digest.update(_dump(['event', event.name, event.guard]))
+    for transition in state_chart.transitions:
+        # 没有事件的迁移以null代替[名称, 条件]，与任何事件都不相同
+        event = transition.event
+        digest.update(_dump(['transition', d_id_index.get(transition.src_state_id, None),
+                             d_id_index.get(transition.dst_state_id, None),
+                             [event.name, event.guard] if event is not None else None]))
+    return digest.hexdigest()
+
+
+class ExportCache(LruDirectory):
+    """以结构哈希和导出器版本为键的导出文件缓存，批量导出的进程池共享同一个目录"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        """
+        :param max_bytes: 缓存文件的总大小上限
+        """
+        super().__init__(directory, max_bytes, EXPORTER_VERSIONS)
+        self.hit_count = 0
+        self.miss_count = 0
+
+    @staticmethod
+    def is_cacheable(suffix: str) -> bool:
+        return suffix in EXPORTER_VERSIONS
+
+    def entry_path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.directory, digest[:2], f'{digest}-v{EXPORTER_VERSIONS[suffix]}{suffix}')
+
+    def get(self, digest: str, suffix: str) -> Optional[str]:
+        """返回缓存文件的路径，不存在时返回None"""
+        entry_path = self.entry_path(digest, suffix)
+        return entry_path if os.path.isfile(entry_path) else None
+
+    def put(self, digest: str, suffix: str, file_path: str):
+        """将导出的文件复制到缓存中，超出容量时淘汰最久没有使用的文件；单个文件超过容量时不缓存"""
+        self.store(self.entry_path(digest, suffix), os.path.getsize(file_path),
+                   lambda temp_path: shutil.copyfile(file_path, temp_path))
+
+    def export(self, state_chart: Statechart, suffix: str, file_path: str,
+               exporter: Callable[[Statechart, str], None], digest: Optional[str] = None) -> bool:
+        """
+        导出到file_path，缓存中有相同内容时直接复制缓存文件，返回是否命中缓存
+
+        file_path由调用者负责原子地替换（通常是 :func:`atomic_write` 产生的临时文件）。
+        缓存目录无法写入时只是不缓存，不影响导出本身。
+        """
+        if digest is None:
+            digest = statechart_hash(state_chart)
+        cached_path = self.get(digest, suffix)
+        if cached_path is not None:
+            try:
+                shutil.copyfile(cached_path, file_path)
+            except FileNotFoundError:
+                # 缓存文件在检查之后被其他进程删除，重新导出
+                pass
+            else:
+                self.touch(cached_path)
+                self.hit_count += 1
+                return True
+
+        self.miss_count += 1
+        exporter(state_chart, file_path)
+        try:
+            self.put(digest, suffix, file_path)
+        except OSError:
+            pass
+        return False
@@ -1,111 +1,145 @@
+from typing import Dict, Iterable
+
 from openpyxl import Workbook
-from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle, PatternFill
 from pyfcstm.model import State, CompositeState, PseudoState, Statechart
 
+#: 表头单元格共享的命名样式
+HEADER_STYLE_NAME = "statechart_header"
+#: 各工作表的列宽
+COLUMN_WIDTH = 15
+#: 各工作表的表头，导入时按表头名称查找列
+STATES_HEADERS = ["状态名称", "状态类型", "状态描述", "Min时间锁", "Max时间锁", "Entry动作", "During动作", "Exit动作",
+                  "父状态", "初始状态"]
+EVENTS_HEADERS = ["事件名称", "事件条件"]
+TRANSITIONS_HEADERS = ["起始状态", "目标状态", "触发事件"]
+#: 状态路径中的分隔符。状态名称可能重复，父状态和迁移的起止状态以从根状态开始的路径表示
+STATE_PATH_SEPARATOR = '/'
+
+
+def join_state_path(father_path: str, name: str) -> str:
+    """父状态路径加上状态名称，名称中的分隔符和反斜杠以反斜杠转义，使不同的名称序列得到不同的路径"""
+    name = name.replace('\\', '\\\\').replace(STATE_PATH_SEPARATOR, '\\' + STATE_PATH_SEPARATOR)
+    return f'{father_path}{STATE_PATH_SEPARATOR}{name}' if father_path else name
+
+
+def state_paths(statechart: Statechart) -> Dict[str, str]:
+    """每个状态从根状态开始的路径，以状态id为键"""
+    d_id_father_id = {}
+    for state in statechart.states:
+        if isinstance(state, CompositeState):
+            for child_state in state.states:
+                d_id_father_id[child_state.id] = state.id
+    d_id_state = {state.id: state for state in statechart.states}
+    d_id_path: Dict[str, str] = {}
+    for state in statechart.states:
+        # 向上找到第一个已知路径的祖先，再向下依次计算，不使用递归
+        chain = []
+        current_id = state.id
+        while current_id is not None and current_id not in d_id_path and current_id in d_id_state:
+            chain.append(current_id)
+            current_id = d_id_father_id.get(current_id, None)
+        father_path = d_id_path.get(current_id, '')
+        for state_id in reversed(chain):
+            father_path = d_id_path[state_id] = join_state_path(father_path, d_id_state[state_id].name)
+    return d_id_path
+
+
+def _header_style() -> NamedStyle:
+    return NamedStyle(
+        name=HEADER_STYLE_NAME,
+        font=Font(bold=True),
+        alignment=Alignment(horizontal='center', vertical='center'),
+        fill=PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid"),
+    )
+
+
+def _create_sheet(wb: Workbook, title: str, headers: Iterable[str]):
+    """创建只写工作表并写入表头，列宽必须在写入第一行之前设置"""
+    sheet = wb.create_sheet(title)
+    headers = list(headers)
+    for col in range(1, len(headers) + 1):
+        sheet.column_dimensions[chr(64 + col)].width = COLUMN_WIDTH
+    header_cells = []
+    for header in headers:
+        cell = WriteOnlyCell(sheet, value=header)
+        cell.style = HEADER_STYLE_NAME
+        header_cells.append(cell)
+    sheet.append(header_cells)
+    return sheet
+
+
+def _state_type_name(state: State) -> str:
+    if isinstance(state, CompositeState):
+        return "Composite"
+    elif isinstance(state, PseudoState):
+        return "Pseudo"
+    else:
+        return "Normal"
+
+
 def export_statechart_to_excel(statechart: Statechart, file_path: str) -> bool:
     """
     将状态机信息导出为Excel文档
-    
+
+    使用openpyxl的只写模式，每一行写入后直接序列化到临时文件，内存占用与行数无关；
+    表头使用同一个命名样式，而不是为每个单元格创建样式对象。
+
     Args:
         statechart: 状态机对象
         file_path: 导出文件路径
-        
+
     Returns:
         bool: 是否导出成功
     """
     try:
-        # 创建工作簿
-        wb = Workbook()
-        
-        # 创建状态工作表
-        states_sheet = wb.active
-        states_sheet.title = "States"
-        
-        # 设置状态表头
-        headers = ["状态名称", "状态类型", "状态描述", "Min时间锁", "Max时间锁", "Entry动作", "During动作", "Exit动作"]
-        for col, header in enumerate(headers, 1):
-            cell = states_sheet.cell(row=1, column=col)
-            cell.value = header
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-        
-        # 添加状态信息
-        row = 2
+        # 创建只写工作簿
+        wb = Workbook(write_only=True)
+        wb.add_named_style(_header_style())
+
+        # 父状态以路径表示，初始状态以子状态的名称表示，导入时据此恢复层次结构
+        d_id_state = {state.id: state for state in statechart.states}
+        d_id_path = state_paths(statechart)
+        d_id_father_path = {}
         for state in statechart.states:
-            states_sheet.cell(row=row, column=1).value = state.name
             if isinstance(state, CompositeState):
-                states_sheet.cell(row=row, column=2).value = "Composite"
-            elif isinstance(state, PseudoState):
-                states_sheet.cell(row=row, column=2).value = "Pseudo"
-            else:
-                states_sheet.cell(row=row, column=2).value = "Normal"
-            states_sheet.cell(row=row, column=3).value = state.description if state.description else ""
-            states_sheet.cell(row=row, column=4).value = state.min_time_lock if state.min_time_lock else ""
-            states_sheet.cell(row=row, column=5).value = state.max_time_lock if state.max_time_lock else ""
-            states_sheet.cell(row=row, column=6).value = state.on_entry if state.on_entry else ""
-            states_sheet.cell(row=row, column=7).value = state.on_during if state.on_during else ""
-            states_sheet.cell(row=row, column=8).value = state.on_exit if state.on_exit else ""
-            row += 1
-        
-        # 调整列宽
-        for col in range(1, len(headers) + 1):
-            states_sheet.column_dimensions[chr(64 + col)].width = 15
-        
-        # 创建事件工作表
-        events_sheet = wb.create_sheet("Events")
-        
-        # 设置事件表头
-        headers = ["事件名称", "事件条件"]
-        for col, header in enumerate(headers, 1):
-            cell = events_sheet.cell(row=1, column=col)
-            cell.value = header
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-        
-        # 添加事件信息
-        row = 2
-        events = set()
-        for transition in statechart.transitions:
-            if transition.event not in events:
-                events.add(transition.event)
-                events_sheet.cell(row=row, column=1).value = transition.event.name
-                events_sheet.cell(row=row, column=2).value = transition.event.guard if transition.event.guard else ""
-                row += 1
-        
-        # 调整列宽
-        for col in range(1, len(headers) + 1):
-            events_sheet.column_dimensions[chr(64 + col)].width = 15
-        
-        # 创建迁移工作表
-        transitions_sheet = wb.create_sheet("Transitions")
-        
-        # 设置迁移表头
-        headers = ["起始状态", "目标状态", "触发事件"]
-        for col, header in enumerate(headers, 1):
-            cell = transitions_sheet.cell(row=1, column=col)
-            cell.value = header
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-        
-        # 添加迁移信息
-        row = 2
+                for child_state in state.states:
+                    d_id_father_path[child_state.id] = d_id_path[state.id]
+
+        # 状态工作表
+        states_sheet = _create_sheet(wb, "States", STATES_HEADERS)
+        for state in statechart.states:
+            initial_state = d_id_state.get(state.initial_state_id, None) \
+                if isinstance(state, CompositeState) else None
+            states_sheet.append([
+                state.name,
+                _state_type_name(state),
+                state.description if state.description else "",
+                state.min_time_lock if state.min_time_lock else "",
+                state.max_time_lock if state.max_time_lock else "",
+                state.on_entry if state.on_entry else "",
+                state.on_during if state.on_during else "",
+                state.on_exit if state.on_exit else "",
+                d_id_father_path.get(state.id, ""),
+                initial_state.name if initial_state is not None else "",
+            ])
+
+        # 事件工作表，包含没有被任何迁移使用的事件
+        events_sheet = _create_sheet(wb, "Events", EVENTS_HEADERS)
+        for event in statechart.events:
+            events_sheet.append([event.name, event.guard if event.guard else ""])
+
+        # 迁移工作表
+        transitions_sheet = _create_sheet(wb, "Transitions", TRANSITIONS_HEADERS)
         for transition in statechart.transitions:
-            transitions_sheet.cell(row=row, column=1).value = transition.src_state.name
-            transitions_sheet.cell(row=row, column=2).value = transition.dst_state.name
-            transitions_sheet.cell(row=row, column=3).value = transition.event.name
-            row += 1
-        
-        # 调整列宽
-        for col in range(1, len(headers) + 1):
-            transitions_sheet.column_dimensions[chr(64 + col)].width = 15
-        
+            transitions_sheet.append([d_id_path[transition.src_state_id], d_id_path[transition.dst_state_id],
+                                      transition.event.name])
+
         # 保存工作簿
         wb.save(file_path)
         return True
-        
+
     except Exception as e:
         print(f"导出Excel文档时发生错误：{str(e)}")
         return False
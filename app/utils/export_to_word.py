@@ -1,244 +1,294 @@
+import multiprocessing
+import re
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
 from docx import Document
-from docx.shared import Inches, Pt
+from lxml import etree
 from docx.enum.text import WD_ALIGN_PARAGRAPH
-from pyfcstm.model import State, CompositeState, PseudoState, Statechart
+from docx.oxml import OxmlElement, parse_xml
+from docx.oxml.ns import nsdecls, qn
+from pyfcstm.model import State, CompositeState, PseudoState, Statechart, Transition
+
+#: 表格中的一个单元格：(文本, 是否居中, 横向合并的列数, 纵向合并标记)
+#: 纵向合并标记为 'restart' 表示合并区域的第一个单元格，'continue' 表示被合并的单元格，None表示不合并
+Cell = Tuple[str, bool, int, Optional[str]]
+
+#: 预先生成的居中段落属性
+_CENTER_PPR = '<w:pPr><w:jc w:val="center"/></w:pPr>'
+_XMLNS_PATTERN = re.compile(r'\s+xmlns:\w+="[^"]*"')
+#: 并行导出时每个任务生成的状态表格数量
+_SECTIONS_PER_TASK = 200
+
 
 def center_text_in_cell(cell):
     """
     设置单元格中的文本居中显示
-    
+
     Args:
         cell: 表格单元格对象
     """
     for paragraph in cell.paragraphs:
         paragraph.alignment = WD_ALIGN_PARAGRAPH.CENTER
 
-def export_statechart_to_word(statechart: Statechart, file_path: str) -> bool:
+
+def _cell(text, center: bool = True, span: int = 1, v_merge: Optional[str] = None) -> Cell:
+    return '' if text is None else str(text), center, span, v_merge
+
+
+def _continued_cell() -> Cell:
+    """被纵向合并的单元格"""
+    return '', False, 1, 'continue'
+
+
+def _run_xml(text: str) -> str:
+    """与python-docx的 ``cell.text`` 相同：换行转换为 <w:br/>，制表符转换为 <w:tab/>"""
+    if not text:
+        return ''
+    if '\n' not in text and '\t' not in text:
+        return f'<w:r><w:t xml:space="preserve">{escape(text)}</w:t></w:r>'
+    parts = []
+    for line_index, line in enumerate(text.split('\n')):
+        if line_index:
+            parts.append('<w:br/>')
+        for part_index, part in enumerate(line.split('\t')):
+            if part_index:
+                parts.append('<w:tab/>')
+            if part:
+                parts.append(f'<w:t xml:space="preserve">{escape(part)}</w:t>')
+    return f'<w:r>{"".join(parts)}</w:r>'
+
+
+@lru_cache(maxsize=None)
+def _cell_start_xml(width: int, span: int, v_merge: Optional[str], center: bool) -> str:
+    """单元格属性和段落属性，同一种单元格只生成一次"""
+    parts = [f'<w:tc><w:tcPr><w:tcW w:type="dxa" w:w="{width}"/>']
+    if span > 1:
+        parts.append(f'<w:gridSpan w:val="{span}"/>')
+    if v_merge == 'restart':
+        parts.append('<w:vMerge w:val="restart"/>')
+    elif v_merge == 'continue':
+        parts.append('<w:vMerge/>')
+    parts.append('</w:tcPr><w:p>')
+    if center:
+        parts.append(_CENTER_PPR)
+    return ''.join(parts)
+
+
+def _rows_xml(rows: Sequence[Sequence[Cell]], widths: Sequence[int]) -> str:
+    """生成表格行的XML，宽度以dxa（1/20磅）为单位"""
+    parts = []
+    for row in rows:
+        parts.append('<w:tr>')
+        col = 0
+        for text, center, span, v_merge in row:
+            parts.append(_cell_start_xml(sum(widths[col:col + span]), span, v_merge, center))
+            parts.append(_run_xml(text))
+            parts.append('</w:p></w:tc>')
+            col += span
+        parts.append('</w:tr>')
+    return ''.join(parts)
+
+
+class _TableFormat:
+    """
+    某种列数的表格的样式和列宽
+
+    按名称查找表格样式的代价很高，只在第一次创建该列数的表格时通过python-docx设置一次，
+    之后的表格直接复用生成的 <w:tblPr> 和 <w:tblGrid>。
+    """
+
+    def __init__(self, doc, cols: int):
+        table = doc.add_table(rows=0, cols=cols)
+        table.style = 'Table Grid'
+        tbl = table._tbl
+        self.widths = [int(grid_col.get(qn('w:w'))) for grid_col in tbl.tblGrid.iterchildren(qn('w:gridCol'))]
+        # 去掉序列化时附带的命名空间声明，统一声明在表格元素上
+        self.header_xml = _XMLNS_PATTERN.sub('', etree.tostring(tbl.tblPr, encoding='unicode') +
+                                             etree.tostring(tbl.tblGrid, encoding='unicode'))
+        tbl.getparent().remove(tbl)
+
+    def table_xml(self, rows: Sequence[Sequence[Cell]]) -> str:
+        # 命名空间声明在表格元素上，整个表格移入文档时不需要逐个节点整理命名空间
+        return f'<w:tbl {nsdecls("w")}>{self.header_xml}{_rows_xml(rows, self.widths)}</w:tbl>'
+
+
+class _BodyWriter:
+    """
+    向文档末尾（节属性之前）加入元素
+
+    ``doc.add_paragraph`` 和 ``body.sectPr`` 每次都要线性查找节属性，文档很大时代价为平方级，这里只查找一次。
+    """
+
+    def __init__(self, doc):
+        self._body = doc.element.body
+        self._sect_pr = self._body.sectPr
+
+    def _add(self, element):
+        if self._sect_pr is not None:
+            self._sect_pr.addprevious(element)
+        else:
+            self._body.append(element)
+
+    def add_table_xml(self, xml: str):
+        """将表格XML一次性解析并加入文档"""
+        self._add(parse_xml(xml))
+
+    def add_paragraph(self):
+        """添加空段落作为段落间距"""
+        self._add(OxmlElement('w:p'))
+
+
+def _state_type_name(state: State) -> str:
+    if isinstance(state, CompositeState):
+        return "Composite"
+    elif isinstance(state, PseudoState):
+        return "Pseudo"
+    else:
+        return "Normal"
+
+
+def _statechart_rows(statechart: Statechart) -> List[List[Cell]]:
+    """状态机总表"""
+    rows = [
+        [_cell("StateMachine", span=4)],
+        [_cell("状态机名称"), _cell(statechart.name, span=3)],
+        [_cell("状态机描述"), _cell('\n'.join(statechart.preamble or []), span=3)],
+        [_cell("包含状态", v_merge='restart'), _cell("状态名称"), _cell("状态类型", span=2)],
+    ]
+    for state in statechart.states:
+        rows.append([_continued_cell(), _cell(state.name), _cell(_state_type_name(state), span=2)])
+    rows.append([_cell("包含迁移", v_merge='restart'), _cell("起始状态"), _cell("目标状态"), _cell("激励事件")])
+    for transition in statechart.transitions:
+        rows.append([_continued_cell(), _cell(transition.src_state.name), _cell(transition.dst_state.name),
+                     _cell(transition.event.name)])
+    return rows
+
+
+#: 单个状态详细信息表所需的全部数据，只包含字符串，可以传给其他进程：
+#: (名称, 描述, 类型, Min时间锁, Max时间锁, Entry, During, Exit, ((事件名称, 事件条件, 迁移目标), ...))
+StateSection = Tuple[str, str, str, str, str, str, str, str, Tuple[Tuple[str, str, str], ...]]
+
+
+def _text(value) -> str:
+    return '' if value is None else str(value)
+
+
+def _state_section(state: State, transitions: Sequence[Transition]) -> StateSection:
+    """提取单个状态的详细信息，transitions为以该状态为源状态的迁移"""
+    return (
+        _text(state.name), _text(state.description), _state_type_name(state),
+        _text(state.min_time_lock), _text(state.max_time_lock),
+        _text(state.on_entry), _text(state.on_during), _text(state.on_exit),
+        tuple((_text(transition.event.name), _text(transition.event.guard), _text(transition.dst_state.name))
+              for transition in transitions),
+    )
+
+
+def _state_rows(section: StateSection) -> List[List[Cell]]:
+    """单个状态的详细信息表"""
+    name, description, type_name, min_time_lock, max_time_lock, on_entry, on_during, on_exit, transitions = section
+    rows = [
+        [_cell("State", span=3)],
+        [_cell("状态名称"), _cell(name, span=2)],
+        [_cell("状态描述"), _cell(description, span=2)],
+        [_cell("状态类型"), _cell(type_name, span=2)],
+        [_cell("时间锁", v_merge='restart'), _cell("Min"), _cell(min_time_lock)],
+        [_continued_cell(), _cell("Max"), _cell(max_time_lock)],
+        [_cell("Entry"), _cell(on_entry, span=2)],
+        [_cell("During"), _cell(on_during, span=2)],
+        [_cell("Exit"), _cell(on_exit, span=2)],
+        [_cell("产生事件", v_merge='restart'), _cell("事件名称"), _cell("事件产生条件")],
+    ]
+    for event_name, guard, _ in transitions:
+        rows.append([_continued_cell(), _cell(event_name), _cell(guard)])
+    if not transitions:
+        rows.append([_continued_cell(), _cell(""), _cell("")])
+    rows.append([_cell("迁移", v_merge='restart'), _cell("激励事件"), _cell("迁移目标")])
+    for event_name, _, dst_state_name in transitions:
+        rows.append([_continued_cell(), _cell(event_name), _cell(dst_state_name)])
+    if not transitions:
+        rows.append([_continued_cell(), _cell(""), _cell("")])
+    return rows
+
+
+def _state_tables_xml(table_format: '_TableFormat', sections: Sequence[StateSection]) -> List[str]:
+    """生成一组状态的详细信息表XML，在进程池中执行"""
+    return [table_format.table_xml(_state_rows(section)) for section in sections]
+
+
+def _iter_state_tables_xml(table_format: '_TableFormat', sections: List[StateSection],
+                           workers: Optional[int]) -> Iterator[str]:
+    """
+    按状态顺序产生详细信息表XML，workers大于1且状态多于一个任务时在进程池中分块生成
+
+    不按状态数自动启用进程池：生成表格XML只占导出时间的约10%，解析到文档和保存只能串行，
+    而每个子进程启动时都要重新导入python-docx等模块。在单核机器上实测2000、5000和20000个状态时，
+    2个和4个进程都比串行慢（20000个状态时串行13.0秒，2个进程15.6秒，4个进程18.5秒）；
+    改为每个任务返回一个片段、主进程每个任务只解析一次也没有可测量的收益，解析耗时与节点数成正比。
+    """
+    if not workers or workers <= 1 or len(sections) <= _SECTIONS_PER_TASK:
+        for section in sections:
+            yield table_format.table_xml(_state_rows(section))
+        return
+
+    chunks = [sections[start:start + _SECTIONS_PER_TASK] for start in range(0, len(sections), _SECTIONS_PER_TASK)]
+    # 使用spawn而不是fork，导出在带有Qt线程的进程中进行，fork可能复制到被其他线程持有的锁
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        # map按提交顺序返回结果，拼接顺序与串行相同
+        for tables_xml in executor.map(_state_tables_xml, repeat(table_format), chunks):
+            yield from tables_xml
+
+
+def export_statechart_to_word(statechart: Statechart, file_path: str, workers: Optional[int] = None) -> bool:
     """
     将状态机信息导出为Word文档
-    
+
+    迁移预先按源状态分组，每个表格直接生成XML并一次性解析，不再逐个单元格调用python-docx，
+    总耗时与状态数和迁移数之和成正比。
+
+    各状态的详细信息表互不相关，``workers`` 大于1时先将状态转换为只包含字符串的数据，
+    在进程池中分块生成表格XML，再按原顺序加入文档，生成的文档内容与串行导出完全相同。
+
     Args:
         statechart: 状态机对象
         file_path: 导出文件路径
-        
+        workers: 生成状态详细信息表的进程数，为None或不大于1、或者状态数不超过一个任务时在当前进程中生成
+
     Returns:
         bool: 是否导出成功
     """
     try:
         # 创建Word文档
         doc = Document()
-        
-        # 添加状态机信息表格
-        table = doc.add_table(rows=6, cols=4)  # 创建6行4列的表格
-        table.style = 'Table Grid'
-        
-        # 第一行：StateMachine
-        cell = table.cell(0, 0)
-        cell.merge(table.cell(0, 3))  # 合并第一行的所有列
-        cell.text = "StateMachine"
-        center_text_in_cell(cell)
-        
-        # 第二行：状态机名称
-        table.cell(1, 0).text = "状态机名称"
-        table.cell(1, 1).merge(table.cell(1, 3))  # 合并右侧单元格
-        table.cell(1, 1).text = statechart.name
-        center_text_in_cell(table.cell(1, 0))
-        center_text_in_cell(table.cell(1, 1))
-        
-        # 第三行：状态机描述
-        table.cell(2, 0).text = "状态机描述"
-        table.cell(2, 1).merge(table.cell(2, 3))  # 合并右侧单元格
-        table.cell(2, 1).text = '\n'.join(statechart.preamble)
-        center_text_in_cell(table.cell(2, 0))
-        center_text_in_cell(table.cell(2, 1))
-        
-        # 第四行：包含状态
-        table.cell(3, 0).text = "包含状态"
-        table.cell(3, 1).text = "状态名称"
-        table.cell(3, 2).merge(table.cell(3, 3))  # 合并右侧单元格
-        table.cell(3, 2).text = "状态类型"
-        center_text_in_cell(table.cell(3, 0))
-        center_text_in_cell(table.cell(3, 1))
-        center_text_in_cell(table.cell(3, 2))
-        
-        # 添加状态信息
-        row_idx = 4
-        for state in statechart.states:
-            if row_idx >= len(table.rows):
-                table.add_row()
-            table.cell(3, 0).merge(table.cell(row_idx, 0))
-            table.cell(row_idx, 1).text = state.name
-            table.cell(row_idx, 2).merge(table.cell(row_idx, 3))
-            if isinstance(state, CompositeState):
-                table.cell(row_idx, 2).text = "Composite"
-            elif isinstance(state, PseudoState):
-                table.cell(row_idx, 2).text = "Pseudo"
-            else:
-                table.cell(row_idx, 2).text = "Normal"
-            center_text_in_cell(table.cell(row_idx, 1))
-            center_text_in_cell(table.cell(row_idx, 2))
-            row_idx += 1
-        
-        # 第五行：包含迁移
-        if row_idx >= len(table.rows):
-            table.add_row()
-        transition_row_idx = row_idx
-        table.cell(row_idx, 0).text = "包含迁移"
-        table.cell(row_idx, 1).text = "起始状态"
-        table.cell(row_idx, 2).text = "目标状态"
-        table.cell(row_idx, 3).text = "激励事件"
-        for i in range(4):
-            center_text_in_cell(table.cell(row_idx, i))
-        row_idx += 1
-        
-        # 添加迁移信息
-        for transition in statechart.transitions:
-            if row_idx >= len(table.rows):
-                table.add_row()
-            table.cell(transition_row_idx, 0).merge(table.cell(row_idx, 0))
-            table.cell(row_idx, 1).text = transition.src_state.name
-            table.cell(row_idx, 2).text = transition.dst_state.name
-            table.cell(row_idx, 3).text = transition.event.name
-            for i in range(1, 4):
-                center_text_in_cell(table.cell(row_idx, i))
-            row_idx += 1
-        
+
+        table_formats = {cols: _TableFormat(doc, cols) for cols in (3, 4)}
+        body = _BodyWriter(doc)
+        # 状态机信息表格
+        body.add_table_xml(table_formats[4].table_xml(_statechart_rows(statechart)))
         # 添加段落间距
-        doc.add_paragraph()
-        
+        body.add_paragraph()
+
+        # 按源状态对迁移分组，只遍历一次
+        d_src_transitions: Dict[str, List[Transition]] = defaultdict(list)
+        for transition in statechart.transitions:
+            d_src_transitions[transition.src_state_id].append(transition)
+
         # 为每个状态添加详细信息
-        for state in statechart.states:
-            # 添加状态表格
-            state_table = doc.add_table(rows=10, cols=3)  # 创建10行3列的表格
-            state_table.style = 'Table Grid'
-            
-            # 第一行：State
-            cell = state_table.cell(0, 0)
-            cell.merge(state_table.cell(0, 2))  # 合并第一行的所有列
-            cell.text = "State"
-            center_text_in_cell(cell)
-            
-            # 第二行：状态名称
-            state_table.cell(1, 0).text = "状态名称"
-            state_table.cell(1, 1).merge(state_table.cell(1, 2))
-            state_table.cell(1, 1).text = state.name
-            center_text_in_cell(state_table.cell(1, 0))
-            center_text_in_cell(state_table.cell(1, 1))
-            
-            # 第三行：状态描述
-            state_table.cell(2, 0).text = "状态描述"
-            state_table.cell(2, 1).merge(state_table.cell(2, 2))
-            state_table.cell(2, 1).text = state.description if hasattr(state, 'description') else ""
-            center_text_in_cell(state_table.cell(2, 0))
-            center_text_in_cell(state_table.cell(2, 1))
-            
-            # 第四行：状态类型
-            state_table.cell(3, 0).text = "状态类型"
-            state_table.cell(3, 1).merge(state_table.cell(3, 2))
-            if isinstance(state, CompositeState):
-                state_table.cell(3, 1).text = "Composite"
-            elif isinstance(state, PseudoState):
-                state_table.cell(3, 1).text = "Pseudo"
-            else:
-                state_table.cell(3, 1).text = "Normal"
-            center_text_in_cell(state_table.cell(3, 0))
-            center_text_in_cell(state_table.cell(3, 1))
-            
-            # 第五行：时间锁
-            state_table.cell(4, 0).text = "时间锁"
-            state_table.cell(4, 1).text = "Min"
-            state_table.cell(4, 2).text = state.min_time_lock if state.min_time_lock else ""
-            state_table.cell(5, 0).text = ""
-            state_table.cell(5, 1).text = "Max"
-            state_table.cell(5, 2).text = state.max_time_lock if state.max_time_lock else ""
-            state_table.cell(4, 0).merge(state_table.cell(5, 0))
-            for i in range(3):
-                center_text_in_cell(state_table.cell(4, i))
-                center_text_in_cell(state_table.cell(5, i))
-            
-            # 第六行：Entry
-            state_table.cell(6, 0).text = "Entry"
-            state_table.cell(6, 1).merge(state_table.cell(6, 2))
-            state_table.cell(6, 1).text = state.on_entry if state.on_entry else ""
-            center_text_in_cell(state_table.cell(6, 0))
-            center_text_in_cell(state_table.cell(6, 1))
-            
-            # 第七行：During
-            state_table.cell(7, 0).text = "During"
-            state_table.cell(7, 1).merge(state_table.cell(7, 2))
-            state_table.cell(7, 1).text = state.during if hasattr(state, 'during') and state.during else ""
-            center_text_in_cell(state_table.cell(7, 0))
-            center_text_in_cell(state_table.cell(7, 1))
-            
-            # 第八行：Exit
-            state_table.cell(8, 0).text = "Exit"
-            state_table.cell(8, 1).merge(state_table.cell(8, 2))
-            state_table.cell(8, 1).text = state.on_exit if state.on_exit else ""
-            center_text_in_cell(state_table.cell(8, 0))
-            center_text_in_cell(state_table.cell(8, 1))
-            
-            # 第九行：产生事件
-            state_table.cell(9, 0).text = "产生事件"
-            state_table.cell(9, 1).text = "事件名称"
-            state_table.cell(9, 2).text = "事件产生条件"
-            for i in range(3):
-                center_text_in_cell(state_table.cell(9, i))
-            
-            # 添加事件信息
-            row_idx = 10
-            event_idx = row_idx - 1
-            for transition in statechart.transitions:
-                if transition.src_state_id == state.id:
-                    if row_idx >= len(state_table.rows):
-                        state_table.add_row()
-                    state_table.cell(event_idx, 0).merge(state_table.cell(row_idx, 0))
-                    state_table.cell(row_idx, 1).text = transition.event.name
-                    state_table.cell(row_idx, 2).text = transition.event.guard if transition.event.guard else ""
-                    for i in range(1, 3):
-                        center_text_in_cell(state_table.cell(row_idx, i))
-                    row_idx += 1
-            if event_idx == row_idx - 1:
-                state_table.add_row()
-                state_table.cell(event_idx, 0).merge(state_table.cell(row_idx, 0))
-                state_table.cell(row_idx, 1).text = ""
-                state_table.cell(row_idx, 2).text = ""
-                row_idx += 1
-            transition_row_idx = row_idx
-            # 第十行：迁移
-            if row_idx >= len(state_table.rows):
-                state_table.add_row()
-            state_table.cell(row_idx, 0).text = "迁移"
-            state_table.cell(row_idx, 1).text = "激励事件"
-            state_table.cell(row_idx, 2).text = "迁移目标"
-            for i in range(3):
-                center_text_in_cell(state_table.cell(row_idx, i))
-            row_idx += 1
-
-            # 添加迁移信息
-            for transition in statechart.transitions:
-                if transition.src_state_id == state.id:
-                    if row_idx >= len(state_table.rows):
-                        state_table.add_row()
-                    state_table.cell(transition_row_idx, 0).merge(state_table.cell(row_idx, 0))
-                    state_table.cell(row_idx, 1).text = transition.event.name
-                    state_table.cell(row_idx, 2).text = transition.dst_state.name
-                    for i in range(1, 3):
-                        center_text_in_cell(state_table.cell(row_idx, i))
-                    row_idx += 1
-
-            if transition_row_idx == row_idx - 1:
-                state_table.add_row()
-                state_table.cell(transition_row_idx, 0).merge(state_table.cell(row_idx, 0))
-                state_table.cell(row_idx, 1).text = ""
-                state_table.cell(row_idx, 2).text = ""
-                row_idx += 1
+        sections = [_state_section(state, d_src_transitions.get(state.id, [])) for state in statechart.states]
+        for table_xml in _iter_state_tables_xml(table_formats[3], sections, workers):
+            body.add_table_xml(table_xml)
             # 在每个状态表格后添加段落间距
-            doc.add_paragraph()
-        
+            body.add_paragraph()
+
         # 保存文档
         doc.save(file_path)
         return True
-        
+
     except Exception as e:
         print(f"导出Word文档时发生错误：{str(e)}")
         return False
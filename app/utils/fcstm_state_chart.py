@@ -5,81 +5,300 @@ from pyfcstm.model import (
     Transition,
     Statechart
 )
-from typing import Dict, List, Optional
+from bisect import bisect_right
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Set, Tuple
 from PyQt5 import QtWidgets
 from PyQt5.QtCore import Qt
 from vtkmodules.numpy_interface.dataset_adapter import NoneArray
 import qtawesome as qta
 from PyQt5.QtGui import QIcon
 
+from .bulk_edit import BulkEditReport, bulk_add
+from .state_chart_change import StateChartChange
+from .transition_index import TransitionIndex, transition_key
+from .undo_history import (
+    AddEventDelta, AddStateDelta, AddTransitionDelta, ChangeInitialStateDelta, CompoundDelta, DelEventDelta,
+    DelStateDelta, DelTransitionDelta, Delta, EditEventDelta, EditStateDelta, EditTransitionDelta, UndoHistory
+)
+
+_initial_state_icon: Optional[QIcon] = None
+
+
+def initial_state_icon() -> QIcon:
+    """初始状态图标，所有树节点共享同一个图标对象"""
+    global _initial_state_icon
+    if _initial_state_icon is None:
+        _initial_state_icon = qta.icon('fa5s.play', color='#4169E1')  # 使用皇家蓝颜色
+    return _initial_state_icon
+
 
 class FcstmStateChart:
-    """fcstm，事件和迁移都挂在状态下"""
+    """
+    fcstm，事件和迁移都挂在状态下
+
+    每次修改都会以 :class:`StateChartChange` 通知通过 ``subscribe`` 注册的回调，
+    在 ``batch`` 中进行的修改会合并为一次通知。
+    每次修改同时以增量的形式记录在 ``history`` 中，通过 ``undo`` / ``redo`` 撤销和重做，
+    ``batch`` 中的修改作为一步撤销。
+    """
+    d_id_state: Dict[str, State]
+    d_id_event: Dict[str, Event]
     d_id_father_state: Dict[str, Optional[CompositeState]]
+    d_id_tree_item: Dict[str, QtWidgets.QTreeWidgetItem]
+    transition_index: TransitionIndex
+    revision: int
+    history: UndoHistory
+
+    #: 层次结构修改记录的最大条数，超出时丢弃较早的一半
+    STATE_CHANGE_LOG_LIMIT = 10000
 
-    def __init__(self, tree_widget: QtWidgets.QTreeWidget, state_chart: Statechart):
+    def __init__(self, tree_widget: Optional[QtWidgets.QTreeWidget], state_chart: Statechart,
+                 tree_items: bool = True):
+        """
+        :param tree_widget: 显示状态层次结构的树控件。为None时只创建不属于任何控件的树节点，
+            可以在工作线程中构造，之后在主线程中通过 ``attach_tree_widget`` 一次性挂到控件上
+        :param tree_items: 为False时不创建任何树节点（tree_widget被忽略），层次结构由 :class:`StateTreeModel`
+            按需显示，打开和修改大型状态机时不再为每个状态创建节点
+        """
         self._state_chart = state_chart
 
+        self.d_id_state = {}  # state.id: state
+        self.d_id_event = {}  # event.id: event
         self.d_id_father_state = {}  # state.id: state(father)
-        self.tree_widget = tree_widget
-        self.tree_widget.clear()
+        self.d_id_tree_item = {}  # state.id: self.tree_widget中对应的节点
+        self.transition_index = TransitionIndex()
+        # 每次修改递增的版本号，以及影响状态层次结构的修改记录：两个等长的列表，分别是修改的版本号（递增）
+        # 和受影响子树的根状态id，根状态id为None时表示顶层状态发生了变化
+        self.revision = 0
+        self._state_change_revisions: List[int] = []
+        self._state_change_ids: List[Optional[str]] = []
+        # 记录中已经丢弃了不晚于这个版本号的修改
+        self._state_change_log_base = 0
+        self._subscribers: List[Callable[[StateChartChange], None]] = []
+        self._batch_depth = 0
+        self._batch_change: Optional[StateChartChange] = None
+        self._batch_deltas: Optional[List[Delta]] = None
+        self.history = UndoHistory()
+        self.tree_items = tree_items
+        self.tree_widget = tree_widget if tree_items else None
+        # tree_widget为None时创建的顶层节点
+        self._detached_top_level_items: List[QtWidgets.QTreeWidgetItem] = []
+        if self.tree_widget is not None:
+            self.tree_widget.clear()
 
         if self._state_chart is not None:
             self.__init_fcstm()
 
     def __init_fcstm(self):
+        self.d_id_state = {state.id: state for state in self.state_chart.states}
+        self.d_id_event = {event.id: event for event in self.state_chart.events}
+        self.transition_index = TransitionIndex(self.state_chart.transitions)
+        if self.tree_items:
+            self.populate_tree_state_machine_all_state(self.tree_widget)
+        else:
+            self._init_father_state_index()
 
-        self.populate_tree_state_machine_all_state(self.tree_widget)
-
-    def populate_tree_state_machine_all_state(self, tree_widget: QtWidgets.QTreeWidget):
-        tree_widget.clear()
-
-        def add_state_to_tree(parent_item, state):
-            # 检查是否为父状态的初始状态
-            if parent_item:
-                parent_state = parent_item.data(0, Qt.UserRole)
-                if isinstance(parent_state, CompositeState) and parent_state.initial_state_id == state.id:
-                    # 创建带有图标的文本
-                    icon = qta.icon('fa5s.play', color='#4169E1')  # 使用皇家蓝颜色
-                    item = QtWidgets.QTreeWidgetItem([state.name])
-                    item.setIcon(0, icon)
-                else:
-                    item = QtWidgets.QTreeWidgetItem([state.name])
-            elif self.state_chart.root_state_id == state.id:
-                # 创建带有图标的文本
-                icon = qta.icon('fa5s.play', color='#4169E1')  # 使用皇家蓝颜色
-                item = QtWidgets.QTreeWidgetItem([state.name])
-                item.setIcon(0, icon)
-            else:
-                item = QtWidgets.QTreeWidgetItem([state.name])
-            
-            item.setData(0, Qt.UserRole, state)
-
-            if parent_item:
-                parent_state = parent_item.data(0, Qt.UserRole)
-                self.d_id_father_state[state.id] = parent_state
-                parent_item.addChild(item)
-            else:
-                tree_widget.addTopLevelItem(item)
-            if isinstance(state, CompositeState):
-                for child_state in state.states:
-                    add_state_to_tree(item, child_state)
-
-        #初始化self.d_id_father_state
+    def _init_father_state_index(self):
+        """初始化self.d_id_father_state"""
         for state in self.state_chart.states:
             if isinstance(state, CompositeState):
                 for child_state in state.states:
                     self.d_id_father_state[child_state.id] = state
+
+    def _index_father_states(self, state: State):
+        """为状态的所有子孙状态建立父状态索引"""
+        stack = [state]
+        while stack:
+            cur_state = stack.pop()
+            if isinstance(cur_state, CompositeState):
+                for child_state in cur_state.states:
+                    self.d_id_father_state[child_state.id] = cur_state
+                    stack.append(child_state)
+
+    def populate_tree_state_machine_all_state(self, tree_widget: Optional[QtWidgets.QTreeWidget]):
+        if tree_widget is not None:
+            tree_widget.clear()
+        # 只为self.tree_widget维护 state.id -> 节点 的索引
+        d_id_tree_item = {}
+        if tree_widget is self.tree_widget:
+            self.d_id_tree_item = d_id_tree_item
+
+        self._init_father_state_index()
         for state in self.state_chart.states:
             if self.d_id_father_state.get(state.id, None) is not None:
                 continue
-            add_state_to_tree(None, state)
+            self._add_state_to_tree(tree_widget, None, state, d_id_tree_item)
+
+    def _add_state_to_tree(self, tree_widget: QtWidgets.QTreeWidget, parent_item: Optional[QtWidgets.QTreeWidgetItem],
+                           state: State, d_id_tree_item: Dict[str, QtWidgets.QTreeWidgetItem]):
+        """为状态及其子孙状态创建树节点"""
+        item = QtWidgets.QTreeWidgetItem([state.name])
+        # 检查是否为父状态的初始状态
+        if parent_item:
+            parent_state = parent_item.data(0, Qt.UserRole)
+            if isinstance(parent_state, CompositeState) and parent_state.initial_state_id == state.id:
+                item.setIcon(0, initial_state_icon())
+        elif self.state_chart.root_state_id == state.id:
+            item.setIcon(0, initial_state_icon())
+
+        item.setData(0, Qt.UserRole, state)
+        d_id_tree_item[state.id] = item
+
+        if parent_item:
+            parent_state = parent_item.data(0, Qt.UserRole)
+            self.d_id_father_state[state.id] = parent_state
+            parent_item.addChild(item)
+        elif tree_widget is None:
+            self._detached_top_level_items.append(item)
+        else:
+            tree_widget.addTopLevelItem(item)
+        if isinstance(state, CompositeState):
+            for child_state in state.states:
+                self._add_state_to_tree(tree_widget, item, child_state, d_id_tree_item)
 
 
+    def attach_tree_widget(self, tree_widget: QtWidgets.QTreeWidget):
+        """将构造时创建的树节点一次性挂到树控件上，必须在主线程中调用"""
+        self.tree_widget = tree_widget
+        tree_widget.clear()
+        tree_widget.addTopLevelItems(self._detached_top_level_items)
+        self._detached_top_level_items = []
+
     @property
     def state_chart(self) -> Statechart:
         return self._state_chart
 
+    def get_state(self, state_id: str) -> Optional[State]:
+        """按id获取状态"""
+        return self.d_id_state.get(state_id, None)
+
+    def get_event(self, event_id: str) -> Optional[Event]:
+        """按id获取事件"""
+        return self.d_id_event.get(event_id, None)
+
+    def top_level_states(self) -> List[State]:
+        """获取所有没有父状态的状态"""
+        return [state for state in self.state_chart.states if self.d_id_father_state.get(state.id, None) is None]
+
+    def child_state_ids(self, state_id: Optional[str]) -> List[str]:
+        """获取子状态id，state_id为None时获取所有顶层状态id"""
+        if state_id is None:
+            return [state.id for state in self.top_level_states()]
+        state = self.get_state(state_id)
+        if isinstance(state, CompositeState):
+            return [child_state.id for child_state in state.states]
+        return []
+
+    def has_child_states(self, state_id: Optional[str]) -> bool:
+        if state_id is None:
+            return len(self.state_chart.states) > 0
+        state = self.get_state(state_id)
+        return isinstance(state, CompositeState) and len(state.states) > 0
+
+    def father_state_id(self, state_id: str) -> Optional[str]:
+        father_state = self.d_id_father_state.get(state_id, None)
+        return None if father_state is None else father_state.id
+
+    def is_initial_state(self, state: State) -> bool:
+        """判断状态是否为其父状态（或整个状态机）的初始状态"""
+        father_state = self.d_id_father_state.get(state.id, None)
+        if father_state is None:
+            return self.state_chart.root_state_id == state.id
+        return father_state.initial_state_id == state.id
+
+    def subscribe(self, callback: Callable[[StateChartChange], None]):
+        """注册修改通知的回调"""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[StateChartChange], None]):
+        """注销修改通知的回调"""
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    @contextmanager
+    def batch(self):
+        """在with块中进行的修改合并为一次通知，可以嵌套"""
+        self._batch_depth += 1
+        if self._batch_depth == 1:
+            self._batch_change = StateChartChange()
+            self._batch_deltas = []
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                change, self._batch_change = self._batch_change, None
+                deltas, self._batch_deltas = self._batch_deltas, None
+                if len(deltas) == 1:
+                    self.history.push(deltas[0])
+                elif deltas:
+                    self.history.push(CompoundDelta(deltas))
+                if change:
+                    self._notify(change)
+
+    def _notify(self, change: StateChartChange):
+        for callback in list(self._subscribers):
+            callback(change)
+
+    def _mark_changed(self, change: StateChartChange):
+        """记录一次修改并通知订阅者，处于batch中时推迟到batch结束"""
+        self.revision += 1
+        for state_id in change.subtrees:
+            self._state_change_revisions.append(self.revision)
+            self._state_change_ids.append(state_id)
+        if len(self._state_change_revisions) > self.STATE_CHANGE_LOG_LIMIT:
+            self._trim_state_change_log(self.STATE_CHANGE_LOG_LIMIT // 2)
+        if self._batch_change is not None:
+            self._batch_change.merge(change)
+        else:
+            self._notify(change)
+
+    def _record(self, delta: Delta):
+        """记录一次修改的增量，撤销/重做过程中的修改不记录"""
+        if self.history.applying:
+            return
+        if self._batch_deltas is not None:
+            self._batch_deltas.append(delta)
+        else:
+            self.history.push(delta)
+
+    def undo(self) -> bool:
+        """撤销上一步修改，没有可以撤销的修改时返回False"""
+        return self.history.undo(self)
+
+    def redo(self) -> bool:
+        """重做上一步撤销的修改，没有可以重做的修改时返回False"""
+        return self.history.redo(self)
+
+    def _transition_keys_of_state(self, state_id: str) -> Set:
+        return (self.transition_index.d_src_id_keys.get(state_id, set()) |
+                self.transition_index.d_dst_id_keys.get(state_id, set()))
+
+    def changed_subtrees_since(self, revision: int) -> Set[Optional[str]]:
+        """
+        获取指定版本之后层次结构发生变化的子树根状态id
+
+        指定的版本早于保留的修改记录时返回 ``{None}``，即需要重建所有顶层状态。
+        """
+        if revision < self._state_change_log_base:
+            return {None}
+        start = bisect_right(self._state_change_revisions, revision)
+        return set(self._state_change_ids[start:])
+
+    def _trim_state_change_log(self, keep_count: int):
+        """只保留最近的keep_count条层次结构修改记录"""
+        drop_count = len(self._state_change_revisions) - keep_count
+        if drop_count <= 0:
+            return
+        self._state_change_log_base = self._state_change_revisions[drop_count - 1]
+        del self._state_change_revisions[:drop_count]
+        del self._state_change_ids[:drop_count]
+
+    def get_tree_item(self, state_id: str) -> Optional[QtWidgets.QTreeWidgetItem]:
+        """获取状态在self.tree_widget中对应的节点，不依赖当前选中项"""
+        return self.d_id_tree_item.get(state_id, None)
+
     def add_event(self, parent_widget, new_event_name: str, new_event_guard: str):
         """新增事件"""
         is_validate = True
@@ -91,7 +310,8 @@ class FcstmStateChart:
             self.warning_message(parent_widget, "事件名称已经存在！")
             return
         new_event = Event(new_event_name, new_event_guard)
-        self.state_chart.events.add(new_event)
+        self._insert_event(new_event)
+        self._record(AddEventDelta(new_event))
 
     def edit_event(self, parent_widget, new_event_name: str,
                    new_event_guard: str, old_event_name: str):
@@ -111,57 +331,48 @@ class FcstmStateChart:
 
         if old_event is not None:
             # 输入的事件名称不能已经存在
-            old_event.name = new_event_name
-            old_event.guard = new_event_guard
+            delta = EditEventDelta(old_event, old_event.name, old_event.guard, new_event_name, new_event_guard)
+            self._update_event(old_event, new_event_name, new_event_guard)
+            self._record(delta)
 
     def add_transition(self, parent_widget, new_transition_src_state: State, new_transition_target_state: State, new_transition_event: Event):
-        for cur_transition in self.state_chart.transitions:
-            if (cur_transition.src_state_id == new_transition_src_state.id and cur_transition.dst_state_id == new_transition_target_state.id
-            and cur_transition.event_id == new_transition_event.id):
-                self.warning_message(parent_widget, "迁移已经存在！")
-                return
+        if self.transition_index.get(new_transition_src_state.id, new_transition_target_state.id,
+                                     new_transition_event.id) is not None:
+            self.warning_message(parent_widget, "迁移已经存在！")
+            return
 
         new_transition = Transition(new_transition_src_state, new_transition_target_state, new_transition_event)
-        self.state_chart.transitions.add(new_transition)
+        self._insert_transition(new_transition)
+        self._record(AddTransitionDelta(new_transition))
 
     def edit_transition(self, parent_widget, old_transition_src_state: State, old_transition_target_state: State, old_transition_event: Event,
                         new_transition_src_state: State, new_transition_target_state: State, new_transition_event: Event):
-        old_transition = None
         #找到旧的迁移
-        for cur_transition in self.state_chart.transitions:
-            if (cur_transition.src_state_id == old_transition_src_state.id and cur_transition.dst_state_id == old_transition_target_state.id
-            and cur_transition.event_id == old_transition_event.id):
-                old_transition = cur_transition
+        old_transition = self.transition_index.get(old_transition_src_state.id, old_transition_target_state.id,
+                                                   old_transition_event.id)
         if old_transition is None:
             self.warning_message(parent_widget, "待编辑的迁移不存在！")
             return
         #判断新迁移是否已经存在
-        for cur_transition in self.state_chart.transitions:
-            if(cur_transition.src_state_id == new_transition_src_state.id and cur_transition.dst_state_id == new_transition_target_state.id
-            and cur_transition.event_id == new_transition_event.id):
-                self.warning_message(parent_widget, "编辑后的迁移已经存在！")
-                return
+        if self.transition_index.get(new_transition_src_state.id, new_transition_target_state.id,
+                                     new_transition_event.id) is not None:
+            self.warning_message(parent_widget, "编辑后的迁移已经存在！")
+            return
 
-        old_transition.src_state = new_transition_src_state
-        old_transition.dst_state = new_transition_target_state
-        old_transition.event = new_transition_event
+        delta = EditTransitionDelta(old_transition, old_transition.src_state, old_transition.dst_state,
+                                    old_transition.event, new_transition_src_state, new_transition_target_state,
+                                    new_transition_event)
+        self._retarget_transition(old_transition, new_transition_src_state, new_transition_target_state,
+                                  new_transition_event)
+        self._record(delta)
 
     def del_event(self, parent_widget, event_name: str):
         """删除特定状态下指定名字的事件，以及与该事件相关的迁移"""
         del_event = self.state_chart.events.get_by_name(event_name)
         if not del_event:
             return
-        # 创建一个列表来存储要删除的transition
-        transitions_to_delete = []
-        for cur_transition in self.state_chart.transitions:
-            if cur_transition.event_id == del_event.id:
-                transitions_to_delete.append(cur_transition)
-        
-        # 删除找到的transitions
-        for transition in transitions_to_delete:
-            del self.state_chart.transitions[transition]
-
-        del self.state_chart.events[del_event]
+        removed_transitions = self._remove_event(del_event)
+        self._record(DelEventDelta(del_event, removed_transitions))
 
     def del_transition(self, parent_widget, transition_src_name: str, transition_event_name: str, transition_target_name: str):
         """删除特定状态下指定名字迁移"""
@@ -169,70 +380,108 @@ class FcstmStateChart:
         transition_target_state = self.state_chart.states.get_by_name(transition_target_name)
         transition_event = self.state_chart.events.get_by_name(transition_event_name)
         #导入有问题时的删除
-        del_transition = None
-        for cur_transition in self.state_chart.transitions:
-            if (cur_transition.src_state_id == transition_src_state.id and cur_transition.dst_state_id == transition_target_state.id
-            and cur_transition.event_id == transition_event.id):
-                del_transition = cur_transition
+        if transition_src_state is None or transition_target_state is None or transition_event is None:
+            return
+        del_transition = self.transition_index.get(transition_src_state.id, transition_target_state.id,
+                                                   transition_event.id)
         if del_transition is None:
             return
-        del self.state_chart.transitions[del_transition]
+        self._remove_transition(del_transition)
+        self._record(DelTransitionDelta(del_transition))
 
     def add_state(self, father_state: CompositeState, new_state: State):
         """添加状态"""
-        cur_state_item = QtWidgets.QTreeWidgetItem([new_state.name])
-        cur_state_item.setData(0, Qt.UserRole, new_state)
         self.state_chart.states.add(new_state)
+        self.d_id_state[new_state.id] = new_state
+        self.d_id_father_state[new_state.id] = father_state
         # 如果是添加子状态：
         if father_state is not None:
-            father_item = self.tree_widget.currentItem()
-            self.d_id_father_state[new_state.id] = father_state
             father_state.states.add(new_state)
-            father_item.addChild(cur_state_item)
-        else:
-            self.d_id_father_state[new_state.id] = None
-            self.tree_widget.addTopLevelItem(cur_state_item)
+        if self.tree_items:
+            cur_state_item = QtWidgets.QTreeWidgetItem([new_state.name])
+            cur_state_item.setData(0, Qt.UserRole, new_state)
+            if father_state is not None:
+                self.d_id_tree_item[father_state.id].addChild(cur_state_item)
+            else:
+                self.tree_widget.addTopLevelItem(cur_state_item)
+            self.d_id_tree_item[new_state.id] = cur_state_item
+        self._mark_changed(StateChartChange(
+            states_added=[new_state.id],
+            subtrees=[father_state.id if father_state is not None else None],
+        ))
+        self._record(AddStateDelta(father_state, new_state))
 
     def edit_state(self, pro_state: State, new_state: State):
         del self.state_chart.states[pro_state]
         self.state_chart.states.add(new_state)
-        cur_tree_item = self.tree_widget.currentItem()
-        cur_tree_item.setText(0, new_state.name)
-        cur_tree_item.setData(0, Qt.UserRole, new_state)
-
-    def del_state(self, tree_item, state: State):
+        self.d_id_state.pop(pro_state.id, None)
+        self.d_id_state[new_state.id] = new_state
+        cur_tree_item = self.d_id_tree_item.pop(pro_state.id, None)
+        if cur_tree_item is not None:
+            cur_tree_item.setText(0, new_state.name)
+            cur_tree_item.setData(0, Qt.UserRole, new_state)
+            self.d_id_tree_item[new_state.id] = cur_tree_item
+        # 子状态的父状态引用指向新的状态对象
+        if isinstance(new_state, CompositeState):
+            for child_state in new_state.states:
+                self.d_id_father_state[child_state.id] = new_state
+        self._mark_changed(StateChartChange(
+            states_modified=[new_state.id],
+            transitions_modified=self._transition_keys_of_state(new_state.id),
+            subtrees=[new_state.id],
+        ))
+        self._record(EditStateDelta(pro_state, new_state))
+
+    def del_state(self, tree_item: Optional[QtWidgets.QTreeWidgetItem], state: State):
         """删除状态，如果状态是composite类型的话，要递归删除所有子状态"""
-        def recursive_delete_state(cur_state: State):
-            if cur_state is None:
-                return
-            #删除与当前状态关联的所有迁移
-            transitions_to_delete = []
-            for cur_transition in self.state_chart.transitions:
-                if cur_transition.src_state_id == cur_state.id or cur_transition.dst_state_id == cur_state.id:
-                    transitions_to_delete.append(cur_transition)
-            # 删除找到的transitions
-            for transition in transitions_to_delete:
-                del self.state_chart.transitions[transition]
+        if tree_item is None:
+            tree_item = self.d_id_tree_item.get(state.id, None)
+        father_state = self.d_id_father_state.get(state.id, None)
+        if father_state is not None:
+            del father_state.states[state]
+        if tree_item is not None:
+            parent_item = tree_item.parent()
+            if parent_item:
+                parent_item.removeChild(tree_item)
+            else:
+                index = self.tree_widget.indexOfTopLevelItem(tree_item)
+                self.tree_widget.takeTopLevelItem(index)
+        #删除state的所有相关信息
+        was_initial_state = self.is_initial_state(state)
+        subtree_states = self._collect_state_subtree(state)
+        transitions = self.transition_index.transitions_of_states(cur_state.id for cur_state in subtree_states)
+        change = self._delete_state_subtree(subtree_states, transitions)
+        change.subtrees.add(father_state.id if father_state is not None else None)
+        self._mark_changed(change)
+        self._record(DelStateDelta(father_state, state, subtree_states, transitions, was_initial_state))
+
+    def _collect_state_subtree(self, state: State) -> List[State]:
+        """按先序收集状态及其所有子孙状态"""
+        subtree_states = []
+        stack = [state]
+        while stack:
+            cur_state = stack.pop()
+            subtree_states.append(cur_state)
+            if isinstance(cur_state, CompositeState):
+                stack.extend(reversed(list(cur_state.states)))
+        return subtree_states
+
+    def _delete_state_subtree(self, subtree_states: List[State], transitions: List[Transition]) -> StateChartChange:
+        """从状态机中删除子树中的所有状态，并一次性批量删除通过邻接索引找到的关联迁移"""
+        change = StateChartChange()
+        for transition in transitions:
+            change.transitions_removed.add(transition_key(transition))
+            del self.state_chart.transitions[transition]
+            self.transition_index.remove(transition)
 
+        for cur_state in subtree_states:
+            change.states_removed.add(cur_state.id)
             if cur_state.id in self.d_id_father_state:
                 del self.d_id_father_state[cur_state.id]
-
+            self.d_id_tree_item.pop(cur_state.id, None)
+            self.d_id_state.pop(cur_state.id, None)
             del self.state_chart.states[cur_state]
-            #递归删除所有子状态的信息
-            if isinstance(cur_state, CompositeState):
-                for son_state in cur_state.states:
-                    recursive_delete_state(son_state)
-
-        parent_item = tree_item.parent()
-        if parent_item:
-            parent_state = parent_item.data(0, Qt.UserRole)
-            del parent_state.states[state]
-            parent_item.removeChild(tree_item)
-        else:
-            index = self.tree_widget.indexOfTopLevelItem(tree_item)
-            self.tree_widget.takeTopLevelItem(index)
-        #删除state的所有相关信息
-        recursive_delete_state(state)
+        return change
 
     def change_initial_state(self, father_state: CompositeState, new_initial_state: State):
         """
@@ -242,20 +491,142 @@ class FcstmStateChart:
             father_state: 要修改的复合状态
             new_initial_state: 新的初始状态
         """
-        cur_tree_item = self.tree_widget.currentItem()
-        # 更新复合状态的初始状态ID
+        old_initial_state = self.d_id_state.get(father_state.initial_state_id, None)
+        self._set_initial_state(father_state, new_initial_state)
+        self._record(ChangeInitialStateDelta(father_state, old_initial_state, new_initial_state))
+
+    def _insert_event(self, event: Event):
+        """将事件对象加入状态机，不做合法性检查"""
+        self.state_chart.events.add(event)
+        self.d_id_event[event.id] = event
+        self._mark_changed(StateChartChange(events_added=[event.id]))
+
+    def _update_event(self, event: Event, name: str, guard: str):
+        event.name = name
+        event.guard = guard
+        self._mark_changed(StateChartChange(
+            events_modified=[event.id],
+            transitions_modified=self.transition_index.d_event_id_keys.get(event.id, ()),
+        ))
+
+    def _remove_event(self, event: Event) -> List[Transition]:
+        """删除事件以及与该事件相关的迁移，返回被删除的迁移"""
+        # 通过索引找到所有使用该事件的transition并删除
+        removed_transitions = self.transition_index.transitions_of_event(event.id)
+        for transition in removed_transitions:
+            del self.state_chart.transitions[transition]
+            self.transition_index.remove(transition)
+
+        del self.state_chart.events[event]
+        self.d_id_event.pop(event.id, None)
+        self._mark_changed(StateChartChange(events_removed=[event.id],
+                                            transitions_removed=map(transition_key, removed_transitions)))
+        return removed_transitions
+
+    def _insert_transition(self, transition: Transition):
+        """将迁移对象加入状态机，不做判重"""
+        self.state_chart.transitions.add(transition)
+        self.transition_index.add(transition)
+        self._mark_changed(StateChartChange(transitions_added=[transition_key(transition)]))
+
+    def _retarget_transition(self, transition: Transition, src_state: State, dst_state: State, event: Event):
+        # 迁移的索引键会随端点和事件变化，修改前后需要重新索引
+        old_key = transition_key(transition)
+        self.transition_index.remove(transition)
+        transition.src_state = src_state
+        transition.dst_state = dst_state
+        transition.event = event
+        self.transition_index.add(transition)
+        new_key = transition_key(transition)
+        self._mark_changed(StateChartChange(transitions_removed=[old_key], transitions_added=[new_key],
+                                            transitions_rekeyed={old_key: new_key}))
+
+    def _remove_transition(self, transition: Transition):
+        del self.state_chart.transitions[transition]
+        self.transition_index.remove(transition)
+        self._mark_changed(StateChartChange(transitions_removed=[transition_key(transition)]))
+
+    def _insert_state_subtree(self, father_state: Optional[CompositeState], state: State,
+                              subtree_states: List[State], transitions: List[Transition]):
+        """将 ``del_state`` 删除的子树和迁移重新加入状态机"""
+        for cur_state in subtree_states:
+            self.state_chart.states.add(cur_state)
+            self.d_id_state[cur_state.id] = cur_state
+        if father_state is not None:
+            father_state.states.add(state)
+        if not self.tree_items:
+            self._index_father_states(state)
+        elif father_state is not None:
+            self._add_state_to_tree(self.tree_widget, self.d_id_tree_item[father_state.id], state, self.d_id_tree_item)
+        else:
+            self._add_state_to_tree(self.tree_widget, None, state, self.d_id_tree_item)
+        self.d_id_father_state[state.id] = father_state
+        for transition in transitions:
+            self.state_chart.transitions.add(transition)
+            self.transition_index.add(transition)
+        self._mark_changed(StateChartChange(
+            states_added=[cur_state.id for cur_state in subtree_states],
+            transitions_added=map(transition_key, transitions),
+            subtrees=[father_state.id if father_state is not None else None],
+        ))
+
+    def _insert_states(self, states: List[Tuple[Optional[CompositeState], State]]):
+        """
+        批量加入状态，父状态可以是同一批中较早加入的状态
+
+        树节点在所有状态加入后一次性创建，期间关闭树控件的刷新。
+        """
+        if not states:
+            return
+        change = StateChartChange()
+        for father_state, new_state in states:
+            self.state_chart.states.add(new_state)
+            self.d_id_state[new_state.id] = new_state
+            self.d_id_father_state[new_state.id] = father_state
+            if father_state is not None:
+                father_state.states.add(new_state)
+            change.states_added.add(new_state.id)
+
+        for father_state, new_state in states:
+            if father_state is None:
+                change.subtrees.add(None)
+            elif father_state.id not in change.states_added:
+                change.subtrees.add(father_state.id)
+        if self.tree_items:
+            self.tree_widget.setUpdatesEnabled(False)
+            try:
+                for father_state, new_state in states:
+                    if father_state is None:
+                        self._add_state_to_tree(self.tree_widget, None, new_state, self.d_id_tree_item)
+                    elif father_state.id not in change.states_added:
+                        # 新状态的子孙状态在为其创建节点时一并创建
+                        self._add_state_to_tree(self.tree_widget, self.d_id_tree_item[father_state.id], new_state,
+                                                self.d_id_tree_item)
+            finally:
+                self.tree_widget.setUpdatesEnabled(True)
+        self._mark_changed(change)
+
+    def bulk_add(self, states=(), events=(), transitions=(), atomic: bool = True) -> BulkEditReport:
+        """批量添加状态、事件和迁移，不弹出对话框，参数和返回值见 :func:`bulk_edit.bulk_add`"""
+        return bulk_add(self, states, events, transitions, atomic)
+
+    def _set_initial_state(self, father_state: CompositeState, initial_state: Optional[State]):
+        change = StateChartChange(states_modified=[father_state.id], subtrees=[father_state.id])
+        # 清除旧初始状态的图标
         if father_state.initial_state_id is not None:
-            father_state_item = cur_tree_item.parent()
-            for i in range(father_state_item.childCount()):
-                child_item = father_state_item.child(i)
-                child_state = child_item.data(0, Qt.UserRole)
-                if child_state.id == father_state.initial_state_id:
-                    #child_item.setText(0, f"{child_state.name}")
-                    child_item.setIcon(0, QIcon())
-        icon = qta.icon('fa5s.play', color='#4169E1')
-
-        father_state.initial_state = new_initial_state
-        cur_tree_item.setIcon(0, icon)
+            change.states_modified.add(father_state.initial_state_id)
+            old_initial_item = self.d_id_tree_item.get(father_state.initial_state_id, None)
+            if old_initial_item is not None:
+                old_initial_item.setIcon(0, QIcon())
+
+        # 更新复合状态的初始状态ID
+        father_state.initial_state = initial_state
+        if initial_state is not None:
+            change.states_modified.add(initial_state.id)
+            new_initial_item = self.d_id_tree_item.get(initial_state.id, None)
+            if new_initial_item is not None:
+                new_initial_item.setIcon(0, initial_state_icon())
+        self._mark_changed(change)
 
     def warning_message(self, parent_widget, message: str):
         QtWidgets.QMessageBox.warning(
@@ -264,21 +635,3 @@ class FcstmStateChart:
             message,
             QtWidgets.QMessageBox.Ok
         )
-
-    def legality_check(self, parent_widget):
-        illegal_transitions = []
-        warning_str = []
-        for cur_transition in self.state_chart.transitions:
-            cur_transition_src_state = cur_transition.src_state
-            cur_transition_dst_state = cur_transition.dst_state
-            cur_transition_event = cur_transition.event
-            if (not cur_transition_src_state or not cur_transition_dst_state or
-            not cur_transition_event):
-                illegal_transitions.append(cur_transition)
-                cur_str = (f'{cur_transition_src_state.name if cur_transition_src_state is not None else ""}'
-                           f'-->{cur_transition_dst_state.name if cur_transition_dst_state is not None else ""}, '
-                           f'事件:{cur_transition_event.name if cur_transition_event is not None else ""}')
-                warning_str.append(cur_str)
-
-        if illegal_transitions:
-            self.warning_message(parent_widget, f"以下不合法的迁移将被删除: {"".join(warning_str)}")
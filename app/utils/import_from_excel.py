@@ -0,0 +1,345 @@
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from openpyxl import load_workbook
+from pyfcstm.model import CompositeState, Event, NormalState, PseudoState, State, Statechart, Transition
+
+from .export_to_excel import TRANSITIONS_HEADERS, join_state_path
+
+_STATE_TYPES = {'Normal': NormalState, 'Composite': CompositeState, 'Pseudo': PseudoState}
+#: 必须存在的列，其余列缺失时按空值处理
+_REQUIRED_HEADERS = {
+    "States": ["状态名称", "状态类型"],
+    "Events": ["事件名称"],
+    "Transitions": TRANSITIONS_HEADERS,
+}
+
+
+class ExcelImportIssue:
+    """导入时发现的一条问题，row为工作表中的行号（从1开始，表头为第1行），与工作表本身有关时为None"""
+    ERROR = 'error'
+    WARNING = 'warning'
+
+    def __init__(self, severity: str, sheet: str, row: Optional[int], message: str):
+        self.severity = severity
+        self.sheet = sheet
+        self.row = row
+        self.message = message
+
+    def __str__(self):
+        location = self.sheet if self.row is None else f'{self.sheet}!{self.row}'
+        return f'[{location}] {self.message}'
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.severity} {self}>'
+
+
+class ExcelImportReport:
+    """
+    导入结果报告
+
+    错误表示该行被跳过，警告表示该行已导入但其中的部分内容被忽略。
+    """
+
+    def __init__(self):
+        self.issues: List[ExcelImportIssue] = []
+        self.state_count = 0
+        self.event_count = 0
+        self.transition_count = 0
+
+    def error(self, sheet: str, row: Optional[int], message: str):
+        self.issues.append(ExcelImportIssue(ExcelImportIssue.ERROR, sheet, row, message))
+
+    def warning(self, sheet: str, row: Optional[int], message: str):
+        self.issues.append(ExcelImportIssue(ExcelImportIssue.WARNING, sheet, row, message))
+
+    @property
+    def errors(self) -> List[ExcelImportIssue]:
+        return [issue for issue in self.issues if issue.severity == ExcelImportIssue.ERROR]
+
+    @property
+    def warnings(self) -> List[ExcelImportIssue]:
+        return [issue for issue in self.issues if issue.severity == ExcelImportIssue.WARNING]
+
+    def format_issues(self, limit: int = 20) -> str:
+        """每行一条问题，最多列出limit条"""
+        lines = [('错误' if issue.severity == ExcelImportIssue.ERROR else '警告') + f'：{issue}'
+                 for issue in self.issues[:limit]]
+        if len(self.issues) > limit:
+            lines.append(f'……共 {len(self.issues)} 条')
+        return '\n'.join(lines)
+
+
+class ExcelImportError(Exception):
+    """Excel文件无法构造出状态机（缺少工作表、表头或根状态），report中包含全部问题"""
+
+    def __init__(self, message: str, report: ExcelImportReport):
+        Exception.__init__(self, message)
+        self.report = report
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _time_lock(value: Any) -> Optional[int]:
+    """时间锁为空时返回None，不是整数时抛出ValueError"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, bool):
+        raise ValueError(value)
+    if isinstance(value, float):
+        if not value.is_integer():
+            raise ValueError(value)
+        return int(value)
+    return int(value)
+
+
+def _iter_sheet_rows(wb, sheet_name: str, report: ExcelImportReport,
+                     on_row: Callable[[], None]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    逐行读取工作表，产生 (行号, {表头: 值})，跳过空行
+
+    只读模式下行数据在迭代时才从文件中解析，不会整体载入内存。
+    """
+    if sheet_name not in wb.sheetnames:
+        report.error(sheet_name, None, f"缺少工作表 {sheet_name}")
+        return
+    rows = wb[sheet_name].iter_rows(values_only=True)
+    header_row = next(rows, None) or ()
+    d_header_col = {}
+    for col, header in enumerate(header_row):
+        header = _text(header)
+        if header and header not in d_header_col:
+            d_header_col[header] = col
+    missing = [header for header in _REQUIRED_HEADERS[sheet_name] if header not in d_header_col]
+    if missing:
+        report.error(sheet_name, 1, f"缺少列：{', '.join(missing)}")
+        return
+    columns = list(d_header_col.items())
+    for row_index, values in enumerate(rows, start=2):
+        on_row()
+        if values is None or all(value is None or value == '' for value in values):
+            continue
+        yield row_index, {header: values[col] if col < len(values) else None for header, col in columns}
+
+
+class _StateIndex:
+    """
+    按路径查找状态
+
+    状态名称可以重复，导出的文件以从根状态开始的路径引用状态；
+    旧版本导出或手工编写的文件以名称引用，路径找不到时再按名称查找，名称不唯一时视为找不到。
+    """
+
+    def __init__(self):
+        self.d_path_state: Dict[str, State] = {}
+        self.d_name_states: Dict[str, List[State]] = {}
+
+    def __contains__(self, path: str) -> bool:
+        return path in self.d_path_state
+
+    def __len__(self) -> int:
+        return len(self.d_path_state)
+
+    def add(self, path: str, state: State):
+        self.d_path_state[path] = state
+        self.d_name_states.setdefault(state.name, []).append(state)
+
+    def find(self, text: str) -> Optional[State]:
+        state = self.d_path_state.get(text, None)
+        if state is None:
+            states = self.d_name_states.get(text, [])
+            if len(states) == 1:
+                state = states[0]
+        return state
+
+    def states(self) -> List[State]:
+        return list(self.d_path_state.values())
+
+
+def _read_states(wb, report: ExcelImportReport, on_row: Callable[[], None]) \
+        -> Tuple[_StateIndex, List[Tuple[int, State, str, str]]]:
+    """读取状态工作表，返回状态索引和待解析的 (行号, 状态, 父状态路径, 初始状态名称)"""
+    state_index = _StateIndex()
+    pending: List[Tuple[int, State, str, str]] = []
+    for row, values in _iter_sheet_rows(wb, "States", report, on_row):
+        name = _text(values["状态名称"])
+        if not name:
+            report.error("States", row, "状态名称为空")
+            continue
+        father_path = _text(values.get("父状态", None))
+        # 状态自身的路径由父状态一列得到，与行的顺序无关
+        path = join_state_path(father_path, name)
+        if path in state_index:
+            report.error("States", row, f"状态 {path} 重复")
+            continue
+        type_name = _text(values["状态类型"]) or 'Normal'
+        if type_name not in _STATE_TYPES:
+            report.error("States", row, f"未知的状态类型 {type_name}")
+            continue
+
+        time_locks = {}
+        for header, field in (("Min时间锁", 'min_time_lock'), ("Max时间锁", 'max_time_lock')):
+            try:
+                time_locks[field] = _time_lock(values.get(header, None))
+            except (TypeError, ValueError):
+                report.warning("States", row, f"{header} {values[header]!r} 不是整数，已忽略")
+                time_locks[field] = None
+
+        state = _STATE_TYPES[type_name](
+            name=name,
+            description=_text(values.get("状态描述", None)),
+            on_entry=_text(values.get("Entry动作", None)),
+            on_during=_text(values.get("During动作", None)),
+            on_exit=_text(values.get("Exit动作", None)),
+            **time_locks,
+        )
+        state_index.add(path, state)
+        pending.append((row, state, father_path, _text(values.get("初始状态", None))))
+    return state_index, pending
+
+
+def _build_hierarchy(state_index: _StateIndex, pending: Sequence[Tuple[int, State, str, str]],
+                     report: ExcelImportReport) -> Optional[State]:
+    """根据父状态路径建立层次结构并设置初始状态，返回根状态"""
+    d_id_row = {state.id: row for row, state, _, _ in pending}
+    d_id_father: Dict[str, State] = {}
+    for row, state, father_path, _ in pending:
+        if not father_path:
+            continue
+        father_state = state_index.find(father_path)
+        if father_state is None:
+            report.warning("States", row, f"父状态 {father_path} 不存在，作为顶层状态导入")
+        elif not isinstance(father_state, CompositeState):
+            report.warning("States", row, f"父状态 {father_path} 不是复合状态，作为顶层状态导入")
+        else:
+            d_id_father[state.id] = father_state
+
+    # 沿父状态链查找循环，每个状态只访问一次；在循环上的一个状态处断开，使其成为顶层状态
+    resolved = set()
+    for _, state, _, _ in pending:
+        path_ids = set()
+        current = state
+        while current.id in d_id_father and current.id not in resolved and current.id not in path_ids:
+            path_ids.add(current.id)
+            current = d_id_father[current.id]
+        if current.id in path_ids:
+            del d_id_father[current.id]
+            report.warning("States", d_id_row[current.id], "父状态形成循环，作为顶层状态导入")
+        resolved.update(path_ids)
+
+    roots = []
+    for row, state, _, _ in pending:
+        if state.id in d_id_father:
+            d_id_father[state.id].states.add(state)
+        else:
+            roots.append((row, state))
+
+    # 初始状态是子状态的名称，在该状态的子状态中查找
+    d_id_name_child: Dict[str, Dict[str, State]] = {}
+    for _, state, _, _ in pending:
+        if state.id in d_id_father:
+            d_id_name_child.setdefault(d_id_father[state.id].id, {}).setdefault(state.name, state)
+    for row, state, _, initial_name in pending:
+        if not initial_name:
+            continue
+        initial_state = d_id_name_child.get(state.id, {}).get(initial_name, None)
+        if not isinstance(state, CompositeState):
+            report.warning("States", row, "只有复合状态可以设置初始状态，已忽略")
+        elif initial_state is None:
+            report.warning("States", row, f"初始状态 {initial_name} 不是该状态的子状态，已忽略")
+        else:
+            state.initial_state = initial_state
+
+    if not roots:
+        report.error("States", None, "没有根状态（父状态为空的状态）")
+        return None
+    if len(roots) > 1:
+        # 旧版本导出的文件没有父状态列，第一个状态是根状态
+        root_row, root_state = roots[0]
+        if isinstance(root_state, CompositeState):
+            for row, state in roots[1:]:
+                root_state.states.add(state)
+            report.warning("States", None,
+                           f"有 {len(roots)} 个状态没有父状态，已全部放入第一个状态 {root_state.name} 中")
+        else:
+            report.error("States", root_row, f"有 {len(roots)} 个状态没有父状态，且第一个状态不是复合状态")
+            return None
+    return roots[0][1]
+
+
+def import_statechart_from_excel(file_path: str, progress: Optional[Callable[[int], None]] = None) \
+        -> Tuple[Statechart, ExcelImportReport]:
+    """
+    从 :func:`export_statechart_to_excel` 格式的Excel文件导入状态机
+
+    以openpyxl的只读模式逐行读取States、Events、Transitions三个工作表，不会把整个工作簿载入内存；
+    按表头名称查找列，状态路径和事件名称通过字典索引解析。
+    有问题的行被跳过或部分忽略，并记录在返回的报告中；无法构造状态机时抛出 :class:`ExcelImportError`。
+    状态机名称取文件名。
+
+    :param progress: 每读取一定数量的行后以已读取的行数调用，可以通过抛出异常中止导入
+    """
+    report = ExcelImportReport()
+    row_count = 0
+
+    def on_row():
+        nonlocal row_count
+        row_count += 1
+        if progress is not None and row_count % 1000 == 0:
+            progress(row_count)
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        state_index, pending = _read_states(wb, report, on_row)
+        root_state = _build_hierarchy(state_index, pending, report)
+        if root_state is None:
+            raise ExcelImportError("Excel文件中没有可以导入的状态机", report)
+        state_chart = Statechart(name=os.path.splitext(os.path.basename(file_path))[0], root_state=root_state,
+                                 states=state_index.states())
+        report.state_count = len(state_index)
+
+        d_name_event: Dict[str, Event] = {}
+        for row, values in _iter_sheet_rows(wb, "Events", report, on_row):
+            name = _text(values["事件名称"])
+            if not name:
+                report.error("Events", row, "事件名称为空")
+            elif name in d_name_event:
+                report.error("Events", row, f"事件名称 {name} 重复")
+            else:
+                d_name_event[name] = event = Event(name, _text(values.get("事件条件", None)) or None)
+                state_chart.events.add(event)
+        report.event_count = len(d_name_event)
+
+        transition_keys = set()
+        for row, values in _iter_sheet_rows(wb, "Transitions", report, on_row):
+            src_name, dst_name, event_name = (_text(values[header]) for header in TRANSITIONS_HEADERS)
+            src_state = state_index.find(src_name)
+            dst_state = state_index.find(dst_name)
+            event = d_name_event.get(event_name, None)
+            missing = [f"{kind} {name!r}" for kind, name, found in (("起始状态", src_name, src_state),
+                                                                      ("目标状态", dst_name, dst_state),
+                                                                      ("触发事件", event_name, event))
+                       if found is None]
+            if missing:
+                report.error("Transitions", row, f"{'、'.join(missing)} 不存在")
+                continue
+            key = (src_state.id, dst_state.id, event.id)
+            if key in transition_keys:
+                report.warning("Transitions", row, "迁移重复，已忽略")
+                continue
+            transition_keys.add(key)
+            state_chart.transitions.add(Transition(src_state, dst_state, event))
+        report.transition_count = len(transition_keys)
+    finally:
+        # 只读模式下工作簿保持文件打开，需要显式关闭
+        wb.close()
+
+    if progress is not None:
+        progress(row_count)
+    return state_chart, report
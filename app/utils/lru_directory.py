@@ -0,0 +1,87 @@
+import os
+from typing import Callable, Collection, List, Optional, Tuple
+
+from .atomic_write import atomic_write
+
+#: 超出容量时删除到容量的这个比例以下，避免之后每次写入都要清理
+EVICT_RATIO = 0.9
+
+
+class LruDirectory:
+    """
+    按容量进行LRU淘汰的缓存目录
+
+    每个缓存项是目录中的一个文件，原子地写入；命中时更新文件的修改时间，淘汰时删除修改时间最早的文件，
+    因此多个进程可以共享同一个目录。
+    """
+
+    def __init__(self, directory: str, max_bytes: int, suffixes: Collection[str]):
+        """
+        :param max_bytes: 缓存文件的总大小上限
+        :param suffixes: 缓存文件的后缀，其他文件不计入容量也不会被淘汰
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffixes = suffixes
+        # 缓存文件总大小的估计值，第一次写入时扫描目录得到，淘汰时重新计算
+        self._total_size: Optional[int] = None
+
+    @staticmethod
+    def touch(entry_path: str):
+        """缓存命中时更新修改时间，作为最近使用时间"""
+        try:
+            os.utime(entry_path)
+        except OSError:
+            pass
+
+    def store(self, entry_path: str, size: int, write: Callable[[str], None]):
+        """
+        调用write(临时文件路径)原子地写入缓存项，超出容量时淘汰最久没有使用的文件；单个文件超过容量时不缓存
+        """
+        if size > self.max_bytes:
+            return
+        os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+        with atomic_write(entry_path) as temp_path:
+            write(temp_path)
+        if self._total_size is None:
+            self._total_size = self.total_size()
+        else:
+            self._total_size += size
+        if self._total_size > self.max_bytes:
+            self.evict(int(self.max_bytes * EVICT_RATIO))
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """(修改时间, 大小, 路径)"""
+        entries = []
+        if not os.path.isdir(self.directory):
+            return entries
+        for dir_path, _, file_names in os.walk(self.directory):
+            for file_name in file_names:
+                # 跳过其他进程正在写入的临时文件
+                if file_name.startswith('.') or os.path.splitext(file_name)[1] not in self.suffixes:
+                    continue
+                file_path = os.path.join(dir_path, file_name)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, file_path))
+        return entries
+
+    def total_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self, target_bytes: int):
+        """删除最久没有使用的文件，直到总大小不超过target_bytes"""
+        entries = sorted(self._entries())
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, file_path in entries:
+            if total_size <= target_bytes:
+                break
+            try:
+                os.remove(file_path)
+            except FileNotFoundError:
+                # 已经被其他进程删除
+                pass
+            total_size -= size
+        self._total_size = total_size
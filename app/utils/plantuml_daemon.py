@@ -0,0 +1,213 @@
+import atexit
+import collections
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from typing import List, Optional, Sequence
+
+from app.config import PLANTUML_JAR_PATH
+
+#: PNG文件头
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+class PlantumlRenderError(Exception):
+    """PlantUML渲染失败"""
+
+
+class PlantumlRenderCanceled(Exception):
+    """渲染被取消"""
+
+
+def find_java() -> str:
+    """优先使用JAVA_HOME中的java，其次是PATH中的java"""
+    java_home = os.environ.get('JAVA_HOME', None)
+    if java_home:
+        for name in ('java', 'java.exe'):
+            java = os.path.join(java_home, 'bin', name)
+            if os.path.isfile(java):
+                return java
+    java = shutil.which('java')
+    if java is None:
+        raise PlantumlRenderError("找不到java，请安装Java或设置JAVA_HOME")
+    return java
+
+
+class PlantumlDaemon:
+    """
+    常驻的PlantUML渲染进程
+
+    以 ``-pipe`` 模式启动一个Java进程，之后每次渲染只需要把PlantUML代码写入它的标准输入，
+    再从标准输出读取图片，直到 ``-pipedelimitor`` 指定的分隔行为止，不再为每张图重新启动JVM。
+    进程在第一次渲染时启动；进程崩溃（写入失败或标准输出关闭）时自动重新启动并重试一次，
+    渲染超时或被取消时结束进程，下一次渲染时重新启动。可以在多个线程中使用，渲染请求依次处理。
+    """
+    DEFAULT_TIMEOUT = 60.0
+    #: 等待输出时检查取消请求的间隔
+    CANCEL_POLL_INTERVAL = 0.1
+    #: 保留的标准错误输出行数，用于错误信息
+    STDERR_LINES = 20
+
+    def __init__(self, plantuml_jar: str = PLANTUML_JAR_PATH, java: Optional[str] = None,
+                 launcher: Optional[Sequence[str]] = None):
+        """
+        :param launcher: 启动PlantUML的命令（不含 ``-pipe`` 等参数），默认为 ``java -jar plantuml_jar``
+        """
+        self.plantuml_jar = plantuml_jar
+        self.java = java
+        self.launcher = list(launcher) if launcher is not None else None
+        self.delimiter = f'~~fcstm-ui-plantuml-{uuid.uuid4().hex}~~'
+        self.start_count = 0
+        self._process: Optional[subprocess.Popen] = None
+        self._stderr_thread: Optional[threading.Thread] = None
+        self._chunks: Optional[queue.Queue] = None
+        self._stderr_lines = collections.deque(maxlen=self.STDERR_LINES)
+        self._buffer = b''
+        self._lock = threading.Lock()
+
+    def _command(self) -> List[str]:
+        if self.launcher is not None:
+            launcher = self.launcher
+        else:
+            launcher = [self.java or find_java(), '-Djava.awt.headless=true', '-jar', self.plantuml_jar]
+        return launcher + ['-pipe', '-tpng', '-charset', 'UTF-8', '-pipedelimitor', self.delimiter]
+
+    @property
+    def is_running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def _start(self):
+        self._stop()
+        # Windows下不为Java进程弹出控制台窗口
+        process = subprocess.Popen(self._command(), stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE, creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+        chunks = queue.Queue()
+        # 标准输出和标准错误都由后台线程读取，避免管道写满后阻塞PlantUML进程，也便于实现超时
+        threading.Thread(target=self._read_stdout, args=(process.stdout, chunks), daemon=True).start()
+        self._stderr_thread = threading.Thread(target=self._read_stderr, args=(process.stderr,), daemon=True)
+        self._stderr_thread.start()
+        self._process = process
+        self._chunks = chunks
+        self._buffer = b''
+        self.start_count += 1
+
+    @staticmethod
+    def _read_stdout(stdout, chunks: queue.Queue):
+        while True:
+            chunk = stdout.read1(65536)
+            if not chunk:
+                break
+            chunks.put(chunk)
+        # None表示进程的标准输出已经关闭
+        chunks.put(None)
+
+    def _read_stderr(self, stderr):
+        for line in stderr:
+            self._stderr_lines.append(line.decode('utf-8', errors='replace').rstrip())
+
+    def _stop(self):
+        process, self._process = self._process, None
+        if process is None:
+            return
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+        # 等待读完进程退出前的错误输出
+        self._stderr_thread.join(timeout=1.0)
+
+    def _read_image(self, timeout: float, cancel_event: Optional[threading.Event] = None) -> bytes:
+        delimiter = self.delimiter.encode('ascii')
+        deadline = time.monotonic() + timeout
+        while True:
+            index = self._buffer.find(delimiter)
+            if index >= 0:
+                image = self._buffer[:index]
+                rest = self._buffer[index + len(delimiter):]
+                # 分隔行以平台相关的换行符结束
+                self._buffer = rest[2:] if rest.startswith(b'\r\n') else rest[1:] if rest.startswith(b'\n') else rest
+                return image
+            if cancel_event is not None and cancel_event.is_set():
+                raise PlantumlRenderCanceled()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"PlantUML渲染超过 {timeout} 秒没有完成")
+            if cancel_event is not None:
+                remaining = min(remaining, self.CANCEL_POLL_INTERVAL)
+            try:
+                chunk = self._chunks.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if chunk is None:
+                raise BrokenPipeError("PlantUML进程已退出")
+            self._buffer += chunk
+
+    def _render_once(self, plantuml_code: str, timeout: float,
+                     cancel_event: Optional[threading.Event] = None) -> bytes:
+        if not self.is_running:
+            self._start()
+        self._stderr_lines.clear()
+        data = plantuml_code.rstrip('\n').encode('utf-8') + b'\n'
+        self._process.stdin.write(data)
+        self._process.stdin.flush()
+        return self._read_image(timeout, cancel_event)
+
+    def render(self, plantuml_code: str, timeout: float = DEFAULT_TIMEOUT,
+               cancel_event: Optional[threading.Event] = None) -> bytes:
+        """
+        将一段 ``@startuml`` ... ``@enduml`` 代码渲染为PNG图片数据
+
+        :param cancel_event: 渲染过程中被设置时结束PlantUML进程并抛出 :class:`PlantumlRenderCanceled`
+        """
+        with self._lock:
+            for attempt in range(2):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise PlantumlRenderCanceled()
+                try:
+                    image = self._render_once(plantuml_code, timeout, cancel_event)
+                except (TimeoutError, PlantumlRenderCanceled):
+                    # 进程状态未知，丢弃它，下次渲染时重新启动
+                    self._stop()
+                    raise
+                except (OSError, ValueError) as e:
+                    # 进程无法启动或已经崩溃（BrokenPipeError也是OSError）：重新启动后重试一次
+                    self._stop()
+                    details = '\n'.join(self._stderr_lines) or str(e)
+                    if attempt:
+                        raise PlantumlRenderError(f"PlantUML进程异常退出：\n{details}") from e
+                    continue
+                if not image.startswith(PNG_SIGNATURE):
+                    details = '\n'.join(self._stderr_lines) or image[:1000].decode('utf-8', errors='replace')
+                    raise PlantumlRenderError(f"PlantUML没有生成PNG图片：\n{details}")
+                return image
+
+    def render_to_file(self, plantuml_code: str, png_file: str, timeout: float = DEFAULT_TIMEOUT):
+        data = self.render(plantuml_code, timeout=timeout)
+        with open(png_file, 'wb') as f:
+            f.write(data)
+
+    def close(self):
+        """结束PlantUML进程，之后再次渲染时会重新启动"""
+        with self._lock:
+            self._stop()
+
+
+_default_daemon: Optional[PlantumlDaemon] = None
+_default_daemon_lock = threading.Lock()
+
+
+def get_plantuml_daemon() -> PlantumlDaemon:
+    """当前进程共享的PlantUML渲染进程，进程退出时自动结束"""
+    global _default_daemon
+    with _default_daemon_lock:
+        if _default_daemon is None:
+            _default_daemon = PlantumlDaemon()
+            atexit.register(_default_daemon.close)
+        return _default_daemon
@@ -1,24 +1,36 @@
 import os
 import subprocess
-from typing import Dict, List
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Union
 from pyfcstm.model import State, CompositeState, NormalState, PseudoState, Transition, Event, Statechart
-from app.utils.fcstm_state_chart import FcstmStateChart
-from plantumlcli import LocalPlantuml
-from app.config import PLANTUML_JAR_PATH
+from app.utils.diagram_cache import DiagramCache
+from app.utils.plantuml_daemon import get_plantuml_daemon
+
+if TYPE_CHECKING:
+    # FcstmStateChart依赖Qt控件，批量转换的子进程只使用Statechart，不需要加载Qt
+    from app.utils.fcstm_state_chart import FcstmStateChart
 
 
 class ShowStateGraph:
     @classmethod
-    def generate_plantuml_statechart(cls, fcstm_state_chart: FcstmStateChart) -> str:
+    def generate_plantuml_statechart(cls, fcstm_state_chart: Union['FcstmStateChart', Statechart]) -> str:
         """
         生成 PlantUML 状态图代码
 
         Args:
-            fcstm_state_chart: FcstmStateChart
+            fcstm_state_chart: FcstmStateChart，或者不带界面索引的Statechart（命令行批量导出时使用）
 
         Returns:
             str: PlantUML 代码
         """
+        if isinstance(fcstm_state_chart, Statechart):
+            state_chart = fcstm_state_chart
+        else:
+            state_chart = fcstm_state_chart.state_chart
+        # 所有复合状态的子状态id，不在其中的复合状态是顶层状态
+        child_state_ids = {sub_state.id for state in state_chart.states if isinstance(state, CompositeState)
+                           for sub_state in state.states}
+
         # 开始 PlantUML 代码
         plantuml_code = ["@startuml", ""]
 
@@ -53,9 +65,11 @@ class ShowStateGraph:
 
             if is_root_state:
                 state_lines.append(f"[*] --> {state_name.replace(' ', '_')}")  # 添加初始箭头
-                state_lines.append(f"state \"{state_name}\" as {state_name.replace(' ', '_')} {state_type} {{")
-            else:
-                state_lines.append(f"state \"{state_name}\" as {state_name.replace(' ', '_')} {state_type} {{")
+            if isinstance(state, NormalState):
+                # 普通状态没有子状态，不需要花括号
+                state_lines.append(f"state \"{state_name}\" as {state_name.replace(' ', '_')} {state_type}")
+                return state_lines
+            state_lines.append(f"state \"{state_name}\" as {state_name.replace(' ', '_')} {state_type} {{")
             '''
             # 添加状态进入/退出动作
             if state.on_entry:
@@ -76,15 +90,15 @@ class ShowStateGraph:
             state_lines.append("}")
             return state_lines
 
-        for state in fcstm_state_chart.state_chart.states:
-            if isinstance(state, CompositeState) and fcstm_state_chart.d_id_father_state.get(state.id, None) is None:
+        for state in state_chart.states:
+            if isinstance(state, CompositeState) and state.id not in child_state_ids:
                 # 处理根状态
-                if state.id == fcstm_state_chart.state_chart.root_state_id:
+                if state.id == state_chart.root_state_id:
                     plantuml_code.extend(process_state(state, True))
                 else:
                     plantuml_code.extend(process_state(state, False))
         # 处理迁移
-        for transition in fcstm_state_chart.state_chart.transitions:
+        for transition in state_chart.transitions:
             src_state = transition.src_state.name.replace(' ', '_')
             target_state = transition.dst_state.name.replace(' ', '_')
             event = transition.event.name
@@ -95,11 +109,39 @@ class ShowStateGraph:
         return "\n".join(plantuml_code)
 
     @classmethod
-    def show_state_graph(cls, fcstm_state_chart: FcstmStateChart, png_file):
+    def render_png(cls, plantuml_code: str, cache: Optional[DiagramCache] = None,
+                   cancel_event: Optional[threading.Event] = None) -> bytes:
+        """
+        用常驻的本地PlantUML进程将代码渲染为PNG图片数据，不再为每张图启动JVM
+
+        指定cache时，相同的PlantUML代码只渲染一次；cancel_event被设置时结束渲染进程并抛出
+        :class:`PlantumlRenderCanceled`。
+        """
+        if cache is not None:
+            data = cache.get(plantuml_code)
+            if data is not None:
+                return data
+        data = get_plantuml_daemon().render(plantuml_code, cancel_event=cancel_event)
+        if cache is not None:
+            try:
+                cache.put(plantuml_code, data)
+            except OSError:
+                # 缓存目录无法写入时只是不缓存
+                pass
+        return data
+
+    @classmethod
+    def dump_png(cls, plantuml_code: str, png_file, cache: Optional[DiagramCache] = None):
+        """将代码渲染为PNG文件"""
+        data = cls.render_png(plantuml_code, cache=cache)
+        with open(png_file, 'wb') as f:
+            f.write(data)
+
+    @classmethod
+    def show_state_graph(cls, fcstm_state_chart: Union['FcstmStateChart', Statechart], png_file,
+                         cache: Optional[DiagramCache] = None):
+        """渲染状态机图到png_file，指定cache时生成的PlantUML代码没有变化则直接使用缓存的图片"""
         # 生成 PlantUML 代码
         plantuml_code = cls.generate_plantuml_statechart(fcstm_state_chart)
-        print(plantuml_code)
-        local = LocalPlantuml.autoload(plantuml=PLANTUML_JAR_PATH)
-        # print(local.dump_txt(code))  # print text graph of code
-        local.dump(png_file, 'png', plantuml_code)  # save png to /my/path/source_local.png
+        cls.dump_png(plantuml_code, png_file, cache=cache)
         # 保存 PlantUML 代码到文件
\ No newline at end of file
@@ -0,0 +1,75 @@
+from typing import Dict, Iterable, Optional, Set
+
+from .transition_index import TransitionKey
+
+
+class StateChartChange:
+    """
+    状态机的一次修改（或一批合并后的修改）所涉及的元素
+
+    状态和事件以id表示，迁移以索引键 (源状态id, 目标状态id, 事件id) 表示。
+    ``subtrees`` 为层次结构（名称、子状态、初始状态）发生变化的子树根状态id，None表示顶层状态。
+    修改迁移的端点或事件时索引键会变化，除了记为删除旧键、新增新键之外，还在 ``transitions_rekeyed`` 中记录
+    旧键: 新键，表格等需要保持行位置的地方可以据此原地替换。
+    """
+
+    def __init__(self, states_added: Iterable[str] = (), states_removed: Iterable[str] = (),
+                 states_modified: Iterable[str] = (), events_added: Iterable[str] = (),
+                 events_removed: Iterable[str] = (), events_modified: Iterable[str] = (),
+                 transitions_added: Iterable[TransitionKey] = (), transitions_removed: Iterable[TransitionKey] = (),
+                 transitions_modified: Iterable[TransitionKey] = (), subtrees: Iterable[Optional[str]] = (),
+                 transitions_rekeyed: Optional[Dict[TransitionKey, TransitionKey]] = None):
+        self.states_added: Set[str] = set(states_added)
+        self.states_removed: Set[str] = set(states_removed)
+        self.states_modified: Set[str] = set(states_modified)
+        self.events_added: Set[str] = set(events_added)
+        self.events_removed: Set[str] = set(events_removed)
+        self.events_modified: Set[str] = set(events_modified)
+        self.transitions_added: Set[TransitionKey] = set(transitions_added)
+        self.transitions_removed: Set[TransitionKey] = set(transitions_removed)
+        self.transitions_modified: Set[TransitionKey] = set(transitions_modified)
+        self.subtrees: Set[Optional[str]] = set(subtrees)
+        self.transitions_rekeyed: Dict[TransitionKey, TransitionKey] = dict(transitions_rekeyed or {})
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={value!r}' for name, value in vars(self).items() if value)
+        return f'<{type(self).__name__} {fields}>'
+
+    def __bool__(self):
+        return any(vars(self).values())
+
+    @staticmethod
+    def _merge_group(added: Set, removed: Set, modified: Set,
+                     new_added: Iterable, new_removed: Iterable, new_modified: Iterable):
+        for key in new_removed:
+            if key in added:
+                # 先新增后删除，相互抵消
+                added.discard(key)
+            else:
+                modified.discard(key)
+                removed.add(key)
+        for key in new_added:
+            if key in removed:
+                # 先删除后新增，视为修改
+                removed.discard(key)
+                modified.add(key)
+            else:
+                added.add(key)
+        for key in new_modified:
+            if key not in added:
+                modified.add(key)
+
+    def merge(self, other: 'StateChartChange') -> 'StateChartChange':
+        """将之后发生的修改合并到当前修改中"""
+        self._merge_group(self.states_added, self.states_removed, self.states_modified,
+                          other.states_added, other.states_removed, other.states_modified)
+        self._merge_group(self.events_added, self.events_removed, self.events_modified,
+                          other.events_added, other.events_removed, other.events_modified)
+        self._merge_group(self.transitions_added, self.transitions_removed, self.transitions_modified,
+                          other.transitions_added, other.transitions_removed, other.transitions_modified)
+        self.subtrees.update(other.subtrees)
+        # 连续修改同一个迁移时合并为最初的键: 最后的键
+        d_new_old = {new_key: old_key for old_key, new_key in self.transitions_rekeyed.items()}
+        for old_key, new_key in other.transitions_rekeyed.items():
+            self.transitions_rekeyed[d_new_old.pop(old_key, old_key)] = new_key
+        return self
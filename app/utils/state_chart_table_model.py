@@ -0,0 +1,214 @@
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from .fcstm_state_chart import FcstmStateChart
+from .state_chart_change import StateChartChange
+from .state_chart_validator import Diagnostic, StateChartValidator
+
+
+class _StateChartTableModel(QAbstractTableModel):
+    """
+    状态机表格模型的基类
+
+    每一行对应一个索引键，行数据在显示时从FcstmStateChart的索引中按键获取，
+    增删改只发出对应行的 ``rowsInserted`` / ``rowsRemoved`` / ``dataChanged`` 信号。
+    子类需要实现 ``_current_keys`` （初始的行）、 ``_get_object`` （按键获取对象）和 ``_column_text`` （单元格文本）。
+    """
+    HEADERS: List[str] = []
+
+    _keys: List[Hashable]
+    _d_key_row: Dict[Hashable, int]
+
+    def __init__(self, fcstm_state_chart: FcstmStateChart, parent=None):
+        QAbstractTableModel.__init__(self, parent)
+        self.fcstm_state_chart = fcstm_state_chart
+        self._keys = list(self._current_keys())
+        self._d_key_row = {key: row for row, key in enumerate(self._keys)}
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._keys)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section: int, orientation: Qt.Orientation, role: int = Qt.DisplayRole) -> Any:
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal and 0 <= section < len(self.HEADERS):
+            return self.HEADERS[section]
+        return QAbstractTableModel.headerData(self, section, orientation, role)
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.EditRole):
+            return None
+        obj = self.object_at(index.row())
+        if obj is None:
+            return None
+        return self._column_text(obj, index.column())
+
+    def key_at(self, row: int) -> Optional[Hashable]:
+        """获取行对应的索引键"""
+        return self._keys[row] if 0 <= row < len(self._keys) else None
+
+    def object_at(self, row: int) -> Any:
+        """获取行对应的对象"""
+        key = self.key_at(row)
+        return None if key is None else self._get_object(key)
+
+    def row_of(self, key: Hashable) -> int:
+        """获取索引键所在的行，不存在时返回-1"""
+        return self._d_key_row.get(key, -1)
+
+    def insert_keys(self, keys: Iterable[Hashable]):
+        """在末尾追加新的行"""
+        new_keys = [key for key in dict.fromkeys(keys) if key not in self._d_key_row]
+        if not new_keys:
+            return
+        first_row = len(self._keys)
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(new_keys) - 1)
+        for row, key in enumerate(new_keys, first_row):
+            self._keys.append(key)
+            self._d_key_row[key] = row
+        self.endInsertRows()
+
+    def remove_keys(self, keys: Iterable[Hashable]):
+        """删除行，连续的行合并为一次删除"""
+        rows = sorted({self._d_key_row[key] for key in keys if key in self._d_key_row}, reverse=True)
+        if not rows:
+            return
+        for row in rows:
+            del self._d_key_row[self._keys[row]]
+        # 从后往前按连续区间删除，保证前面的行号不受影响
+        end = start = rows[0]
+        for row in rows[1:] + [None]:
+            if row is not None and row == start - 1:
+                start = row
+                continue
+            self.beginRemoveRows(QModelIndex(), start, end)
+            del self._keys[start:end + 1]
+            self.endRemoveRows()
+            end = start = row
+        # 只有第一个被删除的行之后的行号发生变化
+        for row in range(rows[-1], len(self._keys)):
+            self._d_key_row[self._keys[row]] = row
+
+    def replace_keys(self, d_old_new: Dict[Hashable, Hashable]) -> Set[Hashable]:
+        """将行的索引键原地替换为新的键，行的位置不变，返回被替换的旧键"""
+        replaced = set()
+        last_column = self.columnCount() - 1
+        for old_key, new_key in d_old_new.items():
+            row = self._d_key_row.get(old_key, None)
+            if row is None or new_key in self._d_key_row:
+                continue
+            del self._d_key_row[old_key]
+            self._keys[row] = new_key
+            self._d_key_row[new_key] = row
+            self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+            replaced.add(old_key)
+        return replaced
+
+    def update_keys(self, keys: Iterable[Hashable]):
+        """通知行数据发生了变化"""
+        last_column = self.columnCount() - 1
+        for key in keys:
+            row = self._d_key_row.get(key, None)
+            if row is not None:
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last_column))
+
+
+class EventTableModel(_StateChartTableModel):
+    """事件表格模型，每一行对应一个事件id"""
+    HEADERS = ["事件名称", "事件产生条件"]
+
+    def _current_keys(self) -> Iterable[str]:
+        return (event.id for event in self.fcstm_state_chart.state_chart.events)
+
+    def _get_object(self, key: str):
+        return self.fcstm_state_chart.get_event(key)
+
+    def apply_change(self, change: StateChartChange):
+        self.remove_keys(change.events_removed)
+        self.insert_keys(change.events_added)
+        self.update_keys(change.events_modified)
+
+    def _column_text(self, event, column: int) -> str:
+        if column == 0:
+            return event.name
+        return event.guard if event.guard else ""
+
+
+class TransitionTableModel(_StateChartTableModel):
+    """迁移表格模型，每一行对应一个迁移的索引键 (源状态id, 目标状态id, 事件id)"""
+    HEADERS = ["源状态", "激励事件", "目标状态"]
+
+    def _current_keys(self):
+        return list(self.fcstm_state_chart.transition_index.d_key_transition)
+
+    def _get_object(self, key):
+        return self.fcstm_state_chart.transition_index.d_key_transition.get(key, None)
+
+    def apply_change(self, change: StateChartChange):
+        # 端点或事件被修改的迁移留在原来的行，不作为删除加追加移到表格末尾
+        rekeyed = {old_key: new_key for old_key, new_key in change.transitions_rekeyed.items()
+                   if old_key in change.transitions_removed and new_key in change.transitions_added}
+        replaced = self.replace_keys(rekeyed)
+        self.remove_keys(change.transitions_removed - replaced)
+        self.insert_keys(change.transitions_added - {rekeyed[old_key] for old_key in replaced})
+        self.update_keys(change.transitions_modified)
+
+    def _column_text(self, transition, column: int) -> str:
+        if column == 0:
+            target = transition.src_state
+        elif column == 1:
+            target = transition.event
+        else:
+            target = transition.dst_state
+        return target.name if target is not None else ""
+
+
+class ProblemTableModel(_StateChartTableModel):
+    """问题列表模型，每一行对应StateChartValidator中的一条诊断信息"""
+    HEADERS = ["级别", "对象", "问题"]
+    SEVERITY_TEXT = {Diagnostic.ERROR: "错误", Diagnostic.WARNING: "警告"}
+
+    def __init__(self, validator: StateChartValidator, parent=None):
+        self.validator = validator
+        _StateChartTableModel.__init__(self, validator.fcstm_state_chart, parent)
+        validator.subscribe(self.apply_diagnostics_change)
+
+    def _current_keys(self):
+        return list(self.validator.d_key_diagnostic)
+
+    def _get_object(self, key):
+        return self.validator.d_key_diagnostic.get(key, None)
+
+    def _column_text(self, diagnostic: Diagnostic, column: int) -> str:
+        if column == 0:
+            return self.SEVERITY_TEXT.get(diagnostic.severity, diagnostic.severity)
+        if column == 1:
+            return self._element_text(diagnostic)
+        return diagnostic.message
+
+    def _element_text(self, diagnostic: Diagnostic) -> str:
+        fcstm_state_chart = self.fcstm_state_chart
+        if diagnostic.kind == 'state':
+            state = fcstm_state_chart.get_state(diagnostic.element_id)
+            return f"状态 {state.name}" if state is not None else "状态"
+        if diagnostic.kind == 'event':
+            event = fcstm_state_chart.get_event(diagnostic.element_id)
+            return f"事件 {event.name}" if event is not None else "事件"
+        src_state_id, dst_state_id, event_id = diagnostic.element_id
+        names = []
+        for target in (fcstm_state_chart.get_state(src_state_id), fcstm_state_chart.get_state(dst_state_id),
+                       fcstm_state_chart.get_event(event_id)):
+            names.append(target.name if target is not None else "?")
+        return f"迁移 {names[0]} -> {names[1]} ({names[2]})"
+
+    def apply_diagnostics_change(self, added, removed, modified):
+        self.remove_keys(removed)
+        self.insert_keys(added)
+        self.update_keys(modified)
+
+    def apply_change(self, change: StateChartChange):
+        # 行的增删由诊断信息的变化驱动，这里只刷新可能改名的对象
+        self.update_keys(key for key in self._keys if key[1] in change.states_modified or
+                         key[1] in change.events_modified)
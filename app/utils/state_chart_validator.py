@@ -0,0 +1,235 @@
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from pyfcstm.model import CompositeState
+
+from .fcstm_state_chart import FcstmStateChart
+from .state_chart_change import StateChartChange
+
+#: 诊断信息的键：(对象类型, 对象id, 问题代码)，迁移的对象id为其索引键
+DiagnosticKey = Tuple[str, Hashable, str]
+#: 诊断信息变化的回调参数：(新增的键, 删除的键, 内容变化的键)
+DiagnosticsListener = Callable[[Set[DiagnosticKey], Set[DiagnosticKey], Set[DiagnosticKey]], None]
+
+
+class Diagnostic:
+    """某个状态、事件或迁移上的一条问题"""
+    ERROR = 'error'
+    WARNING = 'warning'
+
+    def __init__(self, severity: str, kind: str, element_id: Hashable, code: str, message: str):
+        self.severity = severity
+        self.kind = kind  # 'state' / 'event' / 'transition'
+        self.element_id = element_id
+        self.code = code
+        self.message = message
+
+    @property
+    def key(self) -> DiagnosticKey:
+        return self.kind, self.element_id, self.code
+
+    def __eq__(self, other):
+        return (isinstance(other, Diagnostic) and self.key == other.key and
+                self.severity == other.severity and self.message == other.message)
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f'<{type(self).__name__} {self.severity} {self.kind} {self.element_id!r}: {self.message}>'
+
+
+class _NameRegistry:
+    """名称 -> 使用该名称的对象id，用于增量地判断名称是否重复"""
+
+    def __init__(self):
+        self.d_name_ids: Dict[str, Set[str]] = {}
+        self.d_id_name: Dict[str, str] = {}
+
+    def update(self, id_: str, name: Optional[str]) -> Set[str]:
+        """更新对象的名称（None表示对象被删除），返回名称重复情况可能发生变化的对象id"""
+        affected = set()
+        old_name = self.d_id_name.pop(id_, None)
+        if old_name is not None:
+            ids = self.d_name_ids[old_name]
+            ids.discard(id_)
+            affected.update(ids)
+            if not ids:
+                del self.d_name_ids[old_name]
+        if name is not None:
+            self.d_id_name[id_] = name
+            ids = self.d_name_ids.setdefault(name, set())
+            affected.update(ids)
+            ids.add(id_)
+        return affected
+
+    def is_duplicated(self, id_: str) -> bool:
+        name = self.d_id_name.get(id_, None)
+        return name is not None and len(self.d_name_ids[name]) > 1
+
+
+class StateChartValidator:
+    """
+    状态机的增量合法性检查
+
+    构造时对整个状态机检查一次，之后订阅FcstmStateChart的修改通知，只重新检查受影响的状态、事件和迁移。
+    当前的所有诊断信息保存在 ``d_key_diagnostic`` 中，随时可以读取；
+    诊断信息变化时通过 ``subscribe`` 注册的回调通知差异。
+    """
+    d_key_diagnostic: Dict[DiagnosticKey, Diagnostic]
+    d_element_keys: Dict[Tuple[str, Hashable], Set[DiagnosticKey]]
+
+    def __init__(self, fcstm_state_chart: FcstmStateChart):
+        self.fcstm_state_chart = fcstm_state_chart
+        self.d_key_diagnostic = {}
+        self.d_element_keys = {}  # (对象类型, 对象id): 该对象上的诊断信息的键
+        self._state_names = _NameRegistry()
+        self._event_names = _NameRegistry()
+        self._listeners: List[DiagnosticsListener] = []
+        self._pending: Optional[Tuple[Set[DiagnosticKey], Set[DiagnosticKey], Set[DiagnosticKey]]] = None
+
+        for state in fcstm_state_chart.state_chart.states:
+            self._state_names.update(state.id, state.name)
+        for event in fcstm_state_chart.state_chart.events:
+            self._event_names.update(event.id, event.name)
+        self._collect(lambda: self._check_all())
+        fcstm_state_chart.subscribe(self._on_state_chart_changed)
+
+    def close(self):
+        """停止跟踪状态机的修改"""
+        self.fcstm_state_chart.unsubscribe(self._on_state_chart_changed)
+
+    def subscribe(self, callback: DiagnosticsListener):
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback: DiagnosticsListener):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def diagnostics(self) -> List[Diagnostic]:
+        return list(self.d_key_diagnostic.values())
+
+    def diagnostics_of(self, kind: str, element_id: Hashable) -> List[Diagnostic]:
+        """获取某个对象上的诊断信息"""
+        return [self.d_key_diagnostic[key] for key in self.d_element_keys.get((kind, element_id), ())]
+
+    @property
+    def error_count(self) -> int:
+        return sum(1 for diagnostic in self.d_key_diagnostic.values() if diagnostic.severity == Diagnostic.ERROR)
+
+    def _check_all(self):
+        for state in self.fcstm_state_chart.state_chart.states:
+            self._check_state(state.id)
+        for event in self.fcstm_state_chart.state_chart.events:
+            self._check_event(event.id)
+        for key in list(self.fcstm_state_chart.transition_index.d_key_transition):
+            self._check_transition(key)
+
+    def _on_state_chart_changed(self, change: StateChartChange):
+        self._collect(lambda: self._apply_change(change))
+
+    def _apply_change(self, change: StateChartChange):
+        d_id_state = self.fcstm_state_chart.d_id_state
+        d_id_event = self.fcstm_state_chart.d_id_event
+
+        # 名称发生变化的对象以及与其新旧名称相同的对象都需要重新检查
+        state_ids = change.states_added | change.states_removed | change.states_modified
+        for state_id in list(state_ids):
+            state = d_id_state.get(state_id, None)
+            state_ids.update(self._state_names.update(state_id, None if state is None else state.name))
+        # 子状态增删或初始状态变化的复合状态
+        state_ids.update(state_id for state_id in change.subtrees if state_id is not None)
+        for state_id in state_ids:
+            self._check_state(state_id)
+
+        event_ids = change.events_added | change.events_removed | change.events_modified
+        for event_id in list(event_ids):
+            event = d_id_event.get(event_id, None)
+            event_ids.update(self._event_names.update(event_id, None if event is None else event.name))
+        for event_id in event_ids:
+            self._check_event(event_id)
+
+        for key in change.transitions_removed | change.transitions_added | change.transitions_modified:
+            self._check_transition(key)
+
+    def _check_state(self, state_id: str):
+        state = self.fcstm_state_chart.get_state(state_id)
+        diagnostics = []
+        if state is not None:
+            if (state.min_time_lock is not None and state.max_time_lock is not None and
+                    state.min_time_lock > state.max_time_lock):
+                diagnostics.append(Diagnostic(Diagnostic.ERROR, 'state', state_id, 'time_lock',
+                                              "最小时间锁大于最大时间锁"))
+            if isinstance(state, CompositeState):
+                initial_father_state = self.fcstm_state_chart.d_id_father_state.get(state.initial_state_id, None)
+                if state.initial_state_id is None:
+                    if len(state.states) > 0:
+                        diagnostics.append(Diagnostic(Diagnostic.WARNING, 'state', state_id, 'initial_state',
+                                                      "复合状态未设置初始状态"))
+                elif initial_father_state is None or initial_father_state.id != state_id:
+                    diagnostics.append(Diagnostic(Diagnostic.ERROR, 'state', state_id, 'initial_state',
+                                                  "初始状态不是该复合状态的子状态"))
+            if self._state_names.is_duplicated(state_id):
+                diagnostics.append(Diagnostic(Diagnostic.WARNING, 'state', state_id, 'duplicated_name',
+                                              f"状态名称 '{state.name}' 重复"))
+        self._set_diagnostics('state', state_id, diagnostics)
+
+    def _check_event(self, event_id: str):
+        event = self.fcstm_state_chart.get_event(event_id)
+        diagnostics = []
+        if event is not None:
+            if not event.name:
+                diagnostics.append(Diagnostic(Diagnostic.ERROR, 'event', event_id, 'empty_name', "事件名称为空"))
+            elif self._event_names.is_duplicated(event_id):
+                diagnostics.append(Diagnostic(Diagnostic.ERROR, 'event', event_id, 'duplicated_name',
+                                              f"事件名称 '{event.name}' 重复"))
+        self._set_diagnostics('event', event_id, diagnostics)
+
+    def _check_transition(self, key):
+        diagnostics = []
+        if key in self.fcstm_state_chart.transition_index:
+            src_state_id, dst_state_id, event_id = key
+            if self.fcstm_state_chart.get_state(src_state_id) is None:
+                diagnostics.append(Diagnostic(Diagnostic.ERROR, 'transition', key, 'src_state', "源状态不存在"))
+            if self.fcstm_state_chart.get_state(dst_state_id) is None:
+                diagnostics.append(Diagnostic(Diagnostic.ERROR, 'transition', key, 'dst_state', "目标状态不存在"))
+            if self.fcstm_state_chart.get_event(event_id) is None:
+                diagnostics.append(Diagnostic(Diagnostic.ERROR, 'transition', key, 'event', "激励事件不存在"))
+        self._set_diagnostics('transition', key, diagnostics)
+
+    def _set_diagnostics(self, kind: str, element_id: Hashable, diagnostics: Iterable[Diagnostic]):
+        """替换对象上的诊断信息，并记录差异"""
+        added, removed, modified = self._pending
+        old_keys = self.d_element_keys.pop((kind, element_id), set())
+        new_keys = set()
+        for diagnostic in diagnostics:
+            key = diagnostic.key
+            new_keys.add(key)
+            old_diagnostic = self.d_key_diagnostic.get(key, None)
+            if old_diagnostic is None and key in removed:
+                removed.discard(key)
+                modified.add(key)
+            elif old_diagnostic is None:
+                added.add(key)
+            elif old_diagnostic != diagnostic:
+                modified.add(key)
+            self.d_key_diagnostic[key] = diagnostic
+        for key in old_keys - new_keys:
+            del self.d_key_diagnostic[key]
+            if key in added:
+                added.discard(key)
+            else:
+                modified.discard(key)
+                removed.add(key)
+        if new_keys:
+            self.d_element_keys[(kind, element_id)] = new_keys
+
+    def _collect(self, action: Callable[[], None]):
+        """执行检查并在结束后一次性通知诊断信息的差异"""
+        self._pending = (set(), set(), set())
+        try:
+            action()
+        finally:
+            (added, removed, modified), self._pending = self._pending, None
+        if added or removed or modified:
+            for callback in list(self._listeners):
+                callback(added, removed, modified)
@@ -0,0 +1,176 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from PyQt5.QtCore import QAbstractItemModel, QModelIndex, Qt
+from .fcstm_state_chart import FcstmStateChart, initial_state_icon
+
+
+class _StateNode:
+    """树模型中的节点，只保存状态id，状态对象按需从FcstmStateChart中获取"""
+    __slots__ = ('state_id', 'parent', 'row', 'children', 'pending_ids')
+
+    def __init__(self, state_id: Optional[str], parent: Optional['_StateNode'], row: int = 0):
+        self.state_id = state_id
+        self.parent = parent
+        self.row = row
+        self.children: List['_StateNode'] = []
+        # 尚未加载的子状态id，None表示还没有开始加载
+        self.pending_ids: Optional[List[str]] = None
+
+
+class StateTreeModel(QAbstractItemModel):
+    """
+    状态层次结构的树模型
+
+    子状态在节点展开时通过 ``canFetchMore`` / ``fetchMore`` 分批加载，不需要预先为每个状态创建节点。
+    ``Qt.UserRole`` 返回状态id，所有初始状态共享同一个图标对象。
+    ``sync`` 根据FcstmStateChart的修改记录只重建发生变化的子树，状态机没有变化时不做任何操作。
+    数据源只需要提供 ``child_state_ids`` / ``has_child_states`` / ``father_state_id`` / ``get_state`` /
+    ``is_initial_state`` / ``revision`` / ``changed_subtrees_since``，也可以是只读的 :class:`BinaryStatechartView`。
+    """
+    #: 每次fetchMore最多加载的子状态数量
+    FETCH_BATCH_SIZE = 500
+
+    d_id_node: Dict[str, _StateNode]
+
+    def __init__(self, fcstm_state_chart: FcstmStateChart, parent=None):
+        QAbstractItemModel.__init__(self, parent)
+        self.fcstm_state_chart = fcstm_state_chart
+        self._root = _StateNode(None, None)
+        self.d_id_node = {}  # state.id: 已加载的节点
+        self.synced_revision = fcstm_state_chart.revision
+
+    def _node(self, index: QModelIndex) -> _StateNode:
+        if index.isValid():
+            return index.internalPointer()
+        return self._root
+
+    def _child_ids(self, node: _StateNode) -> List[str]:
+        return self.fcstm_state_chart.child_state_ids(node.state_id)
+
+    def index(self, row: int, column: int, parent: QModelIndex = QModelIndex()) -> QModelIndex:
+        node = self._node(parent)
+        if column != 0 or row < 0 or row >= len(node.children):
+            return QModelIndex()
+        return self.createIndex(row, column, node.children[row])
+
+    def parent(self, index: QModelIndex = QModelIndex()) -> QModelIndex:
+        if not index.isValid():
+            return QModelIndex()
+        parent_node = index.internalPointer().parent
+        if parent_node is None or parent_node is self._root:
+            return QModelIndex()
+        return self.createIndex(parent_node.row, 0, parent_node)
+
+    def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        if parent.column() > 0:
+            return 0
+        return len(self._node(parent).children)
+
+    def columnCount(self, parent: QModelIndex = QModelIndex()) -> int:
+        return 1
+
+    def hasChildren(self, parent: QModelIndex = QModelIndex()) -> bool:
+        node = self._node(parent)
+        if node.children:
+            return True
+        if node.pending_ids is not None:
+            return len(node.pending_ids) > 0
+        if node is self._root:
+            return True
+        return self.fcstm_state_chart.has_child_states(node.state_id)
+
+    def canFetchMore(self, parent: QModelIndex) -> bool:
+        node = self._node(parent)
+        if node.pending_ids is None:
+            return self.hasChildren(parent)
+        return len(node.pending_ids) > 0
+
+    def fetchMore(self, parent: QModelIndex):
+        node = self._node(parent)
+        if node.pending_ids is None:
+            node.pending_ids = self._child_ids(node)
+        batch = node.pending_ids[:self.FETCH_BATCH_SIZE]
+        if not batch:
+            return
+        del node.pending_ids[:len(batch)]
+        first_row = len(node.children)
+        self.beginInsertRows(parent, first_row, first_row + len(batch) - 1)
+        for row, state_id in enumerate(batch, first_row):
+            child_node = _StateNode(state_id, node, row)
+            node.children.append(child_node)
+            self.d_id_node[state_id] = child_node
+        self.endInsertRows()
+
+    def data(self, index: QModelIndex, role: int = Qt.DisplayRole) -> Any:
+        if not index.isValid():
+            return None
+        node = index.internalPointer()
+        if role == Qt.UserRole:
+            return node.state_id
+        state = self.fcstm_state_chart.get_state(node.state_id)
+        if state is None:
+            return None
+        if role == Qt.DisplayRole:
+            return state.name
+        if role == Qt.DecorationRole and self.fcstm_state_chart.is_initial_state(state):
+            return initial_state_icon()
+        return None
+
+    def state_id(self, index: QModelIndex) -> Optional[str]:
+        """获取节点对应的状态id"""
+        return self._node(index).state_id
+
+    def index_of_state(self, state_id: str) -> QModelIndex:
+        """获取状态对应的节点，必要时沿祖先链加载尚未加载的节点"""
+        node = self.d_id_node.get(state_id, None)
+        if node is None:
+            # 先确保父节点已加载，再加载父节点的子状态直到找到目标
+            father_state_id = self.fcstm_state_chart.father_state_id(state_id)
+            parent_index = QModelIndex() if father_state_id is None else self.index_of_state(father_state_id)
+            if father_state_id is not None and not parent_index.isValid():
+                return QModelIndex()
+            while node is None and self.canFetchMore(parent_index):
+                self.fetchMore(parent_index)
+                node = self.d_id_node.get(state_id, None)
+            if node is None:
+                return QModelIndex()
+        return self.createIndex(node.row, 0, node)
+
+    def sync(self):
+        """将模型与FcstmStateChart同步，只重建自上次同步以来发生变化的子树"""
+        revision = self.fcstm_state_chart.revision
+        if revision == self.synced_revision:
+            return
+        self.refresh_subtrees(self.fcstm_state_chart.changed_subtrees_since(self.synced_revision))
+        self.synced_revision = revision
+
+    def refresh_subtrees(self, state_ids: Iterable[Optional[str]]):
+        """重建以指定状态为根的子树，state_id为None时重建所有顶层状态"""
+        for state_id in state_ids:
+            if state_id is None:
+                node = self._root
+                index = QModelIndex()
+            else:
+                # 尚未加载或已被删除的子树无需处理，下次展开时会重新加载
+                node = self.d_id_node.get(state_id, None)
+                if node is None:
+                    continue
+                index = self.createIndex(node.row, 0, node)
+                self.dataChanged.emit(index, index)
+            self._reset_children(node, index)
+
+    def _reset_children(self, node: _StateNode, index: QModelIndex):
+        loaded_count = len(node.children)
+        if loaded_count:
+            self.beginRemoveRows(index, 0, loaded_count - 1)
+            stack = list(node.children)
+            while stack:
+                child_node = stack.pop()
+                self.d_id_node.pop(child_node.state_id, None)
+                stack.extend(child_node.children)
+            node.children = []
+            self.endRemoveRows()
+        node.pending_ids = None
+        # 已经加载过的节点重新加载相同数量的子状态，保持视图中已展开的层级
+        while len(node.children) < loaded_count and self.canFetchMore(index):
+            self.fetchMore(index)
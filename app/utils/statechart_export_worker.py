@@ -0,0 +1,127 @@
+import threading
+from typing import Callable, Dict, Optional
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from pyfcstm.model import Statechart
+
+from app.config import WORD_EXPORT_WORKERS
+from .atomic_write import atomic_write
+from .binary_statechart import write_binary_statechart
+from .export_cache import ExportCache
+from .export_to_excel import export_statechart_to_excel
+from .export_to_word import export_statechart_to_word
+from .statechart_snapshot import StatechartSnapshot
+
+
+class ExportCanceled(Exception):
+    """导出被用户取消"""
+
+
+def _export_json(state_chart: Statechart, file_path: str):
+    state_chart.to_json(file_path)
+
+
+def _export_word(state_chart: Statechart, file_path: str):
+    if not export_statechart_to_word(state_chart, file_path, workers=WORD_EXPORT_WORKERS):
+        raise RuntimeError("导出Word文档时发生错误")
+
+
+def _export_excel(state_chart: Statechart, file_path: str):
+    if not export_statechart_to_excel(state_chart, file_path):
+        raise RuntimeError("导出Excel文档时发生错误")
+
+
+#: 导出格式（文件后缀）: 导出函数
+EXPORTERS: Dict[str, Callable[[Statechart, str], None]] = {
+    '.json': _export_json,
+    '.fcstmb': write_binary_statechart,
+    '.docx': _export_word,
+    '.xlsx': _export_excel,
+}
+
+
+class StatechartExportWorker(QObject):
+    """
+    在工作线程中导出状态机快照
+
+    主线程只需要调用 :meth:`StatechartSnapshot.capture` 复制一份状态机数据，之后可以继续编辑，
+    工作线程从快照构造独立的状态机对象再导出，因此导出的是开始导出时的内容。
+    文件先写入同一目录下的临时文件，完成后才替换目标文件；失败或取消时目标文件保持原样。
+    进度按阶段报告，取消在阶段之间以及替换目标文件之前生效。
+    指定 ``cache`` 时，文档格式的导出结果按状态机的结构哈希缓存，状态机没有变化时直接复制缓存文件。
+    """
+    #: (已完成的阶段数, 总阶段数)
+    progress = pyqtSignal(int, int)
+    stage_changed = pyqtSignal(str)
+    finished = pyqtSignal(str)
+    failed = pyqtSignal(str)
+    canceled = pyqtSignal()
+
+    STAGE_COUNT = 3
+
+    def __init__(self, snapshot: StatechartSnapshot, file_path: str, export_format: str,
+                 cache: Optional[ExportCache] = None):
+        """
+        :param export_format: ``EXPORTERS`` 中的文件后缀
+        """
+        QObject.__init__(self)
+        self.snapshot = snapshot
+        self.file_path = file_path
+        self.export_format = export_format
+        self.exporter = EXPORTERS[export_format]
+        self.cache = cache
+        # 导出完成后表示是否使用了缓存的文件
+        self.cache_hit = False
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """请求取消导出，可以从任意线程调用"""
+        self._cancel_event.set()
+
+    def is_canceled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def _check_canceled(self):
+        if self._cancel_event.is_set():
+            raise ExportCanceled()
+
+    def run(self):
+        try:
+            self._export()
+        except ExportCanceled:
+            self.canceled.emit()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(self.file_path)
+
+    def _export(self):
+        self.progress.emit(0, self.STAGE_COUNT)
+        self.stage_changed.emit("正在复制状态机")
+        state_chart = self.snapshot.to_statechart()
+        self._check_canceled()
+        self.progress.emit(1, self.STAGE_COUNT)
+        self.stage_changed.emit("正在写入文件")
+        with atomic_write(self.file_path) as temp_path:
+            if self.cache is not None and self.cache.is_cacheable(self.export_format):
+                self.cache_hit = self.cache.export(state_chart, self.export_format, temp_path, self.exporter)
+            else:
+                self.exporter(state_chart, temp_path)
+            self.progress.emit(2, self.STAGE_COUNT)
+            # 在替换目标文件之前取消，临时文件会被删除
+            self._check_canceled()
+            self.stage_changed.emit("正在保存")
+        self.progress.emit(3, self.STAGE_COUNT)
+
+
+def start_export_worker(worker: StatechartExportWorker, parent=None) -> QThread:
+    """在新的QThread中运行worker，线程在worker结束后自动退出并释放"""
+    thread = QThread(parent)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    for signal in (worker.finished, worker.failed, worker.canceled):
+        signal.connect(thread.quit)
+    thread.finished.connect(worker.deleteLater)
+    thread.finished.connect(thread.deleteLater)
+    thread.start()
+    return thread
@@ -0,0 +1,126 @@
+import os
+import threading
+from typing import Any, Dict, Optional
+
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from pyfcstm.model import Statechart
+
+from .binary_statechart import BinaryStatechartReader, is_binary_statechart
+from .fcstm_state_chart import FcstmStateChart, initial_state_icon
+from .import_from_excel import ExcelImportError, ExcelImportReport, import_statechart_from_excel
+from .statechart_snapshot import snapshot_model
+from .streaming_json import StreamingJsonReader, read_statechart_streaming
+
+
+class ImportCanceled(Exception):
+    """导入被用户取消"""
+
+
+class StatechartImportWorker(QObject):
+    """
+    在工作线程中读取、解析状态机文件并建立FcstmStateChart的索引和（不属于任何控件的）树节点
+
+    JSON文件通过 :class:`StreamingJsonReader` 边读取边构造状态机，进度以已读取的字节数报告，建立索引阶段通过 ``stage_changed`` 报告。
+    二进制状态机文件（.fcstmb）通过mmap直接解码定长记录。
+    Excel文件（.xlsx）以只读模式逐行读取，导入报告保存在 ``excel_report`` 中。
+    完成后通过 ``finished`` 交出构造好的FcstmStateChart，由主线程调用 ``attach_tree_widget`` 后一次性替换当前模型；
+    ``tree_items`` 为False时不创建树节点，由主线程用 :class:`StateTreeModel` 显示。
+    自动保存的基准快照 ``base_model`` 也在工作线程中生成，主线程开始记录修改时不需要再遍历整个状态机。
+    """
+    #: (已读取字节数, 文件总字节数)
+    progress = pyqtSignal('qint64', 'qint64')
+    stage_changed = pyqtSignal(str)
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    canceled = pyqtSignal()
+
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, file_path: str, tree_items: bool = True):
+        QObject.__init__(self)
+        self.file_path = file_path
+        self.tree_items = tree_items
+        self._cancel_event = threading.Event()
+        # 读取JSON文件完成后保存读取统计信息（读取字节数、文本缓冲区峰值等）
+        self.reader: Optional[StreamingJsonReader] = None
+        # 导入Excel文件完成后保存导入报告
+        self.excel_report: Optional[ExcelImportReport] = None
+        # 导入完成后保存状态机的快照数据，作为自动保存的基准
+        self.base_model: Optional[Dict[str, Any]] = None
+        # 图标只能在主线程中创建，工作线程中的树节点共享这个对象
+        initial_state_icon()
+
+    def cancel(self):
+        """请求取消导入，可以从任意线程调用"""
+        self._cancel_event.set()
+
+    def is_canceled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def _check_canceled(self):
+        if self._cancel_event.is_set():
+            raise ImportCanceled()
+
+    def run(self):
+        try:
+            fcstm_state_chart = self._load()
+        except ImportCanceled:
+            self.canceled.emit()
+        except ExcelImportError as e:
+            self.failed.emit(f"{e}\n{e.report.format_issues()}")
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit(fcstm_state_chart)
+
+    def _load(self) -> FcstmStateChart:
+        self.stage_changed.emit("正在读取文件")
+        state_chart = self._read_state_chart()
+        self._check_canceled()
+        self.stage_changed.emit("正在建立索引")
+        fcstm_state_chart = FcstmStateChart(None, state_chart, tree_items=self.tree_items)
+        self._check_canceled()
+        self.base_model = snapshot_model(fcstm_state_chart)
+        self._check_canceled()
+        return fcstm_state_chart
+
+    def _read_state_chart(self) -> Statechart:
+        total_size = os.path.getsize(self.file_path)
+        self.progress.emit(0, total_size)
+
+        if is_binary_statechart(self.file_path):
+            with BinaryStatechartReader(self.file_path) as reader:
+                state_chart = reader.to_statechart()
+            self.progress.emit(total_size, total_size)
+            return state_chart
+
+        if self.file_path.lower().endswith('.xlsx'):
+            def on_rows(row_count: int):
+                self._check_canceled()
+                self.stage_changed.emit(f"正在读取Excel文件（{row_count} 行）")
+
+            state_chart, self.excel_report = import_statechart_from_excel(self.file_path, progress=on_rows)
+            self.progress.emit(total_size, total_size)
+            return state_chart
+
+        def on_progress(read_size: int):
+            self._check_canceled()
+            self.progress.emit(read_size, total_size)
+
+        # 边读取边构造，文本缓冲区不超过一块数据加上最大的单个元素，每块报告一次进度并检查是否被取消
+        state_chart, self.reader = read_statechart_streaming(self.file_path, progress=on_progress,
+                                                             chunk_size=self.CHUNK_SIZE)
+        return state_chart
+
+
+def start_import_worker(worker: StatechartImportWorker, parent=None) -> QThread:
+    """在新的QThread中运行worker，线程在worker结束后自动退出并释放"""
+    thread = QThread(parent)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    for signal in (worker.finished, worker.failed, worker.canceled):
+        signal.connect(thread.quit)
+    thread.finished.connect(worker.deleteLater)
+    thread.finished.connect(thread.deleteLater)
+    thread.start()
+    return thread
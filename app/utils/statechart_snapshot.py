@@ -0,0 +1,135 @@
+from typing import Any, Dict, List, Optional
+
+from pyfcstm.model import CompositeState, Event, NormalState, PseudoState, State, Statechart, Transition
+
+from .fcstm_state_chart import FcstmStateChart
+from .transition_index import TransitionKey, transition_key
+
+_STATE_TYPES = {'normal': NormalState, 'composite': CompositeState, 'pseudo': PseudoState}
+_STATE_TYPE_NAMES = {state_type: name for name, state_type in _STATE_TYPES.items()}
+
+#: 对快照的一条修改，只保存受影响对象的当前值，重复应用结果相同
+SnapshotOp = List[Any]
+
+
+def state_record(fcstm_state_chart: FcstmStateChart, state: State) -> Dict[str, Any]:
+    """将状态转换为只包含内置类型的记录，子状态和父状态以id表示"""
+    record = {
+        'type': _STATE_TYPE_NAMES[type(state)],
+        'name': state.name,
+        'description': state.description,
+        'min_time_lock': state.min_time_lock,
+        'max_time_lock': state.max_time_lock,
+        'on_entry': state.on_entry,
+        'on_during': state.on_during,
+        'on_exit': state.on_exit,
+        'father': fcstm_state_chart.father_state_id(state.id),
+    }
+    if isinstance(state, CompositeState):
+        record['children'] = [child_state.id for child_state in state.states]
+        record['initial'] = state.initial_state_id
+    return record
+
+
+def snapshot_model(fcstm_state_chart: FcstmStateChart) -> Dict[str, Any]:
+    """将整个状态机转换为只包含内置类型的数据，之后对状态机的修改不会影响这份数据"""
+    state_chart = fcstm_state_chart.state_chart
+    return {
+        'name': state_chart.name,
+        'preamble': list(state_chart.preamble or []),
+        'root_state_id': state_chart.root_state_id,
+        'states': {state.id: state_record(fcstm_state_chart, state) for state in state_chart.states},
+        'events': {event.id: [event.name, event.guard] for event in state_chart.events},
+        'transitions': [list(transition_key(transition)) for transition in state_chart.transitions],
+    }
+
+
+class StatechartSnapshot:
+    """
+    状态机的只读快照
+
+    由 :func:`snapshot_model` 的数据构造，可以在其他线程中使用：
+    自动保存的写入线程在其上应用修改记录，导出线程通过 ``to_statechart`` 得到独立的状态机对象。
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.name = data['name']
+        self.preamble = data['preamble']
+        self.root_state_id = data['root_state_id']
+        self.states: Dict[str, Dict[str, Any]] = data['states']
+        self.events: Dict[str, List[Optional[str]]] = data['events']
+        # 保持迁移在状态机中的顺序，导出结果和结构哈希与迭代顺序有关
+        self.transitions: Dict[TransitionKey, None] = dict.fromkeys(tuple(key) for key in data['transitions'])
+
+    @classmethod
+    def capture(cls, fcstm_state_chart: FcstmStateChart) -> 'StatechartSnapshot':
+        return cls(snapshot_model(fcstm_state_chart))
+
+    def to_data(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'preamble': self.preamble,
+            'root_state_id': self.root_state_id,
+            'states': self.states,
+            'events': self.events,
+            'transitions': [list(key) for key in self.transitions],
+        }
+
+    def apply(self, ops: List[SnapshotOp]):
+        for op in ops:
+            kind = op[0]
+            if kind == 'state':
+                self.states[op[1]] = op[2]
+            elif kind == 'del_state':
+                self.states.pop(op[1], None)
+            elif kind == 'event':
+                self.events[op[1]] = [op[2], op[3]]
+            elif kind == 'del_event':
+                self.events.pop(op[1], None)
+            elif kind == 'transition':
+                self.transitions[tuple(op[1])] = None
+            elif kind == 'del_transition':
+                self.transitions.pop(tuple(op[1]), None)
+            elif kind == 'meta':
+                self.name, self.preamble = op[1], op[2]
+            else:
+                raise ValueError(f"未知的修改记录类型：{kind!r}")
+
+    def to_statechart(self) -> Statechart:
+        """构造新的状态机对象，状态和事件的id以及迁移的顺序保持不变"""
+        d_id_state = {}
+        for state_id, record in self.states.items():
+            d_id_state[state_id] = _STATE_TYPES[record['type']](
+                name=record['name'],
+                description=record['description'],
+                min_time_lock=record['min_time_lock'],
+                max_time_lock=record['max_time_lock'],
+                on_entry=record['on_entry'],
+                on_during=record['on_during'],
+                on_exit=record['on_exit'],
+                id_=state_id,
+            )
+        for state_id, record in self.states.items():
+            if record['type'] == 'composite':
+                state = d_id_state[state_id]
+                for child_id in record['children']:
+                    if child_id in d_id_state:
+                        state.states.add(d_id_state[child_id])
+                if record['initial'] in d_id_state:
+                    state.initial_state = d_id_state[record['initial']]
+        root_state = d_id_state.get(self.root_state_id, None)
+        if root_state is None:
+            root_state = next(state for state_id, state in d_id_state.items()
+                              if self.states[state_id]['father'] is None)
+        state_chart = Statechart(name=self.name, root_state=root_state, states=list(d_id_state.values()))
+        d_id_event = {}
+        for event_id, (name, guard) in self.events.items():
+            d_id_event[event_id] = event = Event(name, guard, id_=event_id)
+            state_chart.events.add(event)
+        for src_state_id, dst_state_id, event_id in self.transitions:
+            if src_state_id in d_id_state and dst_state_id in d_id_state and event_id in d_id_event:
+                state_chart.transitions.add(Transition(d_id_state[src_state_id], d_id_state[dst_state_id],
+                                                       d_id_event[event_id]))
+        if self.preamble:
+            state_chart.preamble = self.preamble
+        return state_chart
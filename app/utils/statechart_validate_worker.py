@@ -0,0 +1,40 @@
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+from .statechart_snapshot import StatechartSnapshot
+
+
+class StatechartValidateWorker(QObject):
+    """
+    在工作线程中对状态机快照运行完整的 ``Statechart.validate``
+
+    日常编辑中的问题由 :class:`StateChartValidator` 增量检查，完整验证只在用户点击验证按钮时进行，
+    并且不在界面线程中运行。主线程只需要复制一份快照，之后可以继续编辑，验证的是开始验证时的内容。
+    """
+    finished = pyqtSignal()
+    #: 验证失败的信息
+    failed = pyqtSignal(str)
+
+    def __init__(self, snapshot: StatechartSnapshot):
+        QObject.__init__(self)
+        self.snapshot = snapshot
+
+    def run(self):
+        try:
+            self.snapshot.to_statechart().validate()
+        except Exception as e:
+            self.failed.emit(str(e))
+        else:
+            self.finished.emit()
+
+
+def start_validate_worker(worker: StatechartValidateWorker, parent=None) -> QThread:
+    """在新的QThread中运行worker，线程在worker结束后自动退出并释放"""
+    thread = QThread(parent)
+    worker.moveToThread(thread)
+    thread.started.connect(worker.run)
+    for signal in (worker.finished, worker.failed):
+        signal.connect(thread.quit)
+    thread.finished.connect(worker.deleteLater)
+    thread.finished.connect(thread.deleteLater)
+    thread.start()
+    return thread
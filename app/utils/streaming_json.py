@@ -0,0 +1,296 @@
+import codecs
+import json
+import re
+from typing import Any, BinaryIO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pyfcstm.model import CompositeState, Event, NormalState, PseudoState, State, Statechart, Transition
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+#: 合法的JSON中数字后面不会紧跟这些字符，出现时说明数字被截断在缓冲区末尾
+_NUMBER_CHARS = frozenset('0123456789.eE+-')
+
+
+class StreamingJsonReader:
+    """
+    在滑动缓冲区上逐个解码JSON顶层对象的成员
+
+    顶层对象的成员逐个解码，值为数组时再逐个解码数组元素，每个元素用 ``json.JSONDecoder.raw_decode`` 解码。
+    已解码的文本会立刻从缓冲区中丢弃，因此文本缓冲区的峰值约为 ``chunk_size`` 加上最大的单个数组元素，
+    而 ``json.load`` 需要同时持有整个文件的文本和解码后的全部对象。
+    ``peak_buffer_size`` 记录了实际的缓冲区峰值（字符数）。
+    通过 :meth:`iter_items` 逐个处理元素时解码结果用完即可丢弃； :meth:`load` 则返回完整的解码结果。
+    """
+    DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, f: BinaryIO, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 progress: Optional[Callable[[int], None]] = None):
+        """
+        :param f: 以二进制模式打开的UTF-8编码文件
+        :param progress: 每读取一块数据后以已读取的字节数调用，可以通过抛出异常中止读取
+        """
+        self._file = f
+        self.chunk_size = chunk_size
+        self._progress = progress
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self.bytes_read = 0
+        self.peak_buffer_size = 0
+        self.element_count = 0
+        # 状态机是否在读取过程中逐个元素构造，由 :func:`read_statechart_streaming` 设置
+        self.streamed = False
+
+    def _fill(self, min_size: int = 0) -> bool:
+        """读取至少一块数据追加到缓冲区，同时丢弃已经解码的部分，文件结束时返回False"""
+        if self._eof:
+            return False
+        data = self._file.read(max(self.chunk_size, min_size))
+        self.bytes_read += len(data)
+        text = self._text_decoder.decode(data, final=not data)
+        if not data:
+            self._eof = True
+        self._buffer = self._buffer[self._pos:] + text
+        self._pos = 0
+        self.peak_buffer_size = max(self.peak_buffer_size, len(self._buffer))
+        if self._progress is not None:
+            self._progress(self.bytes_read)
+        return bool(data)
+
+    def _peek(self) -> str:
+        """跳过空白并返回下一个字符，文件结束时返回空字符串"""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer) or not self._fill():
+                break
+        return self._buffer[self._pos:self._pos + 1]
+
+    def _expect(self, char: str):
+        found = self._peek()
+        if found != char:
+            raise ValueError(f"JSON格式错误：第{self.bytes_read}字节附近应为 {char!r}，实际为 {found!r}")
+        self._pos += 1
+
+    def _decode_value(self) -> Any:
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                # 值还没有读完整；每次至少读入与未解码部分等量的数据，避免大元素被反复解码
+                if not self._fill(len(self._buffer) - self._pos):
+                    raise
+                continue
+            # 数字可能被截断在缓冲区末尾
+            if (isinstance(value, (int, float)) and not isinstance(value, bool) and
+                    (end == len(self._buffer) or self._buffer[end] in _NUMBER_CHARS) and self._fill()):
+                continue
+            self._pos = end
+            return value
+
+    def iter_items(self) -> Iterator[Tuple[str, Any]]:
+        """
+        逐个产生顶层对象的 (键, 值)
+
+        值为数组时产生的是逐个解码元素的迭代器，必须在获取下一个成员之前迭代完。
+        """
+        self._expect('{')
+        if self._peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self._decode_value()
+            if not isinstance(key, str):
+                raise ValueError(f"JSON格式错误：第{self.bytes_read}字节附近的键不是字符串")
+            self._expect(':')
+            if self._peek() == '[':
+                yield key, self._iter_array()
+            else:
+                yield key, self._decode_value()
+            char = self._peek()
+            self._pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError(f"JSON格式错误：第{self.bytes_read}字节附近应为 ',' 或 '}}'，实际为 {char!r}")
+
+    def _iter_array(self) -> Iterator[Any]:
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._decode_value()
+            self.element_count += 1
+            char = self._peek()
+            self._pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"JSON格式错误：第{self.bytes_read}字节附近应为 ',' 或 ']'，实际为 {char!r}")
+
+    def load(self) -> Dict[str, Any]:
+        """读取整个顶层对象"""
+        data = {}
+        for key, value in self.iter_items():
+            if isinstance(value, Iterator):
+                value = list(value)
+            data[key] = value
+        self.check_end()
+        return data
+
+    def check_end(self):
+        """检查顶层对象之后没有多余的内容"""
+        if self._peek() != '':
+            raise ValueError(f"JSON格式错误：第{self.bytes_read}字节附近存在多余的内容")
+
+
+class UnsupportedLayout(ValueError):
+    """JSON文件不是 :class:`StatechartBuilder` 能够增量构造的布局"""
+
+
+_STATE_TYPES = {'normal': NormalState, 'composite': CompositeState, 'pseudo': PseudoState}
+_STATE_FIELDS = ('description', 'min_time_lock', 'max_time_lock', 'on_entry', 'on_during', 'on_exit')
+_STATE_KEYS = frozenset(('id', 'name', 'type', 'states', 'initial_state_id') + _STATE_FIELDS)
+_EVENT_KEYS = frozenset(('id', 'name', 'guard'))
+_TRANSITION_KEYS = frozenset(('id', 'src_state_id', 'dst_state_id', 'event_id'))
+
+
+def _lookup(d_id_object: Dict[str, Any], id_: Optional[str], kind: str):
+    """按id查找迁移引用的状态或事件，id为None时返回None"""
+    if id_ is None:
+        return None
+    if id_ not in d_id_object:
+        raise ValueError(f"迁移引用的{kind} {id_!r} 不存在")
+    return d_id_object[id_]
+
+
+class StatechartBuilder:
+    """
+    由逐个解码的JSON元素增量构造状态机
+
+    支持与模型属性直接对应的布局：顶层对象的 ``states`` / ``events`` / ``transitions`` 数组中每个元素是一个状态、
+    事件或迁移，复合状态的 ``states`` 为子状态id或嵌套的状态对象。每个元素解码后立刻转换为模型对象，
+    子状态、初始状态和迁移的引用只以id保存，全部元素读完后再连接，因此元素在文件中的顺序没有要求。
+    出现无法识别的键时抛出 :class:`UnsupportedLayout` ，不会静默丢弃内容。
+    """
+
+    def __init__(self):
+        self.name: Optional[str] = None
+        self.preamble = None
+        self.root_state_id: Optional[str] = None
+        self.d_id_state: Dict[str, State] = {}
+        self.events: List[Event] = []
+        self.d_id_children: Dict[str, List[str]] = {}  # 复合状态id: 子状态id列表
+        self.d_id_initial: Dict[str, str] = {}  # 复合状态id: 初始状态id
+        self.transition_ids: List[Tuple[Optional[str], Optional[str], Optional[str]]] = []
+
+    @staticmethod
+    def _check_keys(element, keys: frozenset, kind: str):
+        if not isinstance(element, dict) or not keys.issuperset(element):
+            raise UnsupportedLayout(f"无法识别的{kind}：{sorted(element) if isinstance(element, dict) else element!r}")
+
+    def add_item(self, key: str, value):
+        """处理顶层对象的一个成员，数组成员的值为逐个解码元素的迭代器"""
+        if key == 'name':
+            self.name = value
+        elif key == 'preamble':
+            self.preamble = list(value) if isinstance(value, Iterator) else value
+        elif key == 'root_state_id':
+            self.root_state_id = value
+        elif key == 'states' and isinstance(value, Iterator):
+            for element in value:
+                self.add_state(element)
+        elif key == 'events' and isinstance(value, Iterator):
+            for element in value:
+                self._check_keys(element, _EVENT_KEYS, "事件")
+                self.events.append(Event(element['name'], element.get('guard', None), id_=element.get('id', None)))
+        elif key == 'transitions' and isinstance(value, Iterator):
+            for element in value:
+                self._check_keys(element, _TRANSITION_KEYS, "迁移")
+                self.transition_ids.append((element.get('src_state_id', None), element.get('dst_state_id', None),
+                                            element.get('event_id', None)))
+        else:
+            raise UnsupportedLayout(f"无法识别的顶层成员：{key!r}")
+
+    def add_state(self, element) -> str:
+        """转换一个状态，嵌套的子状态一并转换，返回状态id"""
+        self._check_keys(element, _STATE_KEYS, "状态")
+        state_type = _STATE_TYPES.get(str(element.get('type', '')).lower(), None)
+        if state_type is None or 'id' not in element:
+            raise UnsupportedLayout(f"无法识别的状态：{element.get('name', None)!r}")
+        state = state_type(name=element.get('name', None), id_=element['id'],
+                           **{field: element[field] for field in _STATE_FIELDS if field in element})
+        self.d_id_state[state.id] = state
+        if isinstance(state, CompositeState):
+            self.d_id_children[state.id] = [child if isinstance(child, str) else self.add_state(child)
+                                            for child in element.get('states', ())]
+            if element.get('initial_state_id', None) is not None:
+                self.d_id_initial[state.id] = element['initial_state_id']
+        return state.id
+
+    def build(self) -> Statechart:
+        """连接子状态、初始状态和迁移，构造状态机"""
+        d_id_state = self.d_id_state
+        for state_id, child_ids in self.d_id_children.items():
+            state = d_id_state[state_id]
+            for child_id in child_ids:
+                if child_id not in d_id_state:
+                    raise ValueError(f"状态 {state.name!r} 的子状态 {child_id!r} 不存在")
+                state.states.add(d_id_state[child_id])
+            initial_id = self.d_id_initial.get(state_id, None)
+            if initial_id is not None:
+                state.initial_state = d_id_state[initial_id]
+        root_state_id = self.root_state_id
+        if root_state_id is None:
+            child_ids = {child_id for child_ids in self.d_id_children.values() for child_id in child_ids}
+            top_level_ids = [state_id for state_id in d_id_state if state_id not in child_ids]
+            if len(top_level_ids) != 1:
+                raise UnsupportedLayout("无法确定根状态")
+            root_state_id = top_level_ids[0]
+        if root_state_id not in d_id_state:
+            raise ValueError(f"根状态 {root_state_id!r} 不存在")
+        state_chart = Statechart(name=self.name, root_state=d_id_state[root_state_id],
+                                 states=list(d_id_state.values()))
+        d_id_event = {}
+        for event in self.events:
+            d_id_event[event.id] = event
+            state_chart.events.add(event)
+        for src_state_id, dst_state_id, event_id in self.transition_ids:
+            state_chart.transitions.add(Transition(_lookup(d_id_state, src_state_id, "状态"),
+                                                   _lookup(d_id_state, dst_state_id, "状态"),
+                                                   _lookup(d_id_event, event_id, "事件")))
+        if self.preamble:
+            state_chart.preamble = self.preamble
+        return state_chart
+
+
+def read_statechart_streaming(file_path: str, progress: Optional[Callable[[int], None]] = None,
+                              chunk_size: int = StreamingJsonReader.DEFAULT_CHUNK_SIZE
+                              ) -> Tuple[Statechart, StreamingJsonReader]:
+    """
+    流式读取状态机JSON文件，返回状态机和读取统计信息
+
+    每个状态、事件和迁移解码后立刻由 :class:`StatechartBuilder` 转换为模型对象，解码得到的dict随即丢弃，
+    峰值内存约为状态机模型本身加上 ``reader.peak_buffer_size`` 个字符的文本缓冲区。
+    单个数组元素（例如以嵌套形式包含所有子状态的根状态）仍然作为一个整体解码。
+    文件不是支持的布局时（ ``reader.streamed`` 为False）重新读取，完整解码后交给 ``Statechart.from_json`` 。
+    """
+    with open(file_path, 'rb') as f:
+        reader = StreamingJsonReader(f, chunk_size=chunk_size, progress=progress)
+        builder = StatechartBuilder()
+        try:
+            for key, value in reader.iter_items():
+                builder.add_item(key, value)
+            reader.check_end()
+            state_chart = builder.build()
+        except UnsupportedLayout:
+            pass
+        else:
+            reader.streamed = True
+            return state_chart, reader
+    with open(file_path, 'rb') as f:
+        reader = StreamingJsonReader(f, chunk_size=chunk_size, progress=progress)
+        data = reader.load()
+    return Statechart.from_json(data), reader
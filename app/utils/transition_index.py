@@ -0,0 +1,101 @@
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from pyfcstm.model import Transition
+
+#: 迁移的索引键：(源状态id, 目标状态id, 事件id)
+TransitionKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+def transition_key(transition: Transition) -> TransitionKey:
+    """获取迁移的索引键"""
+    return transition.src_state_id, transition.dst_state_id, transition.event_id
+
+
+class TransitionIndex:
+    """
+    迁移的哈希索引
+
+    按(源状态id, 目标状态id, 事件id)三元组、事件id以及源/目标状态id（出边/入边）索引迁移，
+    查找、判重和级联删除的代价只与结果规模有关，与迁移总数无关。
+    索引不会感知迁移对象本身的修改，修改迁移的端点或事件前必须先 ``remove`` ，修改后再 ``add`` 。
+    三元组相同的迁移只能有一个，重复的迁移在 ``add`` 时报错，而不是覆盖已有的迁移。
+    """
+    d_key_transition: Dict[TransitionKey, Transition]
+    d_event_id_keys: Dict[Optional[str], Set[TransitionKey]]
+    d_src_id_keys: Dict[Optional[str], Set[TransitionKey]]
+    d_dst_id_keys: Dict[Optional[str], Set[TransitionKey]]
+
+    def __init__(self, transitions: Iterable[Transition] = ()):
+        self.d_key_transition = {}  # (src_id, dst_id, event_id): transition
+        self.d_event_id_keys = {}  # event.id: {(src_id, dst_id, event_id), ...}
+        self.d_src_id_keys = {}  # state.id: 以该状态为源状态的迁移（出边）
+        self.d_dst_id_keys = {}  # state.id: 以该状态为目标状态的迁移（入边）
+        for transition in transitions:
+            self.add(transition)
+
+    def __len__(self) -> int:
+        return len(self.d_key_transition)
+
+    def __contains__(self, key: TransitionKey) -> bool:
+        return key in self.d_key_transition
+
+    def __iter__(self):
+        return iter(list(self.d_key_transition.values()))
+
+    def get(self, src_state_id: Optional[str], dst_state_id: Optional[str],
+            event_id: Optional[str]) -> Optional[Transition]:
+        """按三元组查找迁移，不存在时返回None"""
+        return self.d_key_transition.get((src_state_id, dst_state_id, event_id), None)
+
+    def add(self, transition: Transition):
+        """将迁移加入索引，索引中已经有相同三元组的其他迁移时抛出ValueError"""
+        key = transition_key(transition)
+        existing = self.d_key_transition.get(key, None)
+        if existing is not None and existing is not transition:
+            event_name = transition.event.name if transition.event is not None else None
+            raise ValueError(f"迁移重复：{transition.src_state.name} -> {transition.dst_state.name}，"
+                             f"事件 {event_name}")
+        self.d_key_transition[key] = transition
+        self.d_src_id_keys.setdefault(key[0], set()).add(key)
+        self.d_dst_id_keys.setdefault(key[1], set()).add(key)
+        self.d_event_id_keys.setdefault(key[2], set()).add(key)
+
+    def remove(self, transition: Transition) -> bool:
+        """将迁移移出索引，索引中的迁移不是该对象时不做任何操作"""
+        key = transition_key(transition)
+        if self.d_key_transition.get(key, None) is not transition:
+            return False
+        del self.d_key_transition[key]
+        self._discard_key(self.d_src_id_keys, key[0], key)
+        self._discard_key(self.d_dst_id_keys, key[1], key)
+        self._discard_key(self.d_event_id_keys, key[2], key)
+        return True
+
+    def transitions_of_event(self, event_id: Optional[str]) -> List[Transition]:
+        """获取使用指定事件的所有迁移"""
+        return [self.d_key_transition[key] for key in self.d_event_id_keys.get(event_id, ())]
+
+    def outgoing_transitions(self, state_id: Optional[str]) -> List[Transition]:
+        """获取以指定状态为源状态的所有迁移"""
+        return [self.d_key_transition[key] for key in self.d_src_id_keys.get(state_id, ())]
+
+    def incoming_transitions(self, state_id: Optional[str]) -> List[Transition]:
+        """获取以指定状态为目标状态的所有迁移"""
+        return [self.d_key_transition[key] for key in self.d_dst_id_keys.get(state_id, ())]
+
+    def transitions_of_states(self, state_ids: Iterable[Optional[str]]) -> List[Transition]:
+        """一次性收集与一组状态关联（作为源状态或目标状态）的所有迁移，结果不重复"""
+        keys = set()
+        for state_id in state_ids:
+            keys.update(self.d_src_id_keys.get(state_id, ()))
+            keys.update(self.d_dst_id_keys.get(state_id, ()))
+        return [self.d_key_transition[key] for key in keys]
+
+    @staticmethod
+    def _discard_key(d_keys: Dict[Optional[str], Set[TransitionKey]], id_: Optional[str], key: TransitionKey):
+        keys = d_keys.get(id_, None)
+        if keys is None:
+            return
+        keys.discard(key)
+        if not keys:
+            del d_keys[id_]
@@ -0,0 +1,318 @@
+import sys
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import TYPE_CHECKING, Deque, Iterable, List, Optional
+
+from pyfcstm.model import CompositeState, Event, State, Transition
+
+if TYPE_CHECKING:
+    from .fcstm_state_chart import FcstmStateChart
+
+
+def _object_size(obj) -> int:
+    """粗略估计对象占用的内存：对象本身以及其直接引用的字符串"""
+    if obj is None:
+        return 0
+    size = sys.getsizeof(obj)
+    for value in getattr(obj, '__dict__', {}).values():
+        if isinstance(value, str):
+            size += sys.getsizeof(value)
+    return size
+
+
+class Delta(ABC):
+    """
+    一次修改的增量记录
+
+    只保存被修改的对象和修改前后的少量字段，不复制整个状态机。
+    ``undo`` / ``redo`` 通过FcstmStateChart中不弹出对话框的基础操作实现。
+    """
+    #: 连续修改合并的最大时间间隔（秒）
+    MERGE_INTERVAL = 1.0
+
+    def __init__(self):
+        self.timestamp = time.monotonic()
+        self.size = sys.getsizeof(self)
+
+    @abstractmethod
+    def undo(self, fcstm_state_chart: 'FcstmStateChart'):
+        pass
+
+    @abstractmethod
+    def redo(self, fcstm_state_chart: 'FcstmStateChart'):
+        pass
+
+    def merge(self, other: 'Delta') -> bool:
+        """尝试将紧接着发生的修改合并到当前记录中，成功时返回True"""
+        return False
+
+    def _can_merge(self, other: 'Delta') -> bool:
+        return type(other) is type(self) and other.timestamp - self.timestamp <= self.MERGE_INTERVAL
+
+
+class AddEventDelta(Delta):
+    def __init__(self, event: Event):
+        Delta.__init__(self)
+        self.event = event
+        self.size += _object_size(event)
+
+    def undo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart._remove_event(self.event)
+
+    def redo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart._insert_event(self.event)
+
+
+class EditEventDelta(Delta):
+    def __init__(self, event: Event, old_name: str, old_guard: str, new_name: str, new_guard: str):
+        Delta.__init__(self)
+        self.event = event
+        self.old_name, self.old_guard = old_name, old_guard
+        self.new_name, self.new_guard = new_name, new_guard
+        self.size += sum(sys.getsizeof(value) for value in (old_name, old_guard, new_name, new_guard))
+
+    def undo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart._update_event(self.event, self.old_name, self.old_guard)
+
+    def redo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart._update_event(self.event, self.new_name, self.new_guard)
+
+    def merge(self, other: Delta) -> bool:
+        if not self._can_merge(other) or other.event is not self.event:
+            return False
+        self.new_name, self.new_guard = other.new_name, other.new_guard
+        self.timestamp = other.timestamp
+        return True
+
+
+class DelEventDelta(Delta):
+    def __init__(self, event: Event, transitions: List[Transition]):
+        Delta.__init__(self)
+        self.event = event
+        self.transitions = transitions
+        self.size += _object_size(event) + sys.getsizeof(transitions) + sum(map(_object_size, transitions))
+
+    def undo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart._insert_event(self.event)
+        for transition in self.transitions:
+            fcstm_state_chart._insert_transition(transition)
+
+    def redo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart._remove_event(self.event)
+
+
+class AddTransitionDelta(Delta):
+    def __init__(self, transition: Transition):
+        Delta.__init__(self)
+        self.transition = transition
+        self.size += _object_size(transition)
+
+    def undo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart._remove_transition(self.transition)
+
+    def redo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart._insert_transition(self.transition)
+
+
+class EditTransitionDelta(Delta):
+    def __init__(self, transition: Transition, old_src_state: State, old_dst_state: State, old_event: Event,
+                 new_src_state: State, new_dst_state: State, new_event: Event):
+        Delta.__init__(self)
+        self.transition = transition
+        self.old_endpoints = (old_src_state, old_dst_state, old_event)
+        self.new_endpoints = (new_src_state, new_dst_state, new_event)
+
+    def undo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart._retarget_transition(self.transition, *self.old_endpoints)
+
+    def redo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart._retarget_transition(self.transition, *self.new_endpoints)
+
+    def merge(self, other: Delta) -> bool:
+        if not self._can_merge(other) or other.transition is not self.transition:
+            return False
+        self.new_endpoints = other.new_endpoints
+        self.timestamp = other.timestamp
+        return True
+
+
+class DelTransitionDelta(AddTransitionDelta):
+    def undo(self, fcstm_state_chart: 'FcstmStateChart'):
+        AddTransitionDelta.redo(self, fcstm_state_chart)
+
+    def redo(self, fcstm_state_chart: 'FcstmStateChart'):
+        AddTransitionDelta.undo(self, fcstm_state_chart)
+
+
+class AddStateDelta(Delta):
+    def __init__(self, father_state: Optional[CompositeState], state: State):
+        Delta.__init__(self)
+        self.father_state = father_state
+        self.state = state
+        self.size += _object_size(state)
+
+    def undo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart.del_state(None, self.state)
+
+    def redo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart.add_state(self.father_state, self.state)
+
+
+class EditStateDelta(Delta):
+    def __init__(self, pro_state: State, new_state: State):
+        Delta.__init__(self)
+        self.pro_state = pro_state
+        self.new_state = new_state
+        self.size += _object_size(pro_state) + _object_size(new_state)
+
+    def undo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart.edit_state(self.new_state, self.pro_state)
+
+    def redo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart.edit_state(self.pro_state, self.new_state)
+
+
+class DelStateDelta(Delta):
+    """删除状态的记录，保存被删除的子树状态和被级联删除的迁移"""
+
+    def __init__(self, father_state: Optional[CompositeState], state: State, subtree_states: List[State],
+                 transitions: List[Transition], was_initial_state: bool):
+        Delta.__init__(self)
+        self.father_state = father_state
+        self.state = state
+        self.subtree_states = subtree_states
+        self.transitions = transitions
+        self.was_initial_state = was_initial_state
+        self.size += (sys.getsizeof(subtree_states) + sum(map(_object_size, subtree_states)) +
+                      sys.getsizeof(transitions) + sum(map(_object_size, transitions)))
+
+    def undo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart._insert_state_subtree(self.father_state, self.state, self.subtree_states, self.transitions)
+        if self.was_initial_state and not fcstm_state_chart.is_initial_state(self.state):
+            fcstm_state_chart._set_initial_state(self.father_state, self.state)
+
+    def redo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart.del_state(None, self.state)
+
+
+class ChangeInitialStateDelta(Delta):
+    def __init__(self, father_state: CompositeState, old_initial_state: Optional[State], new_initial_state: State):
+        Delta.__init__(self)
+        self.father_state = father_state
+        self.old_initial_state = old_initial_state
+        self.new_initial_state = new_initial_state
+
+    def undo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart._set_initial_state(self.father_state, self.old_initial_state)
+
+    def redo(self, fcstm_state_chart: 'FcstmStateChart'):
+        fcstm_state_chart._set_initial_state(self.father_state, self.new_initial_state)
+
+    def merge(self, other: Delta) -> bool:
+        if not self._can_merge(other) or other.father_state is not self.father_state:
+            return False
+        self.new_initial_state = other.new_initial_state
+        self.timestamp = other.timestamp
+        return True
+
+
+class CompoundDelta(Delta):
+    """在FcstmStateChart.batch中产生的一组修改，作为一步撤销/重做"""
+
+    def __init__(self, deltas: Iterable[Delta]):
+        Delta.__init__(self)
+        self.deltas = list(deltas)
+        self.size += sys.getsizeof(self.deltas) + sum(delta.size for delta in self.deltas)
+
+    def undo(self, fcstm_state_chart: 'FcstmStateChart'):
+        for delta in reversed(self.deltas):
+            delta.undo(fcstm_state_chart)
+
+    def redo(self, fcstm_state_chart: 'FcstmStateChart'):
+        for delta in self.deltas:
+            delta.redo(fcstm_state_chart)
+
+
+class UndoHistory:
+    """
+    基于增量记录的撤销/重做历史
+
+    历史记录的总大小受 ``memory_budget`` （字节）限制，超出时丢弃最早的记录，而不是限制步数。
+    同一对象在 ``Delta.MERGE_INTERVAL`` 内的连续修改会合并为一步。
+    """
+    DEFAULT_MEMORY_BUDGET = 16 * 1024 * 1024
+
+    _undo_stack: Deque[Delta]
+    _redo_stack: List[Delta]
+
+    def __init__(self, memory_budget: int = DEFAULT_MEMORY_BUDGET):
+        self.memory_budget = memory_budget
+        self._undo_stack = deque()
+        self._redo_stack = []
+        self._memory_usage = 0
+        # 撤销/重做之后的第一次修改不与栈顶记录合并
+        self._merge_barrier = True
+        self.applying = False
+
+    @property
+    def memory_usage(self) -> int:
+        return self._memory_usage
+
+    def can_undo(self) -> bool:
+        return len(self._undo_stack) > 0
+
+    def can_redo(self) -> bool:
+        return len(self._redo_stack) > 0
+
+    def clear(self):
+        self._undo_stack.clear()
+        self._redo_stack.clear()
+        self._memory_usage = 0
+        self._merge_barrier = True
+
+    def push(self, delta: Delta):
+        """记录一次新的修改，并清空重做栈"""
+        for redo_delta in self._redo_stack:
+            self._memory_usage -= redo_delta.size
+        self._redo_stack.clear()
+        if not self._merge_barrier and self._undo_stack:
+            top = self._undo_stack[-1]
+            old_size = top.size
+            if top.merge(delta):
+                self._memory_usage += top.size - old_size
+                return
+        self._merge_barrier = False
+        self._undo_stack.append(delta)
+        self._memory_usage += delta.size
+        self._shrink()
+
+    def _shrink(self):
+        # 至少保留最近的一步
+        while self._memory_usage > self.memory_budget and len(self._undo_stack) > 1:
+            self._memory_usage -= self._undo_stack.popleft().size
+
+    def undo(self, fcstm_state_chart: 'FcstmStateChart') -> bool:
+        if not self._undo_stack:
+            return False
+        delta = self._undo_stack.pop()
+        self._apply(fcstm_state_chart, delta.undo)
+        self._redo_stack.append(delta)
+        return True
+
+    def redo(self, fcstm_state_chart: 'FcstmStateChart') -> bool:
+        if not self._redo_stack:
+            return False
+        delta = self._redo_stack.pop()
+        self._apply(fcstm_state_chart, delta.redo)
+        self._undo_stack.append(delta)
+        return True
+
+    def _apply(self, fcstm_state_chart: 'FcstmStateChart', action):
+        self.applying = True
+        try:
+            with fcstm_state_chart.batch():
+                action(fcstm_state_chart)
+        finally:
+            self.applying = False
+            self._merge_barrier = True
@@ -1,8 +1,12 @@
-from PyQt5.QtWidgets import QDialog, QFileDialog, QGraphicsScene, QGraphicsPixmapItem, QGraphicsView, QVBoxLayout
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QDialog, QFileDialog, QGraphicsScene, QGraphicsPixmapItem, QGraphicsView, QVBoxLayout, \
+    QGraphicsTextItem, QMessageBox
+from PyQt5.QtCore import Qt, QThread
 from PyQt5.QtGui import QPixmap, QPainter
 from PyQt5 import uic
-import os
+from typing import Optional
+from app.utils.atomic_write import atomic_write
+from app.utils.diagram_cache import DiagramCache
+from app.utils.diagram_render_worker import DiagramRenderWorker, start_diagram_render_worker
 from app.utils.show_state_graph import ShowStateGraph
 from pyfcstm.model import Statechart
 from app.ui import UIDialogShowGraph
@@ -31,11 +35,15 @@ class CustomGraphicsView(QGraphicsView):
         self.translate(delta.x(), delta.y())
 
 class DialogShowGraph(QDialog, UIDialogShowGraph):
-    def __init__(self, parent, fcstm_state_chart: FcstmStateChart):
+    def __init__(self, parent, fcstm_state_chart: FcstmStateChart, diagram_cache: Optional[DiagramCache] = None):
         QDialog.__init__(self, parent)
         self.setupUi(self)
         self.fcstm_state_chart = fcstm_state_chart
-        self.temp_png_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'temp_state_graph.png')
+        self.diagram_cache = diagram_cache
+        self._render_worker: Optional[DiagramRenderWorker] = None
+        self._render_thread: Optional[QThread] = None
+        # 渲染得到的PNG数据，只保存在内存中，导出时直接写入
+        self._png_data: Optional[bytes] = None
         
         # 创建自定义的CustomGraphicsView并添加到widget容器中
         self.graphics_view_show_graph = CustomGraphicsView()
@@ -45,6 +53,8 @@ class DialogShowGraph(QDialog, UIDialogShowGraph):
         
         # 连接信号和槽
         self.button_export_graph.clicked.connect(self.export_graph)
+        self.button_cancel_render.clicked.connect(self.cancel_render)
+        self.button_rerender_graph.clicked.connect(self.show_state_graph)
         
         # 设置图形视图的属性
         self.graphics_view_show_graph.setDragMode(QGraphicsView.ScrollHandDrag)
@@ -54,34 +64,96 @@ class DialogShowGraph(QDialog, UIDialogShowGraph):
         self.graphics_view_show_graph.setResizeAnchor(QGraphicsView.AnchorUnderMouse)
         self.graphics_view_show_graph.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
         
-        # 显示状态机图
+        # 在后台渲染状态机图，对话框先显示占位内容
         self.show_state_graph()
-        
+
+    @property
+    def is_rendering(self) -> bool:
+        return self._render_worker is not None
+
+    def _show_placeholder(self, text: str):
+        """在视图中显示提示文字，代替尚未渲染完成的图像"""
+        scene = QGraphicsScene()
+        scene.addItem(QGraphicsTextItem(text))
+        self.graphics_view_show_graph.resetTransform()
+        self.graphics_view_show_graph.setScene(scene)
+
+    def _set_rendering(self, rendering: bool):
+        self.progress_render_graph.setVisible(rendering)
+        self.button_cancel_render.setEnabled(rendering)
+        self.button_rerender_graph.setEnabled(not rendering)
+        self.button_export_graph.setEnabled(not rendering and self._png_data is not None)
+
     def show_state_graph(self):
-        """显示状态机图"""
-        # 生成状态机图
-        ShowStateGraph.show_state_graph(self.fcstm_state_chart, self.temp_png_path)
-        
+        """在工作线程中渲染状态机图，完成后替换占位内容"""
+        # PlantUML代码需要读取正在编辑的状态机，在主线程中生成
+        plantuml_code = ShowStateGraph.generate_plantuml_statechart(self.fcstm_state_chart)
+        self._png_data = None
+        self._show_placeholder("正在渲染状态机图...")
+        worker = DiagramRenderWorker(plantuml_code, cache=self.diagram_cache)
+        worker.stage_changed.connect(lambda stage: self._show_placeholder(stage + "..."))
+        worker.finished.connect(lambda data: self._on_render_finished(worker, data))
+        worker.failed.connect(lambda message: self._on_render_failed(worker, message))
+        worker.canceled.connect(lambda: self._on_render_canceled(worker))
+        self._render_worker = worker
+        self._set_rendering(True)
+        # 线程属于主窗口，对话框关闭后取消的渲染仍可以正常结束
+        self._render_thread = start_diagram_render_worker(worker, self.parent())
+
+    def cancel_render(self):
+        """取消正在进行的渲染，结束PlantUML进程"""
+        if self._render_worker is not None:
+            self._render_worker.cancel()
+
+    def _end_render(self, worker: DiagramRenderWorker) -> bool:
+        """结束worker对应的渲染，worker已经不是当前的渲染时返回False"""
+        if worker is not self._render_worker:
+            return False
+        self._render_worker = None
+        return True
+
+    def _on_render_finished(self, worker: DiagramRenderWorker, data: bytes):
+        if not self._end_render(worker):
+            return
+        # 直接从内存中的数据解码，不经过临时文件
+        pixmap = QPixmap()
+        if not pixmap.loadFromData(data, 'PNG'):
+            self._show_placeholder("渲染结果不是有效的PNG图片")
+            self._set_rendering(False)
+            return
+
         # 创建场景并显示图像
         scene = QGraphicsScene()
-        pixmap = QPixmap(self.temp_png_path)
-        
-        # 增加图片大小
-        scaled_pixmap = pixmap.scaled(pixmap.width() * 2, pixmap.height() * 2, 
-                                    Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        
-        item = QGraphicsPixmapItem(scaled_pixmap)
+        # 以2倍大小显示：由视图在绘制时平滑缩放，不再另外生成一份放大的图片
+        item = QGraphicsPixmapItem(pixmap)
+        item.setTransformationMode(Qt.SmoothTransformation)
+        item.setScale(2)
         scene.addItem(item)
-        
+        scene.setSceneRect(item.sceneBoundingRect())
+
         # 设置场景到视图
         self.graphics_view_show_graph.setScene(scene)
         self.graphics_view_show_graph.setRenderHint(QPainter.Antialiasing)
         self.graphics_view_show_graph.setRenderHint(QPainter.SmoothPixmapTransform)
         self.graphics_view_show_graph.setRenderHint(QPainter.TextAntialiasing)
-        
+
         # 调整视图以适应内容
         self.graphics_view_show_graph.fitInView(scene.sceneRect(), Qt.KeepAspectRatio)
-        
+        self._png_data = data
+        self._set_rendering(False)
+
+    def _on_render_failed(self, worker: DiagramRenderWorker, message: str):
+        if not self._end_render(worker):
+            return
+        self._show_placeholder(f"渲染状态机图时发生错误：\n{message}")
+        self._set_rendering(False)
+
+    def _on_render_canceled(self, worker: DiagramRenderWorker):
+        if not self._end_render(worker):
+            return
+        self._show_placeholder("已取消渲染，点击“重新渲染”可以再次生成状态机图")
+        self._set_rendering(False)
+
     def export_graph(self):
         """导出状态机图"""
         # 获取保存路径
@@ -92,14 +164,18 @@ class DialogShowGraph(QDialog, UIDialogShowGraph):
             "PNG Files (*.png);;All Files (*)"
         )
         
-        if file_path:
-            # 复制临时文件到目标位置
-            if os.path.exists(self.temp_png_path):
-                import shutil
-                shutil.copy2(self.temp_png_path, file_path)
+        if file_path and self._png_data is not None:
+            # 写入渲染得到的原始PNG数据
+            try:
+                with atomic_write(file_path) as temp_path:
+                    with open(temp_path, 'wb') as f:
+                        f.write(self._png_data)
+            except OSError as e:
+                QMessageBox.critical(self, "错误", f"导出状态机图时发生错误：\n{str(e)}", QMessageBox.Ok)
     
-    def closeEvent(self, event):
-        """关闭对话框时清理临时文件"""
-        if os.path.exists(self.temp_png_path):
-            os.remove(self.temp_png_path)
-        super().closeEvent(event)
+    def done(self, result):
+        """对话框以任何方式关闭时都取消正在进行的渲染"""
+        self.cancel_render()
+        # 之后到达的渲染结果直接丢弃
+        self._render_worker = None
+        super().done(result)
@@ -4,28 +4,77 @@ import os
 import PyQt5.Qt
 from PyQt5 import QtWidgets
 from PyQt5.Qt import QMainWindow
-from PyQt5.QtCore import Qt, QPoint
+from PyQt5.QtCore import Qt, QPoint, QSortFilterProxyModel, QTimer
+from PyQt5.QtGui import QKeySequence
 import qtawesome as qta
 from pyfcstm.model import State, CompositeState, Statechart
 
+from app.config import DIAGRAM_CACHE_MAX_BYTES, EXPORT_CACHE_MAX_BYTES
 from app.ui import UIMainWindow
+from app.utils.binary_statechart import BinaryStatechartReader, BinaryStatechartView, is_binary_statechart
 from app.utils.c_code_editor import CCodeEditor
 from app.utils.create_formLayout_dialog import create_formlayout_dialog
+from app.utils.diagram_cache import DiagramCache
+from app.utils.export_cache import ExportCache
+from app.utils.edit_journal import EditJournal, discard_autosave, has_autosave, recover_statechart
 from app.utils.fcstm_state_chart import FcstmStateChart
-from app.utils.export_to_word import export_statechart_to_word
-from app.utils.export_to_excel import export_statechart_to_excel
+from app.utils.state_tree_model import StateTreeModel
+from app.utils.state_chart_change import StateChartChange
+from app.utils.state_chart_table_model import EventTableModel, ProblemTableModel, TransitionTableModel
+from app.utils.state_chart_validator import StateChartValidator
+from app.utils.statechart_import_worker import StatechartImportWorker, start_import_worker
+from app.utils.statechart_export_worker import EXPORTERS, StatechartExportWorker, start_export_worker
+from app.utils.statechart_snapshot import StatechartSnapshot
+from app.utils.statechart_validate_worker import StatechartValidateWorker, start_validate_worker
 from .dialog_edit_state import DialogEditState
 from .dialog_show_graph import DialogShowGraph
 
 class AppMainWindow(QMainWindow, UIMainWindow):
+    #: 导入后完全展开状态树的最大状态数量
+    EXPAND_ALL_STATE_LIMIT = 2000
+    #: 导出对话框的过滤器: 导出格式
+    EXPORT_FILTER_FORMATS = {
+        "JSON Files (*.json)": '.json',
+        "Binary Statechart Files (*.fcstmb)": '.fcstmb',
+        "Word Documents (*.docx)": '.docx',
+        "Excel Files (*.xlsx)": '.xlsx',
+    }
     
     fcstm_state_chart: Optional[FcstmStateChart]
 
-    def __init__(self):
+    def __init__(self, autosave_dir: Optional[str] = None, export_cache_dir: Optional[str] = None,
+                 diagram_cache_dir: Optional[str] = None, diagram_cache_max_bytes: int = DIAGRAM_CACHE_MAX_BYTES,
+                 export_cache_max_bytes: int = EXPORT_CACHE_MAX_BYTES):
+        """
+        :param autosave_dir: 自动保存目录，为None时不自动保存
+        :param export_cache_dir: 导出文件缓存目录，为None时不缓存导出的文档
+        :param diagram_cache_dir: 状态机图缓存目录，为None时每次打开都重新渲染
+        :param diagram_cache_max_bytes: 状态机图缓存的容量上限
+        :param export_cache_max_bytes: 导出文件缓存的容量上限
+        """
         QMainWindow.__init__(self)
         self.setupUi(self)
         self.at_page_initial = True
         self.fcstm_state_chart = None
+        self.state_tree_model = None
+        self.event_table_model = None
+        self.transition_table_model = None
+        self.validator = None
+        self.problem_table_model = None
+        self._import_worker = None
+        self._import_progress_dialog = None
+        # 导入二进制状态机文件期间显示的只读预览
+        self._import_preview_reader = None
+        self._import_preview_model = None
+        self._export_worker = None
+        self._export_progress_dialog = None
+        self._validate_worker = None
+        self.autosave_dir = autosave_dir
+        self.edit_journal = None
+        self.export_cache = ExportCache(export_cache_dir, export_cache_max_bytes) \
+            if export_cache_dir is not None else None
+        self.diagram_cache = DiagramCache(diagram_cache_dir, diagram_cache_max_bytes) \
+            if diagram_cache_dir is not None else None
         self.code_file_path = "./"
         self.state_machine_file_path = "./"
         self._init()
@@ -63,6 +112,12 @@ class AppMainWindow(QMainWindow, UIMainWindow):
         #折叠所有状态按钮
         self._init_button_state_machine_fold_all()
         self._init_button_code_gen_fold_all()
+        #撤销和重做快捷键
+        self._init_undo_redo_shortcuts()
+        #问题列表
+        self._init_problems_dock()
+        #自动保存
+        self._init_autosave()
         '''
         self._init_button_save_state()
         '''
@@ -120,14 +175,62 @@ class AppMainWindow(QMainWindow, UIMainWindow):
         root_state = CompositeState(name="初始状态")
         states = [root_state]
         state_chart = Statechart(name=state_machine_name[0], root_state=root_state, states=states)
-        self.fcstm_state_chart = FcstmStateChart(self.tree_state_machine_all_state, state_chart)
+        self._set_fcstm_state_chart(FcstmStateChart(None, state_chart, tree_items=False))
         self.edit_state_machine_name.setText(state_machine_name[0])
         
         if self.at_page_initial:
             self.stackedWidget_state_machine.setCurrentIndex(1)
             self.at_page_initial = False
 
+    def _set_fcstm_state_chart(self, fcstm_state_chart: FcstmStateChart, base_model: Optional[dict] = None):
+        """切换当前编辑的状态机，并重新绑定事件和迁移表格的模型，``base_model`` 为预先生成的自动保存快照"""
+        if self.fcstm_state_chart is not None:
+            self.fcstm_state_chart.unsubscribe(self._on_state_chart_changed)
+        if self.validator is not None:
+            self.validator.close()
+        self.fcstm_state_chart = fcstm_state_chart
+        fcstm_state_chart.subscribe(self._on_state_chart_changed)
+        if self.edit_journal is not None:
+            self.edit_journal.start(fcstm_state_chart, base_model)
+        old_models = [self.state_tree_model, self.event_table_model, self.transition_table_model,
+                      self.problem_table_model]
+        # 状态树只为展开的节点加载子状态，不再为每个状态创建树节点
+        self.state_tree_model = StateTreeModel(fcstm_state_chart, self)
+        self.tree_state_machine_all_state.setModel(self.state_tree_model)
+        self.event_table_model = EventTableModel(fcstm_state_chart, self)
+        self.transition_table_model = TransitionTableModel(fcstm_state_chart, self)
+        self.table_state_machine_event.model().setSourceModel(self.event_table_model)
+        self.table_state_machine_transition.model().setSourceModel(self.transition_table_model)
+        # 合法性检查随修改增量进行，结果实时显示在问题列表中
+        self.validator = StateChartValidator(fcstm_state_chart)
+        self.problem_table_model = ProblemTableModel(self.validator, self)
+        self.table_problems.model().setSourceModel(self.problem_table_model)
+        for old_model in old_models:
+            if old_model is not None:
+                old_model.deleteLater()
+
+    def _on_state_chart_changed(self, change: StateChartChange):
+        """状态机发生修改时只更新状态树中受影响的子树和表格中受影响的行"""
+        self.state_tree_model.sync()
+        self.event_table_model.apply_change(change)
+        self.transition_table_model.apply_change(change)
+        self.problem_table_model.apply_change(change)
+
+    def _table_row_data(self, table: QtWidgets.QTableView, row: int):
+        """获取表格视图中一行的显示文本"""
+        proxy_model = table.model()
+        return [proxy_model.index(row, col).data() for col in range(proxy_model.columnCount())]
+
     def _init_table_style(self):
+        # 事件和迁移表格由模型提供数据，通过代理模型排序而不复制数据
+        for table in (self.table_state_machine_event, self.table_state_machine_transition):
+            proxy_model = QSortFilterProxyModel(table)
+            proxy_model.setSortCaseSensitivity(Qt.CaseInsensitive)
+            table.setModel(proxy_model)
+            table.setSortingEnabled(True)
+            table.sortByColumn(-1, Qt.AscendingOrder)
+            table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+            table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
         # 让table中的所有列等比例填充窗口
         event_header = self.table_state_machine_event.horizontalHeader()
         event_header.setSectionResizeMode(QtWidgets.QHeaderView.Stretch)
@@ -136,6 +239,49 @@ class AppMainWindow(QMainWindow, UIMainWindow):
         #首先让页面显示在导入状态机和新建状态机页面
         self.stackedWidget_state_machine.setCurrentIndex(0)
 
+    def _init_problems_dock(self):
+        self.table_problems = QtWidgets.QTableView(self)
+        proxy_model = QSortFilterProxyModel(self.table_problems)
+        self.table_problems.setModel(proxy_model)
+        self.table_problems.setSortingEnabled(True)
+        self.table_problems.sortByColumn(-1, Qt.AscendingOrder)
+        self.table_problems.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
+        self.table_problems.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table_problems.verticalHeader().hide()
+        self.table_problems.horizontalHeader().setStretchLastSection(True)
+        self.table_problems.doubleClicked.connect(self._locate_problem)
+        self.dock_problems = QtWidgets.QDockWidget("问题", self)
+        self.dock_problems.setObjectName("dock_problems")
+        self.dock_problems.setWidget(self.table_problems)
+        self.addDockWidget(Qt.BottomDockWidgetArea, self.dock_problems)
+        self.dock_problems.hide()
+
+    def _show_problems(self):
+        self.dock_problems.show()
+        self.dock_problems.raise_()
+
+    def _locate_problem(self, proxy_index):
+        """双击问题时选中对应的状态、事件或迁移"""
+        source_index = self.table_problems.model().mapToSource(proxy_index)
+        diagnostic = self.problem_table_model.object_at(source_index.row())
+        if diagnostic is None:
+            return
+        if diagnostic.kind == 'state':
+            index = self.state_tree_model.index_of_state(diagnostic.element_id)
+            if index.isValid():
+                self.tree_state_machine_all_state.setCurrentIndex(index)
+                self.tree_state_machine_all_state.scrollTo(index)
+            return
+        if diagnostic.kind == 'event':
+            table, model = self.table_state_machine_event, self.event_table_model
+        else:
+            table, model = self.table_state_machine_transition, self.transition_table_model
+        row = model.row_of(diagnostic.element_id)
+        if row >= 0:
+            proxy_row_index = table.model().mapFromSource(model.index(row, 0))
+            table.selectRow(proxy_row_index.row())
+            table.scrollTo(proxy_row_index)
+
     def _init_tree_style(self):
         self.tree_state_machine_all_state.header().hide()
         self.tree_state_machine_all_state.setTextElideMode(Qt.ElideNone)
@@ -204,8 +350,8 @@ class AppMainWindow(QMainWindow, UIMainWindow):
 
     def _show_table_context_menu(self, pos, table):
         # 获取点击的项
-        item = table.itemAt(pos)
-        if not item:
+        index = table.indexAt(pos)
+        if not index.isValid():
             return
         # 创建上下文菜单
         context_menu = QtWidgets.QMenu(self)
@@ -219,14 +365,13 @@ class AppMainWindow(QMainWindow, UIMainWindow):
         action = context_menu.exec_(global_pos)
 
         if action == edit_action:
-            self._edit_item(table, item.row())
+            self._edit_item(table, index.row())
         elif action == delete_action:
-            self._delete_item(table, item.row())
+            self._delete_item(table, index.row())
 
     def _delete_item(self, table, row):
         if table == self.table_state_machine_event:
-            event_name = table.item(row, 0).text() if table.item(row, 0) is not None else None
-            event_guard = table.item(row, 1).text() if table.item(row, 1) is not None else None
+            event_name, event_guard = self._table_row_data(table, row)
 
             #同步删除transition中的内容
             reply = QtWidgets.QMessageBox.question(self, "删除确认", f"删除'{event_name}'事件，会同时删除关联的迁移，确定要继续删除吗",
@@ -237,12 +382,8 @@ class AppMainWindow(QMainWindow, UIMainWindow):
             self.fcstm_state_chart.del_event(self, event_name)
 
         elif table == self.table_state_machine_transition:
-            transition_src_name = table.item(row, 0).text() if table.item(row, 0) is not None else None
-            transition_event_name = table.item(row, 1).text() if table.item(row, 1) is not None else None
-            transition_target_name = table.item(row, 2).text() if table.item(row, 2) is not None else None
+            transition_src_name, transition_event_name, transition_target_name = self._table_row_data(table, row)
             self.fcstm_state_chart.del_transition(self, transition_src_name, transition_event_name, transition_target_name)
-        # 更新表格
-        self._display_state_event_transition_details()
 
     def _edit_item(self, table, row):
         if table == self.table_state_machine_event:
@@ -265,15 +406,15 @@ class AppMainWindow(QMainWindow, UIMainWindow):
         dialog.setWindowFlags(dialog.windowFlags() & ~Qt.WindowContextHelpButtonHint)
         # 创建输入框
         entries = []
+        event_model = self.table_state_machine_event.model()
         if is_edit:
-            data = [self.table_state_machine_event.item(row, col).text() if self.table_state_machine_event.item(row, col) is not None else None
-                   for col in range(self.table_state_machine_event.columnCount())]
+            data = self._table_row_data(self.table_state_machine_event, row)
         else:
-            data = [""] * self.table_state_machine_event.columnCount()
+            data = [""] * event_model.columnCount()
 
         # 为每一列创建输入框
-        for col in range(self.table_state_machine_event.columnCount()):
-            header = self.table_state_machine_event.horizontalHeaderItem(col).text()
+        for col in range(event_model.columnCount()):
+            header = event_model.headerData(col, Qt.Horizontal)
             line_edit = QtWidgets.QLineEdit(data[col])
             layout.addRow(header, line_edit)
             entries.append(line_edit)
@@ -303,12 +444,10 @@ class AppMainWindow(QMainWindow, UIMainWindow):
             new_event_guard = new_data[1]
 
             if is_edit:
-                old_event_name = self.table_state_machine_event.item(row, 0).text()
+                old_event_name = data[0]
                 self.fcstm_state_chart.edit_event(self, new_event_name, new_event_guard, old_event_name)
             else:
                 self.fcstm_state_chart.add_event(self, new_event_name, new_event_guard)
-            # 重新加载表格
-            self._display_state_event_transition_details()
 
     def _show_transitions_dialog(self, is_edit=False, row=-1):
         """
@@ -324,15 +463,15 @@ class AppMainWindow(QMainWindow, UIMainWindow):
         dialog.setWindowFlags(dialog.windowFlags() & ~Qt.WindowContextHelpButtonHint)
         # 创建输入框
         entries = []
+        transition_model = self.table_state_machine_transition.model()
         if is_edit:
-            data = [self.table_state_machine_transition.item(row, col).text() if self.table_state_machine_transition.item(row, col) is not None else None
-                    for col in range(self.table_state_machine_transition.columnCount())]
+            data = self._table_row_data(self.table_state_machine_transition, row)
         else:
-            data = [""] * self.table_state_machine_transition.columnCount()
+            data = [""] * transition_model.columnCount()
 
         # 为每一列创建输入框
-        for col in range(self.table_state_machine_transition.columnCount()):
-            header = self.table_state_machine_transition.horizontalHeaderItem(col).text()
+        for col in range(transition_model.columnCount()):
+            header = transition_model.headerData(col, Qt.Horizontal)
             line_edit = QtWidgets.QLineEdit(data[col])
             layout.addRow(header, line_edit)
             entries.append(line_edit)
@@ -374,9 +513,7 @@ class AppMainWindow(QMainWindow, UIMainWindow):
                 return
 
             if is_edit:
-                old_transition_src_name = self.table_state_machine_transition.item(row, 0).text()
-                old_transition_event_name = self.table_state_machine_transition.item(row, 1).text()
-                old_transition_target_name = self.table_state_machine_transition.item(row, 2).text()
+                old_transition_src_name, old_transition_event_name, old_transition_target_name = data
                 old_transition_src_state = self.fcstm_state_chart.state_chart.states.get_by_name(old_transition_src_name)
                 old_transition_target_state = self.fcstm_state_chart.state_chart.states.get_by_name(old_transition_target_name)
                 old_transition_event = self.fcstm_state_chart.state_chart.events.get_by_name(old_transition_event_name)
@@ -389,9 +526,6 @@ class AppMainWindow(QMainWindow, UIMainWindow):
                 self.fcstm_state_chart.add_transition(self, new_transition_src_state, new_transition_target_state,
                                                       new_transition_event)
 
-            # 重新加载表格
-            self._display_state_event_transition_details()
-
     def _init_button_state_machine_add_event(self):
         self.button_state_machine_add_event.clicked.connect(lambda: self._show_event_dialog(False))
 
@@ -408,16 +542,23 @@ class AppMainWindow(QMainWindow, UIMainWindow):
 
     def _handle_tab_changed(self, index):
         if index == 1 and self.fcstm_state_chart is not None:
-            #填充tree_code_gen_all_state
-            self.fcstm_state_chart.populate_tree_state_machine_all_state(self.tree_code_gen_all_state)
-            self.tree_code_gen_all_state.expandAll()
+            model = self.tree_code_gen_all_state.model()
+            if isinstance(model, StateTreeModel) and model.fcstm_state_chart is self.fcstm_state_chart:
+                #状态机未更换时只同步发生变化的子树
+                model.sync()
+                return
+            #填充tree_code_gen_all_state，子状态在展开时按需加载，因此只展开第一层
+            self.tree_code_gen_all_state.setModel(StateTreeModel(self.fcstm_state_chart, self.tree_code_gen_all_state))
+            self.tree_code_gen_all_state.expandToDepth(0)
+            if model is not None:
+                model.deleteLater()
 
     def show_tree_state_machine_all_state_context_menu(self, position: QPoint):
-        item = self.tree_state_machine_all_state.itemAt(position)
-        if item is None:
+        index = self.tree_state_machine_all_state.indexAt(position)
+        if not index.isValid():
             return
 
-        state = item.data(0, Qt.UserRole)
+        state = self.fcstm_state_chart.get_state(self.state_tree_model.state_id(index))
         if state is None:
             return
 
@@ -427,9 +568,9 @@ class AppMainWindow(QMainWindow, UIMainWindow):
         delete_action = QtWidgets.QAction("删除状态", self)
         set_initial_action = QtWidgets.QAction("设为初始状态", self)
 
-        edit_action.triggered.connect(lambda: self.edit_state(item, state))
-        add_action.triggered.connect(lambda: self.add_sub_state(item, state))
-        delete_action.triggered.connect(lambda: self.delete_state(item, state))
+        edit_action.triggered.connect(lambda: self.edit_state(None, state))
+        add_action.triggered.connect(lambda: self.add_sub_state(None, state))
+        delete_action.triggered.connect(lambda: self.delete_state(None, state))
         set_initial_action.triggered.connect(lambda: self.set_as_initial_state(state))
 
         menu.addAction(edit_action)
@@ -461,20 +602,17 @@ class AppMainWindow(QMainWindow, UIMainWindow):
 
         if reply == QtWidgets.QMessageBox.Yes:
             self.fcstm_state_chart.del_state(item, state)
-            # 更新表格
-            self._display_state_event_transition_details()
 
     def set_as_initial_state(self, state):
-        parent_item = self.tree_state_machine_all_state.currentItem().parent()
+        parent_state = self.fcstm_state_chart.d_id_father_state.get(state.id, None)
         #如果是设置整个状态机的初始状态：
         #TODO:fcstm中statechart的root_state并不能设置
-        if not parent_item:
+        if parent_state is None:
             if self.fcstm_state_chart.state_chart.root_state.id == state.id:
                 return
             QtWidgets.QMessageBox.warning(self, "操作无效", "状态机根节点不能修改")
             return
 
-        parent_state = parent_item.data(0, Qt.UserRole)
         if isinstance(parent_state, CompositeState):
             self.fcstm_state_chart.change_initial_state(parent_state, state)
 
@@ -500,6 +638,25 @@ class AppMainWindow(QMainWindow, UIMainWindow):
         self.button_state_machine_expand_all.setIconSize(PyQt5.Qt.QSize(25, 25))
         self.button_state_machine_expand_all.clicked.connect(lambda: self._expand_all_state(self.tree_state_machine_all_state))
 
+    def _init_undo_redo_shortcuts(self):
+        # 代码编辑器获得焦点时由编辑器自己处理撤销/重做
+        undo_action = QtWidgets.QAction("撤销", self)
+        undo_action.setShortcut(QKeySequence.Undo)
+        undo_action.triggered.connect(self._undo)
+        redo_action = QtWidgets.QAction("重做", self)
+        redo_action.setShortcuts([QKeySequence("Ctrl+Y"), QKeySequence("Ctrl+Shift+Z")])
+        redo_action.triggered.connect(self._redo)
+        self.addAction(undo_action)
+        self.addAction(redo_action)
+
+    def _undo(self):
+        if self.fcstm_state_chart is not None:
+            self.fcstm_state_chart.undo()
+
+    def _redo(self):
+        if self.fcstm_state_chart is not None:
+            self.fcstm_state_chart.redo()
+
     def _init_button_state_machine_fold_all(self):
         self.button_state_machine_fold_all.setToolTip("折叠所有")
         fold_icon = qta.icon('fa5s.angle-up', color='#000000')
@@ -578,44 +735,15 @@ class AppMainWindow(QMainWindow, UIMainWindow):
                 QtWidgets.QMessageBox.Ok
             )
 
-    def _expand_all_state(self, tree_widget: QtWidgets.QTreeWidget):
+    def _expand_all_state(self, tree_widget: QtWidgets.QTreeView):
         tree_widget.expandAll()
 
-    def _fold_all_state(self, tree_widget: QtWidgets.QTreeWidget):
+    def _fold_all_state(self, tree_widget: QtWidgets.QTreeView):
         tree_widget.collapseAll()
 
-    def _display_state_event_transition_details(self):
-        try:
-            if self.fcstm_state_chart is None:
-                return
-
-            # 更新 Events 表格
-            self.table_state_machine_event.setRowCount(0)
-            for event in self.fcstm_state_chart.state_chart.events:
-                row = self.table_state_machine_event.rowCount()
-                self.table_state_machine_event.insertRow(row)
-                self.table_state_machine_event.setItem(row, 0, QtWidgets.QTableWidgetItem(event.name))
-                self.table_state_machine_event.setItem(row, 1, QtWidgets.QTableWidgetItem(event.guard))
-
-            # 更新 Transitions 表格
-            self.table_state_machine_transition.setRowCount(0)
-            for transition in self.fcstm_state_chart.state_chart.transitions:
-                row = self.table_state_machine_transition.rowCount()
-                self.table_state_machine_transition.insertRow(row)
-                self.table_state_machine_transition.setItem(row, 0, QtWidgets.QTableWidgetItem(transition.src_state.name))
-                self.table_state_machine_transition.setItem(row, 1, QtWidgets.QTableWidgetItem(transition.event.name))
-                self.table_state_machine_transition.setItem(row, 2, QtWidgets.QTableWidgetItem(transition.dst_state.name))
-        except Exception as e:
-            QtWidgets.QMessageBox.critical(
-                self,
-                "错误",
-                f"更新状态机详情时发生错误：\n{str(e)}",
-                QtWidgets.QMessageBox.Ok
-            )
-
     def _add_state(self, father_state: Optional[CompositeState], is_edit = False):
         """
-        保存状态信息，并使用QTreeWidget展示状态
+        保存状态信息，并在状态树中展示状态
         """
         try:
             new_state = None
@@ -675,7 +803,6 @@ class AppMainWindow(QMainWindow, UIMainWindow):
                             QtWidgets.QMessageBox.Ok
                         )
                         return
-            self._display_state_event_transition_details()
         except Exception as e:
             QtWidgets.QMessageBox.critical(
                 self,
@@ -693,53 +820,250 @@ class AppMainWindow(QMainWindow, UIMainWindow):
                 
             file_path, _ = QtWidgets.QFileDialog.getOpenFileName(
                 self, 
-                "选择json文件", 
+                "选择状态机文件", 
                 self.state_machine_file_path, 
-                "JSON Files (*.json);;All Files (*)"
+                "JSON Files (*.json);;Binary Statechart Files (*.fcstmb);;Excel Files (*.xlsx);;All Files (*)"
             )
             if not file_path:
                 return
                 
             # 更新上次使用的路径
             self.state_machine_file_path = os.path.dirname(file_path)
-            
-            try:
-                state_chart = Statechart.read_json(file_path)
-            except Exception as e:
-                QtWidgets.QMessageBox.critical(
-                    self,
-                    "导入失败",
-                    f"读取JSON文件时发生错误：\n{str(e)}",
-                    QtWidgets.QMessageBox.Ok
-                )
-                return
+            self._start_import(file_path)
+        except Exception as e:
+            QtWidgets.QMessageBox.critical(
+                self,
+                "错误",
+                f"导入状态机时发生未知错误：\n{str(e)}",
+                QtWidgets.QMessageBox.Ok
+            )
+
+    def _start_import(self, file_path: str):
+        """在工作线程中读取并解析状态机，界面保持响应，完成后一次性替换当前状态机"""
+        if self._import_worker is not None:
+            return
+        self._import_worker = StatechartImportWorker(file_path, tree_items=False)
+        self._import_progress_dialog = QtWidgets.QProgressDialog("正在导入状态机...", "取消", 0, 0, self)
+        self._import_progress_dialog.setWindowTitle("导入状态机")
+        self._import_progress_dialog.setWindowModality(Qt.WindowModal)
+        self._import_progress_dialog.setMinimumDuration(300)
+        self._import_progress_dialog.setAutoClose(False)
+        self._import_progress_dialog.setAutoReset(False)
+        self._import_progress_dialog.canceled.connect(self._import_worker.cancel)
+        self._import_worker.progress.connect(self._on_import_progress)
+        self._import_worker.stage_changed.connect(self._on_import_stage_changed)
+        self._import_worker.finished.connect(self._on_import_finished)
+        self._import_worker.failed.connect(self._on_import_failed)
+        self._import_worker.canceled.connect(self._end_import)
+        start_import_worker(self._import_worker, self)
+        if is_binary_statechart(file_path):
+            self._show_import_preview(file_path)
+
+    def _show_import_preview(self, file_path: str):
+        """
+        在工作线程完整解码二进制状态机文件期间，直接在mmap上按需显示状态层次结构
 
-            self.fcstm_state_chart = FcstmStateChart(self.tree_state_machine_all_state, state_chart)
-            try:
-                self.fcstm_state_chart.legality_check(self)
-            except Exception as e:
+        预览只读取顶层状态，展开节点时才解码子状态；导入结束后换回可编辑的模型。
+        """
+        try:
+            reader = BinaryStatechartReader(file_path)
+        except (OSError, ValueError):
+            # 文件有问题时由导入线程报告错误
+            return
+        self._import_preview_reader = reader
+        self._import_preview_model = StateTreeModel(BinaryStatechartView(reader), self)
+        self.tree_state_machine_all_state.setModel(self._import_preview_model)
+        if self.at_page_initial:
+            self.stackedWidget_state_machine.setCurrentIndex(1)
+
+    def _end_import_preview(self):
+        if self._import_preview_model is None:
+            return
+        self.tree_state_machine_all_state.setModel(self.state_tree_model)
+        self._import_preview_model.deleteLater()
+        self._import_preview_model = None
+        self._import_preview_reader.close()
+        self._import_preview_reader = None
+        if self.at_page_initial:
+            self.stackedWidget_state_machine.setCurrentIndex(0)
+
+    def _on_import_progress(self, read_size: int, total_size: int):
+        # 以KB为单位，避免超过int的范围
+        if read_size >= total_size:
+            # 解析和建立索引阶段无法估计进度
+            self._import_progress_dialog.setRange(0, 0)
+            return
+        self._import_progress_dialog.setMaximum(max(total_size // 1024, 1))
+        self._import_progress_dialog.setValue(read_size // 1024)
+
+    def _on_import_stage_changed(self, stage: str):
+        self._import_progress_dialog.setLabelText(stage + "...")
+
+    def _end_import(self):
+        self._import_worker = None
+        self._end_import_preview()
+        if self._import_progress_dialog is not None:
+            self._import_progress_dialog.close()
+            self._import_progress_dialog.deleteLater()
+            self._import_progress_dialog = None
+
+    def _on_import_failed(self, message: str):
+        self._end_import()
+        QtWidgets.QMessageBox.critical(
+            self,
+            "导入失败",
+            f"读取状态机文件时发生错误：\n{message}",
+            QtWidgets.QMessageBox.Ok
+        )
+
+    def _on_import_finished(self, fcstm_state_chart: FcstmStateChart):
+        canceled = self._import_worker is None or self._import_worker.is_canceled()
+        reader = None if canceled else self._import_worker.reader
+        excel_report = None if canceled else self._import_worker.excel_report
+        base_model = None if canceled else self._import_worker.base_model
+        self._end_import()
+        if canceled:
+            return
+        try:
+            self._show_loaded_state_chart(fcstm_state_chart, base_model)
+            if reader is not None:
+                self.statusbar.showMessage(
+                    f"已导入 {reader.bytes_read / 1024 / 1024:.1f} MB，"
+                    f"{len(fcstm_state_chart.d_id_state)} 个状态，"
+                    f"解析缓冲区峰值 {reader.peak_buffer_size / 1024:.0f} K字符"
+                    f"{'' if reader.streamed else '（完整解码）'}", 10000)
+            if excel_report is not None and excel_report.issues:
                 QtWidgets.QMessageBox.warning(
                     self,
-                    "警告",
-                    f"状态机合法性检查发现问题：\n{str(e)}",
+                    "导入报告",
+                    f"已导入 {excel_report.state_count} 个状态、{excel_report.event_count} 个事件、"
+                    f"{excel_report.transition_count} 个迁移，"
+                    f"{len(excel_report.errors)} 行因错误被跳过，{len(excel_report.warnings)} 条警告：\n"
+                    f"{excel_report.format_issues()}",
                     QtWidgets.QMessageBox.Ok
                 )
-                return
+        except Exception as e:
+            QtWidgets.QMessageBox.critical(
+                self,
+                "错误",
+                f"导入状态机时发生未知错误：\n{str(e)}",
+                QtWidgets.QMessageBox.Ok
+            )
 
-            if self.at_page_initial:
-                self.stackedWidget_state_machine.setCurrentIndex(1)
-                self.at_page_initial = False
-            self.edit_state_machine_name.setText(self.fcstm_state_chart.state_chart.name)
-            self.edit_state_machine_preamble.setPlainText('\n'.join(self.fcstm_state_chart.state_chart.preamble))
+    def _show_loaded_state_chart(self, fcstm_state_chart: FcstmStateChart, base_model: Optional[dict] = None):
+        """切换到导入或恢复的状态机，并刷新状态机页面"""
+        self._set_fcstm_state_chart(fcstm_state_chart, base_model)
+        # 合法性检查的结果显示在问题列表中，不再弹出对话框
+        if self.validator.d_key_diagnostic:
+            self._show_problems()
+
+        if self.at_page_initial:
+            self.stackedWidget_state_machine.setCurrentIndex(1)
+            self.at_page_initial = False
+        self.edit_state_machine_name.setText(self.fcstm_state_chart.state_chart.name)
+        self.edit_state_machine_preamble.setPlainText('\n'.join(self.fcstm_state_chart.state_chart.preamble))
+        # 状态很多时完全展开的代价很高，只展开顶层
+        if len(fcstm_state_chart.d_id_state) <= self.EXPAND_ALL_STATE_LIMIT:
             self.tree_state_machine_all_state.expandAll()
-            self._display_state_event_transition_details()
+        else:
+            self.tree_state_machine_all_state.expandToDepth(0)
+
+    def _init_autosave(self):
+        """自动保存：修改记录在追加式日志中，启动时如果存在上次未正常退出留下的日志则提示恢复"""
+        if self.autosave_dir is None:
+            return
+        self.edit_journal = EditJournal(self.autosave_dir)
+        self.edit_state_machine_name.editingFinished.connect(self._record_state_machine_meta)
+        self.edit_state_machine_preamble.textChanged.connect(self._record_state_machine_meta)
+        if has_autosave(self.autosave_dir):
+            QTimer.singleShot(0, self._recover_autosave)
+
+    def _recover_autosave(self):
+        reply = QtWidgets.QMessageBox.question(
+            self,
+            "恢复状态机",
+            "检测到上次未正常退出时自动保存的状态机，是否恢复？",
+            QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No
+        )
+        if reply != QtWidgets.QMessageBox.Yes:
+            discard_autosave(self.autosave_dir)
+            return
+        try:
+            state_chart = recover_statechart(self.autosave_dir)
+            self._show_loaded_state_chart(FcstmStateChart(None, state_chart, tree_items=False))
         except Exception as e:
             QtWidgets.QMessageBox.critical(
                 self,
                 "错误",
-                f"导入状态机时发生未知错误：\n{str(e)}",
+                f"恢复状态机时发生错误：\n{str(e)}",
+                QtWidgets.QMessageBox.Ok
+            )
+
+    def _record_state_machine_meta(self):
+        if self.edit_journal is not None:
+            self.edit_journal.record_meta(self.edit_state_machine_name.text(),
+                                          self.edit_state_machine_preamble.toPlainText().splitlines())
+
+    def closeEvent(self, event):
+        # 导出完成前退出会丢失导出的文件
+        if self._export_worker is not None:
+            QtWidgets.QMessageBox.warning(
+                self,
+                "警告",
+                "正在导出状态机，请在导出完成后再退出！",
                 QtWidgets.QMessageBox.Ok
             )
+            event.ignore()
+            return
+        # 正常退出时不需要恢复，删除自动保存
+        if self.edit_journal is not None:
+            self.edit_journal.close(discard=True, timeout=5)
+            self.edit_journal = None
+        QMainWindow.closeEvent(self, event)
+
+    def _start_export(self, file_name: str, export_format: str):
+        """在后台线程中导出当前状态机的快照，导出期间可以继续编辑"""
+        self._export_worker = StatechartExportWorker(StatechartSnapshot.capture(self.fcstm_state_chart),
+                                                     file_name, export_format, cache=self.export_cache)
+        self._export_progress_dialog = QtWidgets.QProgressDialog("正在导出...", "取消", 0,
+                                                                 StatechartExportWorker.STAGE_COUNT, self)
+        self._export_progress_dialog.setWindowTitle("导出状态机")
+        self._export_progress_dialog.setMinimumDuration(300)
+        self._export_progress_dialog.setAutoClose(False)
+        self._export_progress_dialog.setAutoReset(False)
+        self._export_progress_dialog.canceled.connect(self._export_worker.cancel)
+        self._export_worker.progress.connect(self._export_progress_dialog.setValue)
+        self._export_worker.stage_changed.connect(
+            lambda stage: self._export_progress_dialog.setLabelText(stage + "..."))
+        self._export_worker.finished.connect(self._on_export_finished)
+        self._export_worker.failed.connect(self._on_export_failed)
+        self._export_worker.canceled.connect(self._end_export)
+        start_export_worker(self._export_worker, self)
+
+    def _end_export(self):
+        self._export_worker = None
+        if self._export_progress_dialog is not None:
+            self._export_progress_dialog.close()
+            self._export_progress_dialog.deleteLater()
+            self._export_progress_dialog = None
+
+    def _on_export_finished(self, file_name: str):
+        self._end_export()
+        QtWidgets.QMessageBox.information(
+            self,
+            "导出成功",
+            f"状态机信息已成功导出到：\n{file_name}",
+            QtWidgets.QMessageBox.Ok
+        )
+
+    def _on_export_failed(self, message: str):
+        self._end_export()
+        QtWidgets.QMessageBox.critical(
+            self,
+            "导出失败",
+            f"导出文件时发生错误：\n{message}",
+            QtWidgets.QMessageBox.Ok
+        )
 
     def _export_statechart(self):
         try:
@@ -752,7 +1076,8 @@ class AppMainWindow(QMainWindow, UIMainWindow):
                 self,
                 "导出状态机",
                 self.state_machine_file_path,
-                "JSON Files (*.json);;Word Documents (*.docx);;Excel Files (*.xlsx);;All Files (*)",
+                "JSON Files (*.json);;Binary Statechart Files (*.fcstmb);;Word Documents (*.docx);;"
+                "Excel Files (*.xlsx);;All Files (*)",
                 options=options
             )
             
@@ -778,61 +1103,24 @@ class AppMainWindow(QMainWindow, UIMainWindow):
             if len(state_machine_preamble) > 0:
                 self.fcstm_state_chart.state_chart.preamble = state_machine_preamble
                 
-            try:
-                if selected_filter == "JSON Files (*.json)":
-                    # 确保文件名以 .json 结尾
-                    if not file_name.endswith('.json'):
-                        file_name += '.json'
-                    self.fcstm_state_chart.state_chart.to_json(file_name)
-                    QtWidgets.QMessageBox.information(
-                        self,
-                        "导出成功",
-                        f"状态机信息已成功导出到：\n{file_name}",
-                        QtWidgets.QMessageBox.Ok
-                    )
-                elif selected_filter == "Word Documents (*.docx)":
-                    # 确保文件名以 .docx 结尾
-                    if not file_name.endswith('.docx'):
-                        file_name += '.docx'
-                    if export_statechart_to_word(self.fcstm_state_chart.state_chart, file_name):
-                        QtWidgets.QMessageBox.information(
-                            self,
-                            "导出成功",
-                            f"状态机信息已成功导出到：\n{file_name}",
-                            QtWidgets.QMessageBox.Ok
-                        )
-                    else:
-                        QtWidgets.QMessageBox.critical(
-                            self,
-                            "导出失败",
-                            "导出Word文档时发生错误",
-                            QtWidgets.QMessageBox.Ok
-                        )
-                elif selected_filter == "Excel Files (*.xlsx)":
-                    # 确保文件名以 .xlsx 结尾
-                    if not file_name.endswith('.xlsx'):
-                        file_name += '.xlsx'
-                    if export_statechart_to_excel(self.fcstm_state_chart.state_chart, file_name):
-                        QtWidgets.QMessageBox.information(
-                            self,
-                            "导出成功",
-                            f"状态机信息已成功导出到：\n{file_name}",
-                            QtWidgets.QMessageBox.Ok
-                        )
-                    else:
-                        QtWidgets.QMessageBox.critical(
-                            self,
-                            "导出失败",
-                            "导出Excel文档时发生错误",
-                            QtWidgets.QMessageBox.Ok
-                        )
-            except Exception as e:
-                QtWidgets.QMessageBox.critical(
+            if self._export_worker is not None:
+                QtWidgets.QMessageBox.warning(
                     self,
-                    "导出失败",
-                    f"导出文件时发生错误：\n{str(e)}",
+                    "警告",
+                    "上一次导出尚未完成！",
                     QtWidgets.QMessageBox.Ok
                 )
+                return
+            # 根据选择的过滤器确定格式，选择所有文件时根据后缀确定，默认为JSON
+            export_format = self.EXPORT_FILTER_FORMATS.get(selected_filter, None)
+            if export_format is None:
+                export_format = os.path.splitext(file_name)[1].lower()
+                if export_format not in EXPORTERS:
+                    export_format = '.json'
+            # 确保文件名以对应的后缀结尾
+            if not file_name.endswith(export_format):
+                file_name += export_format
+            self._start_export(file_name, export_format)
         except Exception as e:
             QtWidgets.QMessageBox.critical(
                 self,
@@ -852,11 +1140,33 @@ class AppMainWindow(QMainWindow, UIMainWindow):
                 )
                 return
 
-            self.fcstm_state_chart.state_chart.validate()
-            QtWidgets.QMessageBox.information(self, "验证成功", "状态图验证通过，无错误。")
+            # 增量检查已经发现的问题直接在问题列表中查看，不需要再完整验证一次
+            self._show_problems()
+            if self.validator.error_count > 0 or self._validate_worker is not None:
+                return
+            # 完整验证在工作线程中对快照进行，界面保持响应
+            self._validate_worker = StatechartValidateWorker(StatechartSnapshot.capture(self.fcstm_state_chart))
+            self._validate_worker.finished.connect(self._on_validate_finished)
+            self._validate_worker.failed.connect(self._on_validate_failed)
+            self.button_state_machine_validation.setEnabled(False)
+            self.statusbar.showMessage("正在验证状态机...")
+            start_validate_worker(self._validate_worker, self)
         except Exception as e:
             QtWidgets.QMessageBox.critical(self, "错误", f"具有以下错误：\n{str(e)}")
 
+    def _end_validate(self):
+        self._validate_worker = None
+        self.button_state_machine_validation.setEnabled(True)
+        self.statusbar.clearMessage()
+
+    def _on_validate_finished(self):
+        self._end_validate()
+        QtWidgets.QMessageBox.information(self, "验证成功", "状态图验证通过，无错误。")
+
+    def _on_validate_failed(self, message: str):
+        self._end_validate()
+        QtWidgets.QMessageBox.critical(self, "错误", f"具有以下错误：\n{message}")
+
     def _graph_gen(self):
         try:
             if self.fcstm_state_chart is None:
@@ -868,7 +1178,7 @@ class AppMainWindow(QMainWindow, UIMainWindow):
                 )
                 return
 
-            dialog_show_graph = DialogShowGraph(self, self.fcstm_state_chart)
+            dialog_show_graph = DialogShowGraph(self, self.fcstm_state_chart, diagram_cache=self.diagram_cache)
             dialog_show_graph.exec_()
         except Exception as e:
             QtWidgets.QMessageBox.critical(
@@ -880,12 +1190,12 @@ class AppMainWindow(QMainWindow, UIMainWindow):
 
     def _get_pro_state(self) -> Optional[State]:
         # 获得当前Tree中选择的item
-        selected_state_item = self.tree_state_machine_all_state.currentItem()
+        selected_index = self.tree_state_machine_all_state.currentIndex()
         # 若没有选中状态，则报错
-        if not selected_state_item:
+        if not selected_index.isValid():
             QtWidgets.QMessageBox.warning(self, "提示", "请先选择要编辑的状态")
             return None
-        pro_state = selected_state_item.data(0, Qt.UserRole)
+        pro_state = self.fcstm_state_chart.get_state(self.state_tree_model.state_id(selected_index))
         return pro_state
     '''
         def get_state_dict(self, cur_state: NormalState):
@@ -0,0 +1,86 @@
+"""
+Excel导出的性能测试
+
+用法（在仓库根目录下）::
+
+    python -m benchmark.export_excel --transitions 100000
+
+输出只写模式导出的每秒行数和Python内存分配峰值，并与普通（全部保存在内存中的）工作簿对比。
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from openpyxl import Workbook
+from pyfcstm.model import CompositeState, Event, NormalState, Statechart, Transition
+
+from app.utils.export_to_excel import export_statechart_to_excel
+
+
+def build_statechart(state_count: int, event_count: int, transition_count: int) -> Statechart:
+    root_state = CompositeState(name="root")
+    states = [NormalState(name=f"state_{i}", on_entry=f"x = {i};") for i in range(state_count)]
+    for state in states:
+        root_state.states.add(state)
+    state_chart = Statechart(name="benchmark", root_state=root_state, states=[root_state, *states])
+    events = [Event(f"event_{i}", f"x > {i}") for i in range(event_count)]
+    for event in events:
+        state_chart.events.add(event)
+    for i in range(transition_count):
+        state_chart.transitions.add(Transition(states[i % state_count], states[(i // state_count + i + 1) % state_count],
+                                               events[i % event_count]))
+    return state_chart
+
+
+def export_in_memory(state_chart: Statechart, file_path: str):
+    """对比用：普通工作簿，所有单元格都保存在内存中"""
+    wb = Workbook()
+    sheet = wb.active
+    sheet.append(["起始状态", "目标状态", "触发事件"])
+    for transition in state_chart.transitions:
+        sheet.append([transition.src_state.name, transition.dst_state.name, transition.event.name])
+    wb.save(file_path)
+
+
+def _run(func, state_chart: Statechart, trace_memory: bool):
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'benchmark.xlsx')
+        if trace_memory:
+            tracemalloc.start()
+        start_time = time.perf_counter()
+        func(state_chart, file_path)
+        elapsed = time.perf_counter() - start_time
+        peak = 0
+        if trace_memory:
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        return elapsed, peak, os.path.getsize(file_path)
+
+
+def measure(name: str, func, state_chart: Statechart, row_count: int):
+    # tracemalloc会显著降低速度，计时和统计内存分两次运行
+    elapsed, _, file_size = _run(func, state_chart, False)
+    _, peak, _ = _run(func, state_chart, True)
+    print(f"{name:<12} {row_count} 行  {elapsed:7.2f} 秒  {row_count / elapsed:10.0f} 行/秒  "
+          f"内存峰值 {peak / 1024 / 1024:7.1f} MB  文件 {file_size / 1024 / 1024:.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Excel导出性能测试")
+    parser.add_argument('--states', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=100)
+    parser.add_argument('--transitions', type=int, default=100000)
+    parser.add_argument('--compare', action='store_true', help="同时测试普通工作簿（只导出迁移工作表）")
+    args = parser.parse_args()
+
+    state_chart = build_statechart(args.states, args.events, args.transitions)
+    row_count = args.states + 1 + args.events + args.transitions
+    measure("write-only", export_statechart_to_excel, state_chart, row_count)
+    if args.compare:
+        measure("in-memory", export_in_memory, state_chart, args.transitions)
+
+
+if __name__ == '__main__':
+    main()
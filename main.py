@@ -1,4 +1,9 @@
-from app import run_app
+import multiprocessing
 
 if __name__ == '__main__':
-    run_app()
+    # 打包后的可执行文件中，进程池的子进程在这里执行任务后直接退出，不会再启动界面
+    multiprocessing.freeze_support()
+    # 在这里导入，spawn方式启动的子进程重新导入本文件时不会加载命令行和界面模块
+    from app.cli import cli
+
+    cli()
@@ -0,0 +1,52 @@
+import os
+
+import pytest
+from click.testing import CliRunner
+from pyfcstm.model import CompositeState, Statechart
+
+from app.cli import cli
+
+
+@pytest.mark.unittest
+class TestCli:
+    def test_batch(self, tmp_path):
+        """测试命令行批量转换，第二次运行时跳过没有变化的文件"""
+        root_state = CompositeState(name="根状态")
+        input_path = str(tmp_path / 'state_chart.json')
+        Statechart(name="测试状态图", root_state=root_state, states=[root_state]).to_json(input_path)
+        output_dir = str(tmp_path / 'output')
+
+        runner = CliRunner()
+        result = runner.invoke(cli, ['batch', input_path, '-o', output_dir, '-f', 'puml', '-f', 'xlsx', '-j', '1',
+                                     '--cache-dir', str(tmp_path / 'cache')])
+        assert result.exit_code == 0, result.output
+        assert os.path.exists(os.path.join(output_dir, 'state_chart.puml'))
+        assert os.path.exists(os.path.join(output_dir, 'state_chart.xlsx'))
+
+        result = runner.invoke(cli, ['batch', input_path, '-o', output_dir, '-f', 'puml', '-f', 'xlsx', '--no-cache'])
+        assert result.exit_code == 0, result.output
+        assert '0 converted, 2 skipped, 0 failed.' in result.output
+
+    def test_batch_failed(self, tmp_path):
+        """测试转换失败时返回非零退出码"""
+        input_path = str(tmp_path / 'broken.json')
+        with open(input_path, 'w') as f:
+            f.write('{')
+        result = CliRunner().invoke(cli, ['batch', input_path, '-f', 'puml', '--no-cache'])
+        assert result.exit_code == 1
+        assert 'FAILED' in result.output
+
+    def test_batch_cache(self, tmp_path):
+        """测试输出文件被删除后重新导出时使用缓存"""
+        root_state = CompositeState(name="根状态")
+        input_path = str(tmp_path / 'state_chart.json')
+        Statechart(name="测试状态图", root_state=root_state, states=[root_state]).to_json(input_path)
+        args = ['batch', input_path, '-f', 'xlsx', '-j', '1', '--cache-dir', str(tmp_path / 'cache')]
+
+        runner = CliRunner()
+        assert runner.invoke(cli, args).exit_code == 0
+        os.remove(str(tmp_path / 'state_chart.xlsx'))
+        result = runner.invoke(cli, args)
+        assert result.exit_code == 0, result.output
+        assert '(cached)' in result.output
+        assert os.path.exists(str(tmp_path / 'state_chart.xlsx'))
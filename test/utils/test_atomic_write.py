@@ -0,0 +1,32 @@
+import os
+
+import pytest
+
+from app.utils.atomic_write import atomic_write
+
+
+@pytest.mark.unittest
+class TestAtomicWrite:
+    def test_replace(self, tmp_path):
+        """测试写入完成后替换目标文件"""
+        file_path = tmp_path / 'a.json'
+        file_path.write_text('old', encoding='utf-8')
+        with atomic_write(str(file_path)) as temp_path:
+            assert temp_path.endswith('.json')
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write('new')
+            assert file_path.read_text(encoding='utf-8') == 'old'
+        assert file_path.read_text(encoding='utf-8') == 'new'
+        assert os.listdir(tmp_path) == ['a.json']
+
+    def test_failure(self, tmp_path):
+        """测试写入失败时目标文件保持原样且不留下临时文件"""
+        file_path = tmp_path / 'a.json'
+        file_path.write_text('old', encoding='utf-8')
+        with pytest.raises(RuntimeError):
+            with atomic_write(str(file_path)) as temp_path:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    f.write('ne')
+                raise RuntimeError()
+        assert file_path.read_text(encoding='utf-8') == 'old'
+        assert os.listdir(tmp_path) == ['a.json']
@@ -0,0 +1,93 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from openpyxl import load_workbook
+from pyfcstm.model import CompositeState, NormalState, Statechart
+
+from app.utils.batch_convert import ConvertResult, convert_file, plan_tasks, run_tasks
+
+
+def _write_statechart(file_path: str, name: str):
+    root_state = CompositeState(name=name)
+    state = NormalState(name="A")
+    root_state.states.add(state)
+    Statechart(name=name, root_state=root_state, states=[root_state, state]).to_json(file_path)
+
+
+@pytest.mark.unittest
+class TestBatchConvert:
+    @pytest.fixture
+    def input_dir(self, tmp_path):
+        input_dir = tmp_path / 'input'
+        (input_dir / 'sub').mkdir(parents=True)
+        _write_statechart(str(input_dir / 'a.json'), "状态机A")
+        _write_statechart(str(input_dir / 'sub' / 'b.json'), "状态机B")
+        (input_dir / 'notes.txt').write_text('not a state chart')
+        return str(input_dir)
+
+    def test_plan_tasks(self, input_dir, tmp_path):
+        """测试查找输入文件、确定输出路径和跳过比输入文件新的输出"""
+        output_dir = str(tmp_path / 'output')
+        tasks, skipped = plan_tasks([input_dir], output_dir, ['puml'])
+        assert tasks == [(os.path.join(input_dir, 'a.json'), [('puml', os.path.join(output_dir, 'a.puml'))])]
+        assert skipped == []
+
+        tasks, _ = plan_tasks([input_dir], output_dir, ['puml', 'xlsx'], recursive=True)
+        assert [targets for _, targets in tasks] == [
+            [('puml', os.path.join(output_dir, 'a.puml')), ('xlsx', os.path.join(output_dir, 'a.xlsx'))],
+            [('puml', os.path.join(output_dir, 'sub', 'b.puml')), ('xlsx', os.path.join(output_dir, 'sub', 'b.xlsx'))],
+        ]
+
+        # 输出文件比输入文件新时跳过，force时仍然转换
+        input_path = os.path.join(input_dir, 'a.json')
+        output_path = os.path.join(input_dir, 'a.puml')
+        with open(output_path, 'w') as f:
+            f.write('')
+        input_mtime = os.path.getmtime(input_path)
+        os.utime(output_path, (input_mtime + 10, input_mtime + 10))
+        tasks, skipped = plan_tasks([input_path], None, ['puml', 'xlsx'])
+        assert tasks == [(input_path, [('xlsx', os.path.join(input_dir, 'a.xlsx'))])]
+        assert [(result.output_path, result.status) for result in skipped] == [(output_path, ConvertResult.SKIPPED)]
+        os.utime(output_path, (input_mtime - 10, input_mtime - 10))
+        tasks, skipped = plan_tasks([input_path], None, ['puml'])
+        assert len(tasks) == 1 and skipped == []
+        tasks, skipped = plan_tasks([input_path], None, ['puml'], force=True)
+        assert len(tasks) == 1
+
+    def test_convert_file(self, input_dir, tmp_path):
+        """测试转换单个文件，读取失败的输入只影响自己的输出"""
+        output_dir = str(tmp_path / 'output')
+        tasks, _ = plan_tasks([input_dir], output_dir, ['puml', 'xlsx', 'docx'])
+        results = convert_file(tasks[0])
+        assert [result.status for result in results] == [ConvertResult.CONVERTED] * 3
+        with open(os.path.join(output_dir, 'a.puml'), encoding='utf-8') as f:
+            assert f.read().startswith('@startuml')
+        assert load_workbook(os.path.join(output_dir, 'a.xlsx')).sheetnames == ["States", "Events", "Transitions"]
+        assert os.path.exists(os.path.join(output_dir, 'a.docx'))
+
+        broken_path = str(tmp_path / 'broken.json')
+        with open(broken_path, 'w') as f:
+            f.write('{')
+        results = convert_file((broken_path, [('puml', str(tmp_path / 'broken.puml'))]))
+        assert [result.status for result in results] == [ConvertResult.FAILED]
+        assert not os.path.exists(str(tmp_path / 'broken.puml'))
+
+    def test_run_tasks_in_process_pool(self, input_dir, tmp_path):
+        """测试在进程池中转换多个文件"""
+        output_dir = str(tmp_path / 'output')
+        tasks, _ = plan_tasks([input_dir], output_dir, ['puml'], recursive=True)
+        reported = []
+        results = run_tasks(tasks, jobs=2, on_result=reported.append)
+        assert sorted(result.output_path for result in results) == sorted(
+            [os.path.join(output_dir, 'a.puml'), os.path.join(output_dir, 'sub', 'b.puml')])
+        assert all(result.status == ConvertResult.CONVERTED for result in results)
+        assert len(reported) == 2
+
+    def test_import_without_qt(self):
+        """测试进程池的子进程导入转换模块时不会加载Qt和界面"""
+        code = ("import sys, app.utils.batch_convert\n"
+                "print(sorted(name for name in sys.modules if name.startswith(('PyQt5', 'app.widget', 'app.app'))))")
+        output = subprocess.check_output([sys.executable, '-c', code], universal_newlines=True)
+        assert output.strip() == '[]'
@@ -0,0 +1,144 @@
+import os
+import struct
+
+import pytest
+from PyQt5.QtCore import Qt, QModelIndex
+from pyfcstm.model import CompositeState, Event, NormalState, Statechart, Transition
+
+from app.utils.binary_statechart import (
+    _HEADER, BinaryStatechartReader, BinaryStatechartView, is_binary_statechart, read_binary_statechart,
+    write_binary_statechart,
+)
+from app.utils.state_tree_model import StateTreeModel
+
+
+@pytest.mark.unittest
+class TestBinaryStatechart:
+    @pytest.fixture
+    def state_chart(self):
+        root_state = CompositeState(name="根状态", description="根")
+        composite_state = CompositeState(name="复合状态", on_entry="a = 1;", min_time_lock=1, max_time_lock=5)
+        sub_states = [NormalState(name=f"子状态{i}", on_during="b++;") for i in range(3)]
+        for sub_state in sub_states:
+            composite_state.states.add(sub_state)
+        composite_state.initial_state = sub_states[1]
+        other_state = NormalState(name="子状态0")
+        root_state.states.add(composite_state)
+        root_state.states.add(other_state)
+        root_state.initial_state = composite_state
+        states = [root_state, composite_state, *sub_states, other_state]
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=states)
+        event = Event("开始", "x > 0")
+        state_chart.events.add(event)
+        state_chart.transitions.add(Transition(sub_states[0], sub_states[2], event))
+        state_chart.preamble = ["int a;", "int b;"]
+        return state_chart
+
+    def test_roundtrip(self, state_chart, tmp_path):
+        """测试写入后读取得到相同的状态机"""
+        file_path = str(tmp_path / 'test.fcstmb')
+        write_binary_statechart(state_chart, file_path)
+        assert is_binary_statechart(file_path)
+        loaded = read_binary_statechart(file_path)
+
+        assert loaded.name == state_chart.name
+        assert list(loaded.preamble) == ["int a;", "int b;"]
+        assert loaded.root_state_id == state_chart.root_state_id
+        d_id_state = {state.id: state for state in loaded.states}
+        assert len(d_id_state) == len(state_chart.states)
+        for state in state_chart.states:
+            loaded_state = d_id_state[state.id]
+            assert type(loaded_state) is type(state)
+            for attr in ('name', 'description', 'min_time_lock', 'max_time_lock', 'on_entry', 'on_during', 'on_exit'):
+                assert getattr(loaded_state, attr) == getattr(state, attr)
+            if isinstance(state, CompositeState):
+                assert [s.id for s in loaded_state.states] == [s.id for s in state.states]
+                assert loaded_state.initial_state_id == state.initial_state_id
+
+        (event,) = list(loaded.events)
+        assert (event.name, event.guard) == ("开始", "x > 0")
+        (transition,) = list(loaded.transitions)
+        (original,) = list(state_chart.transitions)
+        assert transition.src_state_id == original.src_state_id
+        assert transition.dst_state_id == original.dst_state_id
+        assert transition.event_id == event.id
+
+    def test_interned_strings(self, state_chart, tmp_path):
+        """测试重复的字符串只保存一次"""
+        file_path = str(tmp_path / 'test.fcstmb')
+        write_binary_statechart(state_chart, file_path)
+        with BinaryStatechartReader(file_path) as reader:
+            strings = [reader.string(sid) for sid in range(reader.string_count)]
+        assert len(strings) == len(set(strings))
+        assert strings.count("b++;") == 1
+
+    def test_invalid_file(self, tmp_path):
+        """测试非二进制状态机文件"""
+        file_path = str(tmp_path / 'test.json')
+        with open(file_path, 'w') as f:
+            f.write('{"name": "x"}' * 20)
+        assert not is_binary_statechart(file_path)
+        with pytest.raises(ValueError):
+            BinaryStatechartReader(file_path)
+
+    def test_lazy_tree_model(self, state_chart, tmp_path, qtbot):
+        """测试树模型直接在二进制文件上按需解码"""
+        file_path = str(tmp_path / 'test.fcstmb')
+        write_binary_statechart(state_chart, file_path)
+        with BinaryStatechartReader(file_path) as reader:
+            view = BinaryStatechartView(reader)
+            model = StateTreeModel(view)
+            model.fetchMore(QModelIndex())
+            root_index = model.index(0, 0)
+            assert root_index.data(Qt.DisplayRole) == "根状态"
+            assert root_index.data(Qt.DecorationRole) is not None
+            # 只有顶层状态被访问过
+            assert len(view.d_id_index) == 1
+
+            model.fetchMore(root_index)
+            assert model.rowCount(root_index) == 2
+            composite_index = model.index(0, 0, root_index)
+            assert composite_index.data(Qt.DisplayRole) == "复合状态"
+            assert composite_index.data(Qt.DecorationRole) is not None
+            assert model.index(1, 0, root_index).data(Qt.DecorationRole) is None
+            assert model.hasChildren(composite_index)
+            assert not model.hasChildren(model.index(1, 0, root_index))
+            assert len(view.d_id_index) == 3
+
+            model.fetchMore(composite_index)
+            sub_index = model.index(2, 0, composite_index)
+            assert sub_index.data(Qt.DisplayRole) == "子状态2"
+            assert model.index_of_state(sub_index.data(Qt.UserRole)) == sub_index
+            assert view.father_state_id(sub_index.data(Qt.UserRole)) == composite_index.data(Qt.UserRole)
+
+    def test_event_id_roundtrip(self, state_chart, tmp_path):
+        """测试事件id在写入和读取后保持不变，迁移引用的仍是同一个事件"""
+        file_path = str(tmp_path / 'test.fcstmb')
+        write_binary_statechart(state_chart, file_path)
+        loaded = read_binary_statechart(file_path)
+
+        (original,) = list(state_chart.events)
+        (event,) = list(loaded.events)
+        assert event.id == original.id
+        (transition,) = list(loaded.transitions)
+        assert transition.event is event
+
+    def test_missing_root_state(self, state_chart, tmp_path):
+        """测试根状态不在状态列表中时拒绝写入，读取没有根状态的文件时报错"""
+        file_path = str(tmp_path / 'test.fcstmb')
+        root_state = state_chart.root_state
+        del state_chart.states[root_state]
+        with pytest.raises(ValueError):
+            write_binary_statechart(state_chart, file_path)
+        assert not os.path.exists(file_path)
+
+        # 文件头中的根状态下标为-1
+        state_chart.states.add(root_state)
+        write_binary_statechart(state_chart, file_path)
+        with open(file_path, 'r+b') as f:
+            data = bytearray(f.read())
+            struct.pack_into('<i', data, _HEADER.size - 4 - 6 * 8, -1)
+            f.seek(0)
+            f.write(data)
+        with pytest.raises(ValueError):
+            read_binary_statechart(file_path)
@@ -0,0 +1,70 @@
+import pytest
+from PyQt5 import QtWidgets
+from pyfcstm.model import CompositeState, NormalState, Statechart
+
+from app.utils.fcstm_state_chart import FcstmStateChart
+
+
+@pytest.mark.unittest
+class TestBulkEdit:
+    @pytest.fixture
+    def fcstm_state_chart(self, qtbot):
+        root_state = CompositeState(name="根状态")
+        state1 = NormalState(name="状态1")
+        root_state.states.add(state1)
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state, state1])
+
+        tree_widget = QtWidgets.QTreeWidget()
+        qtbot.addWidget(tree_widget)
+        fcstm_state_chart = FcstmStateChart(tree_widget, state_chart)
+        fcstm_state_chart.add_event(None, "event", "")
+        return fcstm_state_chart
+
+    def test_bulk_add(self, fcstm_state_chart):
+        """测试批量添加，只通知一次并作为一步撤销"""
+        changes = []
+        fcstm_state_chart.subscribe(changes.append)
+        sub_state = CompositeState(name="子状态")
+        leaf_states = [NormalState(name=f"叶状态{i}") for i in range(100)]
+        report = fcstm_state_chart.bulk_add(
+            states=[("根状态", sub_state)] + [(sub_state, leaf_state) for leaf_state in leaf_states],
+            events=[("event2", "x > 0")],
+            transitions=[("状态1", "子状态", "event2")] +
+                        [(leaf_states[i], leaf_states[i + 1], "event") for i in range(99)],
+        )
+        assert report and report.committed
+        assert len(report.added_states) == 101
+        assert len(report.added_transitions) == 100
+        assert len(changes) == 1
+        assert len(changes[0].states_added) == 101
+        sub_item = fcstm_state_chart.get_tree_item(sub_state.id)
+        assert sub_item.childCount() == 100
+        assert fcstm_state_chart.d_id_father_state[leaf_states[0].id] is sub_state
+
+        fcstm_state_chart.undo()
+        assert len(fcstm_state_chart.state_chart.states) == 2
+        assert len(fcstm_state_chart.transition_index) == 0
+        assert fcstm_state_chart.state_chart.events.get_by_name("event2") is None
+
+    def test_conflicts(self, fcstm_state_chart):
+        """测试冲突报告，原子模式下不做任何修改"""
+        state1 = fcstm_state_chart.state_chart.states.get_by_name("状态1")
+        new_state = NormalState(name="新状态")
+        kwargs = dict(
+            states=[("状态1", NormalState(name="错误")), (None, new_state), (None, state1)],
+            events=[("event", ""), ("", ""), ("event2", "")],
+            transitions=[("状态1", "新状态", "event2"), ("状态1", "新状态", "event2"), ("不存在", "状态1", "event")],
+        )
+        report = fcstm_state_chart.bulk_add(**kwargs)
+        assert not report.committed
+        assert [(conflict.kind, conflict.index) for conflict in report.conflicts] == [
+            ('state', 0), ('state', 2), ('event', 0), ('event', 1), ('transition', 1), ('transition', 2)]
+        assert len(fcstm_state_chart.state_chart.states) == 2
+        assert fcstm_state_chart.state_chart.events.get_by_name("event2") is None
+
+        report = fcstm_state_chart.bulk_add(atomic=False, **kwargs)
+        assert report.committed
+        assert report.added_states == [new_state]
+        assert len(report.added_transitions) == 1
+        assert fcstm_state_chart.transition_index.get(
+            state1.id, new_state.id, fcstm_state_chart.state_chart.events.get_by_name("event2").id) is not None
@@ -0,0 +1,60 @@
+import os
+
+import pytest
+
+from app.utils import show_state_graph
+from app.utils.diagram_cache import DiagramCache
+from app.utils.show_state_graph import ShowStateGraph
+
+
+@pytest.mark.unittest
+class TestDiagramCache:
+    def test_get_put(self, tmp_path):
+        """测试按PlantUML代码和渲染器查找"""
+        cache = DiagramCache(str(tmp_path), max_bytes=1024, renderer='1:a')
+        assert cache.get("@startuml\n@enduml") is None
+        cache.put("@startuml\n@enduml", b'image')
+        assert cache.get("@startuml\n@enduml") == b'image'
+        assert cache.get("@startuml\nstate A\n@enduml") is None
+        assert (cache.hit_count, cache.miss_count) == (1, 2)
+        # 渲染器变化后不使用旧的图片
+        assert DiagramCache(str(tmp_path), max_bytes=1024, renderer='1:b').get("@startuml\n@enduml") is None
+
+    def test_evict(self, tmp_path):
+        """测试超出容量时淘汰最久没有使用的图片"""
+        cache = DiagramCache(str(tmp_path), max_bytes=300, renderer='1')
+        for index, code in enumerate(("A", "B", "C")):
+            cache.put(code, b'x' * 100)
+            entry_path = cache.entry_path(cache.key(code))
+            os.utime(entry_path, (1000 + index, 1000 + index))
+        # 读取A之后A成为最近使用的图片
+        assert cache.get("A") is not None
+        # 淘汰到容量的90%以下：删除最久没有使用的B和C
+        cache.put("D", b'x' * 100)
+        assert cache.get("B") is None
+        assert cache.get("C") is None
+        assert cache.get("A") is not None
+        assert cache.get("D") is not None
+        assert cache.total_size() == 200
+
+        # 超过容量的图片不缓存
+        cache.put("E", b'x' * 400)
+        assert cache.get("E") is None
+
+    def test_render_png(self, tmp_path, monkeypatch):
+        """测试PlantUML代码相同时不再渲染"""
+        rendered = []
+
+        class _Daemon:
+            def render(self, plantuml_code, cancel_event=None):
+                rendered.append(plantuml_code)
+                return b'png:' + plantuml_code.encode()
+
+        monkeypatch.setattr(show_state_graph, 'get_plantuml_daemon', lambda: _Daemon())
+        cache = DiagramCache(str(tmp_path), max_bytes=1024, renderer='1')
+        assert ShowStateGraph.render_png("@startuml\n@enduml", cache=cache) == b'png:@startuml\n@enduml'
+        png_file = str(tmp_path / 'graph.png')
+        ShowStateGraph.dump_png("@startuml\n@enduml", png_file, cache=cache)
+        with open(png_file, 'rb') as f:
+            assert f.read() == b'png:@startuml\n@enduml'
+        assert rendered == ["@startuml\n@enduml"]
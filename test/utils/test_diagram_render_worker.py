@@ -0,0 +1,60 @@
+import sys
+
+import pytest
+
+from app.utils import show_state_graph
+from app.utils.diagram_cache import DiagramCache
+from app.utils.diagram_render_worker import DiagramRenderWorker, start_diagram_render_worker
+from app.utils.plantuml_daemon import PNG_SIGNATURE, PlantumlDaemon
+from .test_plantuml_daemon import _FAKE_PLANTUML
+
+
+@pytest.mark.unittest
+class TestDiagramRenderWorker:
+    @pytest.fixture
+    def daemon(self, tmp_path, monkeypatch):
+        script_path = tmp_path / 'fake_plantuml.py'
+        script_path.write_text(_FAKE_PLANTUML)
+        daemon = PlantumlDaemon(launcher=[sys.executable, str(script_path)])
+        monkeypatch.setattr(show_state_graph, 'get_plantuml_daemon', lambda: daemon)
+        yield daemon
+        daemon.close()
+
+    def _run_in_thread(self, qtbot, worker, signal):
+        thread_finished = []
+        with qtbot.waitSignal(signal, timeout=10000) as blocker:
+            thread = start_diagram_render_worker(worker)
+            thread.finished.connect(lambda: thread_finished.append(True))
+        qtbot.waitUntil(lambda: len(thread_finished) > 0, timeout=10000)
+        return blocker.args
+
+    def test_render(self, qtbot, daemon, tmp_path):
+        """测试在工作线程中渲染，第二次渲染使用缓存"""
+        cache = DiagramCache(str(tmp_path / 'cache'), max_bytes=1024 * 1024, renderer='1')
+        plantuml_code = "@startuml\nstate A\n@enduml"
+        for _ in range(2):
+            worker = DiagramRenderWorker(plantuml_code, cache=cache)
+            data, = self._run_in_thread(qtbot, worker, worker.finished)
+            assert data.startswith(PNG_SIGNATURE)
+        assert daemon.start_count == 1
+        assert (cache.hit_count, cache.miss_count) == (1, 1)
+
+    def test_cancel(self, qtbot, daemon):
+        """测试取消时结束渲染进程"""
+        worker = DiagramRenderWorker("@startuml\nHANG\n@enduml")
+        thread_finished = []
+        with qtbot.waitSignal(worker.stage_changed, timeout=10000):
+            thread = start_diagram_render_worker(worker)
+            thread.finished.connect(lambda: thread_finished.append(True))
+        qtbot.waitUntil(lambda: daemon.is_running, timeout=10000)
+        with qtbot.waitSignal(worker.canceled, timeout=10000):
+            worker.cancel()
+        qtbot.waitUntil(lambda: not daemon.is_running, timeout=10000)
+        qtbot.waitUntil(lambda: len(thread_finished) > 0, timeout=10000)
+
+    def test_failed(self, qtbot, daemon):
+        """测试渲染失败时报告错误信息"""
+        worker = DiagramRenderWorker("@startuml\nCRASH\n@enduml")
+        with qtbot.waitSignal(worker.failed, timeout=10000) as blocker:
+            worker.run()
+        assert 'crashed' in blocker.args[0]
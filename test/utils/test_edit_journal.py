@@ -0,0 +1,120 @@
+import os
+
+import pytest
+from PyQt5 import QtWidgets
+from pyfcstm.model import CompositeState, NormalState, Statechart
+
+from app.utils import edit_journal
+from app.utils.edit_journal import (
+    JOURNAL_FILE_NAME, EditJournal, discard_autosave, has_autosave, recover_statechart,
+)
+from app.utils.fcstm_state_chart import FcstmStateChart
+from app.utils.statechart_snapshot import snapshot_model
+
+
+@pytest.mark.unittest
+class TestEditJournal:
+    @pytest.fixture
+    def fcstm_state_chart(self, qtbot):
+        root_state = CompositeState(name="根状态")
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state])
+        tree_widget = QtWidgets.QTreeWidget()
+        qtbot.addWidget(tree_widget)
+        return FcstmStateChart(tree_widget, state_chart)
+
+    def _edit(self, fcstm_state_chart):
+        root_state = fcstm_state_chart.state_chart.root_state
+        state_a = NormalState(name="A")
+        state_b = NormalState(name="B", on_entry="x = 1;")
+        fcstm_state_chart.add_state(root_state, state_a)
+        fcstm_state_chart.add_state(root_state, state_b)
+        fcstm_state_chart.change_initial_state(root_state, state_a)
+        fcstm_state_chart.add_event(None, "开始", "x > 0")
+        event = fcstm_state_chart.state_chart.events.get_by_name("开始")
+        fcstm_state_chart.add_transition(None, state_a, state_b, event)
+        return state_a, state_b
+
+    def _assert_recovered(self, directory, state_a, state_b):
+        state_chart = recover_statechart(directory)
+        d_id_state = {state.id: state for state in state_chart.states}
+        assert set(d_id_state) == {state_chart.root_state_id, state_a.id, state_b.id}
+        root_state = d_id_state[state_chart.root_state_id]
+        assert [state.id for state in root_state.states] == [state_a.id, state_b.id]
+        assert root_state.initial_state_id == state_a.id
+        assert d_id_state[state_b.id].on_entry == "x = 1;"
+        (event,) = list(state_chart.events)
+        assert (event.name, event.guard) == ("开始", "x > 0")
+        (transition,) = list(state_chart.transitions)
+        assert (transition.src_state_id, transition.dst_state_id, transition.event_id) == \
+               (state_a.id, state_b.id, event.id)
+        return state_chart
+
+    def test_recover(self, fcstm_state_chart, tmp_path):
+        """测试在快照上回放日志恢复修改"""
+        directory = str(tmp_path / 'autosave')
+        journal = EditJournal(directory)
+        journal.start(fcstm_state_chart)
+        state_a, state_b = self._edit(fcstm_state_chart)
+        state_c = NormalState(name="C")
+        fcstm_state_chart.add_state(None, state_c)
+        fcstm_state_chart.del_state(None, state_c)
+        journal.record_meta("新名称", ["int x;"])
+        assert journal.sync(timeout=5)
+        assert has_autosave(directory)
+
+        state_chart = self._assert_recovered(directory, state_a, state_b)
+        assert state_chart.name == "新名称"
+        assert list(state_chart.preamble) == ["int x;"]
+        journal.close()
+        assert journal.error is None
+
+    def test_compaction(self, fcstm_state_chart, tmp_path):
+        """测试日志超过大小后在写入线程中压缩为快照"""
+        directory = str(tmp_path / 'autosave')
+        journal = EditJournal(directory, sync_interval=0, compact_size=1)
+        journal.start(fcstm_state_chart)
+        state_a, state_b = self._edit(fcstm_state_chart)
+        assert journal.sync(timeout=5)
+        journal.close()
+        assert journal.compaction_count > 1
+        assert os.path.getsize(os.path.join(directory, JOURNAL_FILE_NAME)) == 0
+        self._assert_recovered(directory, state_a, state_b)
+
+    def test_torn_write(self, fcstm_state_chart, tmp_path):
+        """测试崩溃时写了一半的最后一条记录被忽略"""
+        directory = str(tmp_path / 'autosave')
+        journal = EditJournal(directory)
+        journal.start(fcstm_state_chart)
+        state_a, state_b = self._edit(fcstm_state_chart)
+        journal.close()
+        with open(os.path.join(directory, JOURNAL_FILE_NAME), 'a', encoding='utf-8') as f:
+            f.write('{"generation": 1, "ops": [["del_st')
+        self._assert_recovered(directory, state_a, state_b)
+
+    def test_discard(self, fcstm_state_chart, tmp_path):
+        """测试正常退出时删除自动保存"""
+        directory = str(tmp_path / 'autosave')
+        journal = EditJournal(directory)
+        journal.start(fcstm_state_chart)
+        assert journal.sync(timeout=5)
+        assert has_autosave(directory)
+        journal.close(discard=True)
+        assert not has_autosave(directory)
+        assert recover_statechart(directory) is None
+        discard_autosave(directory)
+
+    def test_start_with_base_model(self, fcstm_state_chart, tmp_path, monkeypatch):
+        """测试使用预先生成的快照开始记录时，不在调用线程中遍历状态机"""
+        base_model = snapshot_model(fcstm_state_chart)
+
+        def fail(_):
+            raise AssertionError("不应在start中生成快照")
+
+        monkeypatch.setattr(edit_journal, 'snapshot_model', fail)
+        directory = str(tmp_path / 'autosave')
+        journal = EditJournal(directory)
+        journal.start(fcstm_state_chart, base_model)
+        state_a, state_b = self._edit(fcstm_state_chart)
+        assert journal.sync(timeout=5)
+        journal.close()
+        self._assert_recovered(directory, state_a, state_b)
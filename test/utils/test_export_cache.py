@@ -0,0 +1,109 @@
+import os
+
+import pytest
+from pyfcstm.model import CompositeState, Event, NormalState, Statechart, Transition
+
+from app.utils.export_cache import ExportCache, statechart_hash
+
+
+def _build_statechart(state_b_name: str = "B") -> Statechart:
+    root_state = CompositeState(name="根状态")
+    state_a = NormalState(name="A", on_entry="x = 1;")
+    state_b = NormalState(name=state_b_name)
+    root_state.states.add(state_a)
+    root_state.states.add(state_b)
+    root_state.initial_state = state_a
+    state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state, state_a, state_b])
+    event = Event("开始", "x > 0")
+    state_chart.events.add(event)
+    state_chart.transitions.add(Transition(state_a, state_b, event))
+    state_chart.preamble = ["int x;"]
+    return state_chart
+
+
+@pytest.mark.unittest
+class TestExportCache:
+    def test_statechart_hash(self):
+        """测试结构哈希与对象id无关，内容变化时哈希变化"""
+        assert statechart_hash(_build_statechart()) == statechart_hash(_build_statechart())
+        assert statechart_hash(_build_statechart()) != statechart_hash(_build_statechart("C"))
+
+        state_chart = _build_statechart()
+        digest = statechart_hash(state_chart)
+        state_chart.preamble = ["int y;"]
+        assert statechart_hash(state_chart) != digest
+        state_chart = _build_statechart()
+        next(iter(state_chart.events)).guard = "x > 1"
+        assert statechart_hash(state_chart) != digest
+
+    def test_statechart_hash_without_event(self):
+        """测试没有事件的迁移可以计算哈希，并且与有事件的迁移不同"""
+        state_chart = _build_statechart()
+        digest = statechart_hash(state_chart)
+        state_a, state_b = list(state_chart.root_state.states)
+        state_chart.transitions.add(Transition(state_b, state_a, None))
+        assert statechart_hash(state_chart) != digest
+        assert statechart_hash(state_chart) == statechart_hash(state_chart)
+
+    def test_export(self, tmp_path):
+        """测试相同的状态机只导出一次，之后直接复制缓存文件"""
+        cache = ExportCache(str(tmp_path / 'cache'), max_bytes=1024 * 1024)
+        calls = []
+
+        def exporter(state_chart: Statechart, file_path: str):
+            calls.append(file_path)
+            with open(file_path, 'w') as f:
+                f.write(state_chart.name)
+
+        first_path = str(tmp_path / 'first.xlsx')
+        assert not cache.export(_build_statechart(), '.xlsx', first_path, exporter)
+        second_path = str(tmp_path / 'second.xlsx')
+        assert cache.export(_build_statechart(), '.xlsx', second_path, exporter)
+        assert calls == [first_path]
+        with open(second_path) as f:
+            assert f.read() == "测试状态图"
+        assert (cache.hit_count, cache.miss_count) == (1, 1)
+
+        # 其他格式和其他内容不共享缓存
+        assert not cache.export(_build_statechart(), '.docx', str(tmp_path / 'a.docx'), exporter)
+        assert not cache.export(_build_statechart("C"), '.xlsx', str(tmp_path / 'c.xlsx'), exporter)
+        assert len(calls) == 3
+
+    def test_export_failed(self, tmp_path):
+        """测试导出失败时不写入缓存"""
+        cache = ExportCache(str(tmp_path / 'cache'), max_bytes=1024 * 1024)
+
+        def exporter(state_chart: Statechart, file_path: str):
+            raise RuntimeError("导出失败")
+
+        with pytest.raises(RuntimeError):
+            cache.export(_build_statechart(), '.docx', str(tmp_path / 'a.docx'), exporter)
+        assert cache.get(statechart_hash(_build_statechart()), '.docx') is None
+        assert not os.path.exists(str(tmp_path / 'cache'))
+
+    def test_evict(self, tmp_path):
+        """测试超出容量时淘汰最久没有使用的文件"""
+        cache = ExportCache(str(tmp_path / 'cache'), max_bytes=300)
+        source_path = str(tmp_path / 'source.xlsx')
+        with open(source_path, 'wb') as f:
+            f.write(b'x' * 100)
+
+        def exporter(state_chart: Statechart, file_path: str):
+            raise AssertionError("不应重新导出")
+
+        digests = [str(index) * 64 for index in range(4)]
+        for index, digest in enumerate(digests[:3]):
+            cache.put(digest, '.xlsx', source_path)
+            os.utime(cache.entry_path(digest, '.xlsx'), (1000 + index, 1000 + index))
+        # 命中第一个文件之后它成为最近使用的文件
+        assert cache.export(_build_statechart(), '.xlsx', str(tmp_path / 'out.xlsx'), exporter, digest=digests[0])
+        # 淘汰到容量的90%以下：删除最久没有使用的第二、三个文件
+        cache.put(digests[3], '.xlsx', source_path)
+        assert [cache.get(digest, '.xlsx') is not None for digest in digests] == [True, False, False, True]
+        assert cache.total_size() == 200
+
+        # 超过容量的文件不缓存
+        with open(source_path, 'wb') as f:
+            f.write(b'x' * 400)
+        cache.put('f' * 64, '.xlsx', source_path)
+        assert cache.get('f' * 64, '.xlsx') is None
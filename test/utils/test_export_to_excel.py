@@ -0,0 +1,44 @@
+import pytest
+from openpyxl import load_workbook
+from pyfcstm.model import CompositeState, Event, NormalState, Statechart, Transition
+
+from app.utils.export_to_excel import HEADER_STYLE_NAME, export_statechart_to_excel
+
+
+@pytest.mark.unittest
+class TestExportToExcel:
+    @pytest.fixture
+    def state_chart(self):
+        root_state = CompositeState(name="根状态")
+        state_a = NormalState(name="A", on_entry="x = 1;", min_time_lock=2)
+        state_b = NormalState(name="B")
+        root_state.states.add(state_a)
+        root_state.states.add(state_b)
+        root_state.initial_state = state_a
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state, state_a, state_b])
+        used_event = Event("开始", "x > 0")
+        state_chart.events.add(used_event)
+        state_chart.events.add(Event("未使用", None))
+        state_chart.transitions.add(Transition(state_a, state_b, used_event))
+        return state_chart
+
+    def test_export(self, state_chart, tmp_path):
+        """测试导出的内容和表头样式"""
+        file_path = str(tmp_path / 'state_chart.xlsx')
+        assert export_statechart_to_excel(state_chart, file_path)
+        wb = load_workbook(file_path)
+        assert wb.sheetnames == ["States", "Events", "Transitions"]
+
+        states_rows = list(wb["States"].values)
+        assert states_rows[0][:2] == ("状态名称", "状态类型")
+        assert ("A", "Normal", None, 2, None, "x = 1;", None, None, "根状态", None) in states_rows
+        assert states_rows[1][-2:] == (None, "A")
+        header_cell = wb["States"]["A1"]
+        assert header_cell.style == HEADER_STYLE_NAME
+        assert header_cell.font.bold
+        assert wb["States"].column_dimensions['H'].width == 15
+
+        # 没有被迁移使用的事件也要导出
+        assert list(wb["Events"].values)[1:] == [("开始", "x > 0"), ("未使用", None)]
+        # 迁移的起止状态以从根状态开始的路径表示
+        assert list(wb["Transitions"].values)[1:] == [("根状态/A", "根状态/B", "开始")]
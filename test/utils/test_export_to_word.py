@@ -0,0 +1,90 @@
+import zipfile
+
+import pytest
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from pyfcstm.model import CompositeState, Event, NormalState, Statechart, Transition
+
+from app.utils import export_to_word
+from app.utils.export_to_word import export_statechart_to_word
+
+
+@pytest.mark.unittest
+class TestExportToWord:
+    @pytest.fixture
+    def state_chart(self):
+        root_state = CompositeState(name="根状态")
+        state_a = NormalState(name="A", on_entry="x = 1;\ny = 2;", min_time_lock=2, description="a<b & c")
+        state_b = NormalState(name="B")
+        root_state.states.add(state_a)
+        root_state.states.add(state_b)
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state, state_a, state_b])
+        state_chart.preamble = ["int x;", "int y;"]
+        event_start = Event("开始", "x > 0")
+        event_stop = Event("停止", None)
+        state_chart.events.add(event_start)
+        state_chart.events.add(event_stop)
+        state_chart.transitions.add(Transition(state_a, state_b, event_start))
+        state_chart.transitions.add(Transition(state_a, state_a, event_stop))
+        state_chart.transitions.add(Transition(state_b, state_a, event_stop))
+        return state_chart
+
+    def _texts(self, table):
+        return [[cell.text for cell in row.cells] for row in table.rows]
+
+    def test_export(self, state_chart, tmp_path):
+        """测试导出的表格内容、合并单元格和对齐方式"""
+        file_path = str(tmp_path / 'state_chart.docx')
+        assert export_statechart_to_word(state_chart, file_path)
+        doc = Document(file_path)
+        assert len(doc.tables) == 1 + 3
+
+        main_table = doc.tables[0]
+        assert main_table.style.name == 'Table Grid'
+        texts = self._texts(main_table)
+        assert texts[0] == ["StateMachine"] * 4
+        assert texts[2] == ["状态机描述"] + ["int x;\nint y;"] * 3
+        assert texts[3] == ["包含状态", "状态名称", "状态类型", "状态类型"]
+        assert texts[4] == ["包含状态", "根状态", "Composite", "Composite"]
+        assert texts[7] == ["包含迁移", "起始状态", "目标状态", "激励事件"]
+        assert texts[8:] == [["包含迁移", "A", "B", "开始"], ["包含迁移", "A", "A", "停止"],
+                             ["包含迁移", "B", "A", "停止"]]
+        assert main_table.cell(1, 1).paragraphs[0].alignment == WD_ALIGN_PARAGRAPH.CENTER
+
+        texts = self._texts(doc.tables[2])
+        assert texts[1] == ["状态名称", "A", "A"]
+        assert texts[2] == ["状态描述", "a<b & c", "a<b & c"]
+        assert texts[4] == ["时间锁", "Min", "2"]
+        assert texts[5] == ["时间锁", "Max", ""]
+        assert texts[6] == ["Entry", "x = 1;\ny = 2;", "x = 1;\ny = 2;"]
+        assert texts[9:] == [
+            ["产生事件", "事件名称", "事件产生条件"], ["产生事件", "开始", "x > 0"], ["产生事件", "停止", ""],
+            ["迁移", "激励事件", "迁移目标"], ["迁移", "开始", "B"], ["迁移", "停止", "A"],
+        ]
+
+        # 没有迁移的状态各保留一个空行
+        texts = self._texts(doc.tables[1])
+        assert texts[9:] == [["产生事件", "事件名称", "事件产生条件"], ["产生事件", "", ""],
+                             ["迁移", "激励事件", "迁移目标"], ["迁移", "", ""]]
+
+    def test_parallel_export(self, state_chart, tmp_path, monkeypatch):
+        """测试进程池生成的文档内容与串行导出完全相同"""
+        # 每个任务只处理一个状态，保证使用进程池并分成多个任务
+        monkeypatch.setattr(export_to_word, '_SECTIONS_PER_TASK', 1)
+        serial_path = str(tmp_path / 'serial.docx')
+        parallel_path = str(tmp_path / 'parallel.docx')
+        assert export_statechart_to_word(state_chart, serial_path)
+        assert export_statechart_to_word(state_chart, parallel_path, workers=2)
+
+        with zipfile.ZipFile(serial_path) as serial_zip, zipfile.ZipFile(parallel_path) as parallel_zip:
+            assert serial_zip.namelist() == parallel_zip.namelist()
+            for name in serial_zip.namelist():
+                assert serial_zip.read(name) == parallel_zip.read(name), name
+
+    def test_small_export_is_serial(self, state_chart, tmp_path, monkeypatch):
+        """测试状态数不超过一个任务时即使指定了进程数也不启动进程池"""
+        def fail(*args, **kwargs):
+            raise AssertionError("不应启动进程池")
+
+        monkeypatch.setattr(export_to_word, 'ProcessPoolExecutor', fail)
+        assert export_statechart_to_word(state_chart, str(tmp_path / 'serial.docx'), workers=4)
@@ -249,4 +249,123 @@ class TestFcstmStateChart:
         # 验证状态是否删除成功
         assert state1 not in root_state.states
         assert state1.id not in fcstm_state_chart.d_id_father_state
-        assert state1 not in fcstm_state_chart.state_chart.states
\ No newline at end of file
+        assert state1 not in fcstm_state_chart.state_chart.states
+
+    def test_add_duplicate_transition(self, fcstm_state_chart, monkeypatch):
+        """测试添加重复迁移"""
+        root_item = fcstm_state_chart.tree_widget.topLevelItem(0)
+        root_state = root_item.data(0, Qt.UserRole)
+        state1 = root_item.child(0).data(0, Qt.UserRole)
+        event = Event("测试事件", "count > 0")
+        fcstm_state_chart.state_chart.events.add(event)
+
+        messages = []
+        monkeypatch.setattr(fcstm_state_chart, "warning_message", lambda parent, message: messages.append(message))
+        fcstm_state_chart.add_transition(None, root_state, state1, event)
+        fcstm_state_chart.add_transition(None, root_state, state1, event)
+
+        assert messages == ["迁移已经存在！"]
+        assert len(fcstm_state_chart.state_chart.transitions) == 1
+        assert len(fcstm_state_chart.transition_index) == 1
+
+    def test_edit_transition_reindex(self, fcstm_state_chart):
+        """测试编辑迁移后索引同步更新"""
+        root_item = fcstm_state_chart.tree_widget.topLevelItem(0)
+        root_state = root_item.data(0, Qt.UserRole)
+        state1 = root_item.child(0).data(0, Qt.UserRole)
+        state2 = root_item.child(1).data(0, Qt.UserRole)
+        event = Event("测试事件", "count > 0")
+        fcstm_state_chart.state_chart.events.add(event)
+        fcstm_state_chart.add_transition(None, root_state, state1, event)
+
+        fcstm_state_chart.edit_transition(None, root_state, state1, event, state1, state2, event)
+
+        index = fcstm_state_chart.transition_index
+        assert index.get(root_state.id, state1.id, event.id) is None
+        transition = index.get(state1.id, state2.id, event.id)
+        assert transition is not None
+        assert index.transitions_of_event(event.id) == [transition]
+
+    def test_del_event_cascade(self, fcstm_state_chart):
+        """测试删除事件时级联删除相关迁移"""
+        root_item = fcstm_state_chart.tree_widget.topLevelItem(0)
+        root_state = root_item.data(0, Qt.UserRole)
+        state1 = root_item.child(0).data(0, Qt.UserRole)
+        state2 = root_item.child(1).data(0, Qt.UserRole)
+        fcstm_state_chart.add_event(None, "事件1", "")
+        fcstm_state_chart.add_event(None, "事件2", "")
+        event1 = fcstm_state_chart.state_chart.events.get_by_name("事件1")
+        event2 = fcstm_state_chart.state_chart.events.get_by_name("事件2")
+        fcstm_state_chart.add_transition(None, root_state, state1, event1)
+        fcstm_state_chart.add_transition(None, state1, state2, event1)
+        fcstm_state_chart.add_transition(None, state1, state2, event2)
+
+        fcstm_state_chart.del_event(None, "事件1")
+
+        transitions = list(fcstm_state_chart.state_chart.transitions)
+        assert len(transitions) == 1
+        assert transitions[0].event == event2
+        assert fcstm_state_chart.transition_index.transitions_of_event(event1.id) == []
+        assert len(fcstm_state_chart.transition_index) == 1
+
+    def test_del_composite_state(self, fcstm_state_chart):
+        """测试删除复合状态时批量删除子孙状态及所有关联迁移"""
+        root_item = fcstm_state_chart.tree_widget.topLevelItem(0)
+        root_state = root_item.data(0, Qt.UserRole)
+        state1 = root_item.child(0).data(0, Qt.UserRole)
+        state2 = root_item.child(1).data(0, Qt.UserRole)
+
+        fcstm_state_chart.tree_widget.setCurrentItem(root_item)
+        composite_state = CompositeState(name="复合状态")
+        fcstm_state_chart.add_state(root_state, composite_state)
+        composite_item = root_item.child(2)
+        fcstm_state_chart.tree_widget.setCurrentItem(composite_item)
+        sub_state = NormalState(name="子状态")
+        fcstm_state_chart.add_state(composite_state, sub_state)
+
+        event = Event("测试事件", "")
+        fcstm_state_chart.state_chart.events.add(event)
+        fcstm_state_chart.add_transition(None, state1, composite_state, event)
+        fcstm_state_chart.add_transition(None, sub_state, state2, event)
+        fcstm_state_chart.add_transition(None, state1, state2, event)
+
+        fcstm_state_chart.del_state(composite_item, composite_state)
+
+        assert composite_state not in fcstm_state_chart.state_chart.states
+        assert sub_state not in fcstm_state_chart.state_chart.states
+        assert sub_state.id not in fcstm_state_chart.d_id_father_state
+        transitions = list(fcstm_state_chart.state_chart.transitions)
+        assert len(transitions) == 1
+        assert transitions[0].src_state == state1 and transitions[0].dst_state == state2
+        assert fcstm_state_chart.transition_index.incoming_transitions(composite_state.id) == []
+        assert fcstm_state_chart.transition_index.outgoing_transitions(sub_state.id) == []
+        assert len(fcstm_state_chart.transition_index) == 1
+
+    def test_edit_without_selection(self, fcstm_state_chart):
+        """测试不依赖当前选中项，通过状态id直接修改树节点"""
+        root_item = fcstm_state_chart.tree_widget.topLevelItem(0)
+        root_state = root_item.data(0, Qt.UserRole)
+        state1 = root_item.child(0).data(0, Qt.UserRole)
+        state2 = root_item.child(1).data(0, Qt.UserRole)
+        fcstm_state_chart.tree_widget.setCurrentItem(None)
+
+        new_state = NormalState(name="新状态")
+        fcstm_state_chart.add_state(root_state, new_state)
+        assert fcstm_state_chart.get_tree_item(new_state.id) is root_item.child(2)
+
+        renamed_state = NormalState(name="状态1_renamed", id_=state1.id)
+        fcstm_state_chart.edit_state(state1, renamed_state)
+        assert root_item.child(0).text(0) == "状态1_renamed"
+        assert fcstm_state_chart.get_tree_item(state1.id).data(0, Qt.UserRole) == renamed_state
+
+        fcstm_state_chart.change_initial_state(root_state, state2)
+        assert root_state.initial_state_id == state2.id
+        assert not root_item.child(1).icon(0).isNull()
+
+        fcstm_state_chart.change_initial_state(root_state, new_state)
+        assert root_item.child(1).icon(0).isNull()
+        assert not root_item.child(2).icon(0).isNull()
+
+        fcstm_state_chart.del_state(None, new_state)
+        assert root_item.childCount() == 2
+        assert fcstm_state_chart.get_tree_item(new_state.id) is None
@@ -0,0 +1,153 @@
+import pytest
+from openpyxl import Workbook
+from pyfcstm.model import CompositeState, Event, NormalState, Statechart, Transition
+
+from app.utils.export_to_excel import export_statechart_to_excel
+from app.utils.import_from_excel import ExcelImportError, import_statechart_from_excel
+
+
+def _save_workbook(file_path: str, sheets):
+    wb = Workbook()
+    wb.remove(wb.active)
+    for title, rows in sheets.items():
+        sheet = wb.create_sheet(title)
+        for row in rows:
+            sheet.append(row)
+    wb.save(file_path)
+
+
+_STATES_HEADER = ["状态名称", "状态类型", "状态描述", "Min时间锁", "Max时间锁", "父状态", "初始状态"]
+
+
+@pytest.mark.unittest
+class TestImportFromExcel:
+    def test_round_trip(self, tmp_path):
+        """测试导出后再导入，层次结构、初始状态、事件和迁移保持不变"""
+        root_state = CompositeState(name="根状态")
+        state_a = CompositeState(name="A", on_entry="x = 1;", min_time_lock=2)
+        state_a1 = NormalState(name="A1", description="子状态")
+        state_b = NormalState(name="B")
+        root_state.states.add(state_a)
+        root_state.states.add(state_b)
+        state_a.states.add(state_a1)
+        root_state.initial_state = state_b
+        state_a.initial_state = state_a1
+        state_chart = Statechart(name="测试状态图", root_state=root_state,
+                                 states=[root_state, state_a, state_a1, state_b])
+        event = Event("开始", "x > 0")
+        state_chart.events.add(event)
+        state_chart.events.add(Event("未使用", None))
+        state_chart.transitions.add(Transition(state_a, state_b, event))
+        file_path = str(tmp_path / 'state_chart.xlsx')
+        assert export_statechart_to_excel(state_chart, file_path)
+
+        imported, report = import_statechart_from_excel(file_path)
+        assert report.issues == []
+        assert (report.state_count, report.event_count, report.transition_count) == (4, 2, 1)
+        assert imported.name == "state_chart"
+        d_name_state = {state.name: state for state in imported.states}
+        assert imported.root_state.name == "根状态"
+        assert [state.name for state in d_name_state["根状态"].states] == ["A", "B"]
+        assert [state.name for state in d_name_state["A"].states] == ["A1"]
+        assert d_name_state["根状态"].initial_state_id == d_name_state["B"].id
+        assert d_name_state["A"].initial_state_id == d_name_state["A1"].id
+        assert d_name_state["A"].min_time_lock == 2
+        assert d_name_state["A"].on_entry == "x = 1;"
+        assert d_name_state["A1"].description == "子状态"
+        assert [(event.name, event.guard) for event in imported.events] == [("开始", "x > 0"), ("未使用", None)]
+        assert [(transition.src_state.name, transition.dst_state.name, transition.event.name)
+                for transition in imported.transitions] == [("A", "B", "开始")]
+
+    def test_duplicated_names(self, tmp_path):
+        """测试状态名称重复时按路径恢复层次结构、初始状态和迁移"""
+        root_state = CompositeState(name="根状态")
+        states = {}
+        for group in ("A", "B/C"):
+            group_state = states[group] = CompositeState(name=group)
+            root_state.states.add(group_state)
+            for name in ("空闲", "运行"):
+                child_state = states[f"{group}.{name}"] = NormalState(name=name)
+                group_state.states.add(child_state)
+            group_state.initial_state = states[f"{group}.运行"]
+        root_state.initial_state = states["B/C"]
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state, *states.values()])
+        event = Event("开始", None)
+        state_chart.events.add(event)
+        state_chart.transitions.add(Transition(states["A.空闲"], states["B/C.运行"], event))
+        state_chart.transitions.add(Transition(states["B/C.空闲"], states["A.运行"], event))
+        file_path = str(tmp_path / 'state_chart.xlsx')
+        assert export_statechart_to_excel(state_chart, file_path)
+
+        imported, report = import_statechart_from_excel(file_path)
+        assert report.issues == []
+
+        def describe(state_chart):
+            d_id_state = {state.id: state for state in state_chart.states}
+            d_id_father = {child_state.id: state for state in state_chart.states
+                           if isinstance(state, CompositeState) for child_state in state.states}
+
+            def path(state_id):
+                names = []
+                while state_id is not None:
+                    names.append(d_id_state[state_id].name)
+                    state_id = d_id_father[state_id].id if state_id in d_id_father else None
+                return tuple(reversed(names))
+
+            return ([(path(state.id), path(state.initial_state_id) if isinstance(state, CompositeState) else None)
+                     for state in state_chart.states],
+                    [(path(transition.src_state_id), path(transition.dst_state_id))
+                     for transition in state_chart.transitions])
+
+        assert describe(imported) == describe(state_chart)
+
+    def test_report(self, tmp_path):
+        """测试有问题的行被跳过或部分忽略，并记录在报告中"""
+        file_path = str(tmp_path / 'state_chart.xlsx')
+        _save_workbook(file_path, {
+            "States": [
+                _STATES_HEADER,
+                ["根状态", "Composite", None, None, None, None, "A"],
+                ["A", "Normal", None, "abc", 3, "根状态", None],
+                ["A", "Normal", None, None, None, "根状态", None],
+                ["B", "Unknown"],
+                ["C", "Composite", None, None, None, "D", None],
+                ["D", "Composite", None, None, None, "C", None],
+                [None, None],
+            ],
+            # 列的顺序不影响导入
+            "Transitions": [
+                ["触发事件", "起始状态", "目标状态"],
+                ["开始", "A", "A"],
+                ["开始", "A", "A"],
+                ["停止", "A", "X"],
+            ],
+            "Events": [["事件名称"], ["开始"], ["开始"]],
+        })
+
+        state_chart, report = import_statechart_from_excel(file_path)
+        d_name_state = {state.name: state for state in state_chart.states}
+        assert sorted(d_name_state) == ["A", "C", "D", "根状态"]
+        assert d_name_state["A"].min_time_lock is None
+        assert d_name_state["A"].max_time_lock == 3
+        assert d_name_state["根状态"].initial_state_id == d_name_state["A"].id
+        assert len(state_chart.transitions) == 1
+
+        issues = [(issue.severity, issue.sheet, issue.row) for issue in report.issues]
+        assert ("warning", "States", 3) in issues
+        assert ("error", "States", 4) in issues
+        assert ("error", "States", 5) in issues
+        # 循环在一个状态处断开，该状态作为顶层状态放入根状态
+        assert [issue.row for issue in report.warnings if "循环" in issue.message] == [6]
+        assert d_name_state["C"] in list(state_chart.root_state.states)
+        assert ("error", "Events", 3) in issues
+        assert ("warning", "Transitions", 3) in issues
+        assert ("error", "Transitions", 4) in issues
+        assert "X" in str(report.errors[-1])
+
+    def test_no_root_state(self, tmp_path):
+        """测试无法构造状态机时抛出异常"""
+        file_path = str(tmp_path / 'state_chart.xlsx')
+        _save_workbook(file_path, {"Events": [["事件名称"], ["开始"]]})
+        with pytest.raises(ExcelImportError) as exc_info:
+            import_statechart_from_excel(file_path)
+        assert [issue.sheet for issue in exc_info.value.report.errors] == ["States", "States"]
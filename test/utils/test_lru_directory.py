@@ -0,0 +1,31 @@
+import os
+
+import pytest
+
+from app.utils.lru_directory import LruDirectory
+
+
+def _write(temp_path: str):
+    with open(temp_path, 'wb') as f:
+        f.write(b'x' * 100)
+
+
+@pytest.mark.unittest
+class TestLruDirectory:
+    def test_store_and_evict(self, tmp_path):
+        """测试只统计和淘汰指定后缀的文件"""
+        directory = LruDirectory(str(tmp_path), max_bytes=300, suffixes=('.png',))
+        (tmp_path / 'other.txt').write_bytes(b'x' * 1000)
+        (tmp_path / '.temp.png').write_bytes(b'x' * 1000)
+        for index, name in enumerate(('a', 'b', 'c')):
+            entry_path = os.path.join(str(tmp_path), name[:2], f'{name}.png')
+            directory.store(entry_path, 100, _write)
+            os.utime(entry_path, (1000 + index, 1000 + index))
+        assert directory.total_size() == 300
+
+        directory.store(os.path.join(str(tmp_path), 'd', 'd.png'), 100, _write)
+        assert not os.path.exists(os.path.join(str(tmp_path), 'a', 'a.png'))
+        assert not os.path.exists(os.path.join(str(tmp_path), 'b', 'b.png'))
+        assert directory.total_size() == 200
+        assert (tmp_path / 'other.txt').exists()
+        assert (tmp_path / '.temp.png').exists()
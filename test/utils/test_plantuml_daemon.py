@@ -0,0 +1,95 @@
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+
+from app.utils.plantuml_daemon import PNG_SIGNATURE, PlantumlDaemon, PlantumlRenderCanceled, \
+    PlantumlRenderError
+
+#: 模拟PlantUML的 -pipe 模式：读到 @enduml 后输出"图片"和分隔行；代码中包含CRASH时直接退出
+_FAKE_PLANTUML = textwrap.dedent('''
+    import sys
+    delimiter = sys.argv[sys.argv.index('-pipedelimitor') + 1]
+    lines = []
+    for line in sys.stdin.buffer:
+        lines.append(line)
+        if line.strip() == b'@enduml':
+            source = b''.join(lines)
+            lines = []
+            if b'CRASH' in source:
+                sys.stderr.write('crashed\\n')
+                sys.exit(1)
+            if b'HANG' in source:
+                import time
+                time.sleep(60)
+            out = sys.stdout.buffer
+            out.write(PNG + source + delimiter.encode() + b'\\n')
+            out.flush()
+''').replace('PNG', repr(PNG_SIGNATURE))
+
+
+@pytest.mark.unittest
+class TestPlantumlDaemon:
+    @pytest.fixture
+    def daemon(self, tmp_path):
+        script_path = tmp_path / 'fake_plantuml.py'
+        script_path.write_text(_FAKE_PLANTUML)
+        daemon = PlantumlDaemon(launcher=[sys.executable, str(script_path)])
+        yield daemon
+        daemon.close()
+
+    def test_render(self, daemon):
+        """测试多次渲染复用同一个进程"""
+        for name in ("A", "B", "C"):
+            image = daemon.render(f"@startuml\nstate {name}\n@enduml\n", timeout=10)
+            assert image == PNG_SIGNATURE + f"@startuml\nstate {name}\n@enduml\n".encode()
+        assert daemon.start_count == 1
+        assert daemon.is_running
+
+    def test_restart_after_crash(self, daemon):
+        """测试进程崩溃后自动重新启动"""
+        daemon.render("@startuml\n@enduml", timeout=10)
+        with pytest.raises(PlantumlRenderError) as exc_info:
+            daemon.render("@startuml\nCRASH\n@enduml", timeout=10)
+        assert 'crashed' in str(exc_info.value)
+        # 崩溃后重新启动并重试了一次
+        assert daemon.start_count == 2
+        assert daemon.render("@startuml\n@enduml", timeout=10).startswith(PNG_SIGNATURE)
+        assert daemon.start_count == 3
+
+        # 进程在两次渲染之间退出
+        daemon._process.kill()
+        daemon._process.wait()
+        assert daemon.render("@startuml\n@enduml", timeout=10).startswith(PNG_SIGNATURE)
+        assert daemon.start_count == 4
+
+    def test_timeout(self, daemon):
+        """测试渲染超时时结束进程，下次渲染时重新启动"""
+        with pytest.raises(TimeoutError):
+            daemon.render("@startuml\nHANG\n@enduml", timeout=0.5)
+        assert not daemon.is_running
+        assert daemon.render("@startuml\n@enduml", timeout=10).startswith(PNG_SIGNATURE)
+
+    def test_launch_failure(self, tmp_path):
+        """测试无法启动时抛出渲染错误"""
+        daemon = PlantumlDaemon(launcher=[str(tmp_path / 'missing-java')])
+        with pytest.raises(PlantumlRenderError):
+            daemon.render("@startuml\n@enduml", timeout=1)
+
+    def test_cancel(self, daemon):
+        """测试取消渲染时立即结束进程，下次渲染时重新启动"""
+        cancel_event = threading.Event()
+        timer = threading.Timer(0.5, cancel_event.set)
+        timer.start()
+        start_time = time.monotonic()
+        with pytest.raises(PlantumlRenderCanceled):
+            daemon.render("@startuml\nHANG\n@enduml", timeout=30, cancel_event=cancel_event)
+        assert time.monotonic() - start_time < 10
+        assert not daemon.is_running
+        assert daemon.render("@startuml\n@enduml", timeout=10).startswith(PNG_SIGNATURE)
+
+        # 已经取消的请求不再启动渲染
+        with pytest.raises(PlantumlRenderCanceled):
+            daemon.render("@startuml\n@enduml", timeout=10, cancel_event=cancel_event)
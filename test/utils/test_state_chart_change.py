@@ -0,0 +1,123 @@
+import pytest
+from PyQt5 import QtWidgets
+from pyfcstm.model import CompositeState, NormalState, Statechart
+
+from app.utils.fcstm_state_chart import FcstmStateChart
+from app.utils.state_chart_change import StateChartChange
+from app.utils.state_chart_table_model import EventTableModel, TransitionTableModel
+from app.utils.transition_index import transition_key
+
+
+@pytest.mark.unittest
+class TestStateChartChange:
+    @pytest.fixture
+    def fcstm_state_chart(self, qtbot):
+        root_state = CompositeState(name="根状态")
+        state1 = NormalState(name="状态1")
+        state2 = NormalState(name="状态2")
+        root_state.states.add(state1)
+        root_state.states.add(state2)
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state, state1, state2])
+
+        tree_widget = QtWidgets.QTreeWidget()
+        qtbot.addWidget(tree_widget)
+        return FcstmStateChart(tree_widget, state_chart)
+
+    def test_merge(self):
+        """测试修改的合并规则"""
+        change = StateChartChange(events_added=["e1"], events_removed=["e2"], events_modified=["e3"])
+        change.merge(StateChartChange(events_removed=["e1", "e3"], events_added=["e2"], events_modified=["e4"]))
+        assert change.events_added == set()
+        assert change.events_removed == {"e3"}
+        assert change.events_modified == {"e2", "e4"}
+
+        change = StateChartChange(states_added=["s1"])
+        change.merge(StateChartChange(states_modified=["s1"], subtrees=[None]))
+        assert change.states_added == {"s1"}
+        assert change.states_modified == set()
+        assert change.subtrees == {None}
+        assert not StateChartChange()
+
+        # 连续修改同一个迁移时记录最初的键和最后的键
+        key_a, key_b, key_c = ("s1", "s2", "e1"), ("s1", "s2", "e2"), ("s2", "s1", "e2")
+        change = StateChartChange(transitions_removed=[key_a], transitions_added=[key_b],
+                                  transitions_rekeyed={key_a: key_b})
+        change.merge(StateChartChange(transitions_removed=[key_b], transitions_added=[key_c],
+                                      transitions_rekeyed={key_b: key_c}))
+        assert change.transitions_removed == {key_a}
+        assert change.transitions_added == {key_c}
+        assert change.transitions_rekeyed == {key_a: key_c}
+
+    def test_notify(self, fcstm_state_chart):
+        """测试每次修改都通知订阅者，并给出受影响的元素"""
+        changes = []
+        fcstm_state_chart.subscribe(changes.append)
+        fcstm_state_chart.add_event(None, "event", "")
+        event = fcstm_state_chart.state_chart.events.get_by_name("event")
+        assert changes[-1].events_added == {event.id}
+
+        state_chart = fcstm_state_chart.state_chart
+        state1 = state_chart.states.get_by_name("状态1")
+        state2 = state_chart.states.get_by_name("状态2")
+        fcstm_state_chart.add_transition(None, state1, state2, event)
+        key = (state1.id, state2.id, event.id)
+        assert changes[-1].transitions_added == {key}
+
+        fcstm_state_chart.del_event(None, "event")
+        assert changes[-1].events_removed == {event.id}
+        assert changes[-1].transitions_removed == {key}
+
+        fcstm_state_chart.unsubscribe(changes.append)
+        fcstm_state_chart.add_event(None, "event2", "")
+        assert len(changes) == 3
+
+    def test_batch(self, fcstm_state_chart):
+        """测试batch中的修改合并为一次通知"""
+        changes = []
+        fcstm_state_chart.subscribe(changes.append)
+        with fcstm_state_chart.batch():
+            fcstm_state_chart.add_event(None, "event1", "")
+            with fcstm_state_chart.batch():
+                fcstm_state_chart.add_event(None, "event2", "")
+            fcstm_state_chart.del_event(None, "event1")
+            assert changes == []
+        assert len(changes) == 1
+        event2 = fcstm_state_chart.state_chart.events.get_by_name("event2")
+        assert changes[0].events_added == {event2.id}
+        assert changes[0].events_removed == set()
+
+        # 没有实际修改的batch不发出通知
+        with fcstm_state_chart.batch():
+            pass
+        assert len(changes) == 1
+
+    def test_apply_change(self, fcstm_state_chart):
+        """测试表格模型根据通知只更新受影响的行"""
+        event_model = EventTableModel(fcstm_state_chart)
+        transition_model = TransitionTableModel(fcstm_state_chart)
+        fcstm_state_chart.subscribe(event_model.apply_change)
+        fcstm_state_chart.subscribe(transition_model.apply_change)
+
+        fcstm_state_chart.add_event(None, "event", "x > 0")
+        assert event_model.rowCount() == 1
+        state_chart = fcstm_state_chart.state_chart
+        state1 = state_chart.states.get_by_name("状态1")
+        state2 = state_chart.states.get_by_name("状态2")
+        event = state_chart.events.get_by_name("event")
+        fcstm_state_chart.add_transition(None, state1, state2, event)
+        assert transition_model.rowCount() == 1
+
+        changed_rows = []
+        transition_model.dataChanged.connect(lambda top_left, bottom_right: changed_rows.append(top_left.row()))
+        fcstm_state_chart.edit_event(None, "renamed", "", "event")
+        assert event_model.index(0, 0).data() == "renamed"
+        assert changed_rows == [0]
+        assert transition_model.index(0, 1).data() == "renamed"
+
+        fcstm_state_chart.edit_transition(None, state1, state2, event, state2, state1, event)
+        assert transition_model.rowCount() == 1
+        assert transition_model.key_at(0) == transition_key(fcstm_state_chart.transition_index.get(state2.id, state1.id, event.id))
+
+        fcstm_state_chart.del_event(None, "renamed")
+        assert event_model.rowCount() == 0
+        assert transition_model.rowCount() == 0
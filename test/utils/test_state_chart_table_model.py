@@ -0,0 +1,108 @@
+import pytest
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt, QSortFilterProxyModel
+from pyfcstm.model import CompositeState, NormalState, Statechart
+
+from app.utils.fcstm_state_chart import FcstmStateChart
+from app.utils.state_chart_table_model import EventTableModel, TransitionTableModel
+
+
+@pytest.mark.unittest
+class TestStateChartTableModel:
+    @pytest.fixture
+    def fcstm_state_chart(self, qtbot):
+        root_state = CompositeState(name="根状态")
+        state1 = NormalState(name="状态1")
+        state2 = NormalState(name="状态2")
+        root_state.states.add(state1)
+        root_state.states.add(state2)
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state, state1, state2])
+
+        tree_widget = QtWidgets.QTreeWidget()
+        qtbot.addWidget(tree_widget)
+        fcstm_state_chart = FcstmStateChart(tree_widget, state_chart)
+        fcstm_state_chart.add_event(None, "b_event", "x > 0")
+        fcstm_state_chart.add_event(None, "a_event", "")
+        return fcstm_state_chart
+
+    def test_event_rows(self, fcstm_state_chart):
+        """测试事件表格内容"""
+        model = EventTableModel(fcstm_state_chart)
+        assert model.rowCount() == 2
+        assert model.columnCount() == 2
+        assert model.headerData(0, Qt.Horizontal) == "事件名称"
+        assert model.index(0, 0).data() == "b_event"
+        assert model.index(0, 1).data() == "x > 0"
+        assert model.index(1, 1).data() == ""
+
+    def test_apply_change_emits_row_signals(self, fcstm_state_chart, qtbot):
+        """测试根据修改通知只发出变化行的信号"""
+        model = EventTableModel(fcstm_state_chart)
+        fcstm_state_chart.subscribe(model.apply_change)
+        inserted, removed = [], []
+        model.rowsInserted.connect(lambda parent, first, last: inserted.append((first, last)))
+        model.rowsRemoved.connect(lambda parent, first, last: removed.append((first, last)))
+
+        fcstm_state_chart.add_event(None, "c_event", "")
+        assert inserted == [(2, 2)]
+        assert removed == []
+        assert model.index(2, 0).data() == "c_event"
+
+        fcstm_state_chart.del_event(None, "b_event")
+        assert removed == [(0, 0)]
+        assert model.rowCount() == 2
+        assert model.index(0, 0).data() == "a_event"
+        assert model.row_of(fcstm_state_chart.state_chart.events.get_by_name("c_event").id) == 1
+
+    def test_remove_keys_in_ranges(self, fcstm_state_chart):
+        """测试连续行合并删除"""
+        for i in range(5):
+            fcstm_state_chart.add_event(None, f"event{i}", "")
+        model = EventTableModel(fcstm_state_chart)
+        removed = []
+        model.rowsRemoved.connect(lambda parent, first, last: removed.append((first, last)))
+        model.remove_keys([model.key_at(row) for row in (1, 2, 3, 5)])
+        assert removed == [(5, 5), (1, 3)]
+        assert [model.index(row, 0).data() for row in range(model.rowCount())] == ["b_event", "event2", "event4"]
+        assert [model.row_of(model.key_at(row)) for row in range(model.rowCount())] == [0, 1, 2]
+
+    def test_edited_transition_keeps_row(self, fcstm_state_chart):
+        """测试修改迁移的端点或事件后迁移留在原来的行"""
+        state_chart = fcstm_state_chart.state_chart
+        state1 = state_chart.states.get_by_name("状态1")
+        state2 = state_chart.states.get_by_name("状态2")
+        a_event = state_chart.events.get_by_name("a_event")
+        b_event = state_chart.events.get_by_name("b_event")
+        fcstm_state_chart.add_transition(None, state1, state2, a_event)
+        fcstm_state_chart.add_transition(None, state2, state1, a_event)
+        model = TransitionTableModel(fcstm_state_chart)
+        fcstm_state_chart.subscribe(model.apply_change)
+        signals = []
+        model.rowsInserted.connect(lambda *args: signals.append('inserted'))
+        model.rowsRemoved.connect(lambda *args: signals.append('removed'))
+        model.dataChanged.connect(lambda top_left, bottom_right: signals.append(top_left.row()))
+
+        fcstm_state_chart.edit_transition(None, state1, state2, a_event, state1, state2, b_event)
+        assert signals == [0]
+        assert [model.index(0, col).data() for col in range(3)] == ["状态1", "b_event", "状态2"]
+        assert model.row_of((state1.id, state2.id, b_event.id)) == 0
+        assert model.row_of((state1.id, state2.id, a_event.id)) == -1
+        assert model.row_of((state2.id, state1.id, a_event.id)) == 1
+
+    def test_transition_rows_sorted(self, fcstm_state_chart):
+        """测试迁移表格通过代理模型排序"""
+        state_chart = fcstm_state_chart.state_chart
+        state1 = state_chart.states.get_by_name("状态1")
+        state2 = state_chart.states.get_by_name("状态2")
+        fcstm_state_chart.add_transition(None, state2, state1, state_chart.events.get_by_name("b_event"))
+        fcstm_state_chart.add_transition(None, state1, state2, state_chart.events.get_by_name("a_event"))
+
+        model = TransitionTableModel(fcstm_state_chart)
+        assert model.rowCount() == 2
+        assert [model.index(0, col).data() for col in range(3)] == ["状态2", "b_event", "状态1"]
+
+        proxy_model = QSortFilterProxyModel()
+        proxy_model.setSourceModel(model)
+        proxy_model.sort(1, Qt.AscendingOrder)
+        assert proxy_model.index(0, 1).data() == "a_event"
+        assert proxy_model.index(1, 1).data() == "b_event"
@@ -0,0 +1,76 @@
+import pytest
+from PyQt5 import QtWidgets
+from pyfcstm.model import CompositeState, NormalState, Statechart, Transition
+
+from app.utils.fcstm_state_chart import FcstmStateChart
+from app.utils.state_chart_table_model import ProblemTableModel
+from app.utils.state_chart_validator import Diagnostic, StateChartValidator
+
+
+@pytest.mark.unittest
+class TestStateChartValidator:
+    @pytest.fixture
+    def fcstm_state_chart(self, qtbot):
+        root_state = CompositeState(name="根状态")
+        state1 = NormalState(name="状态1")
+        state2 = NormalState(name="状态2")
+        root_state.states.add(state1)
+        root_state.states.add(state2)
+        root_state.initial_state = state1
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state, state1, state2])
+
+        tree_widget = QtWidgets.QTreeWidget()
+        qtbot.addWidget(tree_widget)
+        return FcstmStateChart(tree_widget, state_chart)
+
+    def test_initial_check(self, fcstm_state_chart):
+        """测试构造时检查整个状态机，包括导入的不合法迁移"""
+        state_chart = fcstm_state_chart.state_chart
+        state1 = state_chart.states.get_by_name("状态1")
+        dangling_transition = Transition(state1, None, None)
+        state_chart.transitions.add(dangling_transition)
+        fcstm_state_chart.transition_index.add(dangling_transition)
+
+        validator = StateChartValidator(fcstm_state_chart)
+        codes = {diagnostic.code for diagnostic in validator.diagnostics()}
+        assert codes == {'dst_state', 'event'}
+        assert validator.error_count == 2
+
+    def test_incremental(self, fcstm_state_chart):
+        """测试修改后只重新检查受影响的对象"""
+        validator = StateChartValidator(fcstm_state_chart)
+        diffs = []
+        validator.subscribe(lambda added, removed, modified: diffs.append((added, removed, modified)))
+        assert validator.diagnostics() == []
+
+        state_chart = fcstm_state_chart.state_chart
+        root_state = state_chart.root_state
+        fcstm_state_chart.add_state(root_state, NormalState(name="状态1"))
+        state1 = state_chart.states.get_by_name("状态1")
+        assert len(diffs) == 1
+        assert len(diffs[0][0]) == 2
+        assert [diagnostic.code for diagnostic in validator.diagnostics_of('state', state1.id)] == ['duplicated_name']
+
+        # 删除初始状态后父状态的初始状态不再合法，名称也不再重复
+        fcstm_state_chart.del_state(None, state1)
+        assert [diagnostic.code for diagnostic in validator.diagnostics()] == ['initial_state']
+        assert validator.diagnostics()[0].severity == Diagnostic.ERROR
+
+        fcstm_state_chart.change_initial_state(root_state, state_chart.states.get_by_name("状态2"))
+        assert validator.diagnostics() == []
+
+        validator.close()
+        fcstm_state_chart.add_state(root_state, NormalState(name="状态2"))
+        assert validator.diagnostics() == []
+
+    def test_problem_table_model(self, fcstm_state_chart):
+        """测试问题列表随诊断信息增删行"""
+        validator = StateChartValidator(fcstm_state_chart)
+        model = ProblemTableModel(validator)
+        assert model.rowCount() == 0
+        root_state = fcstm_state_chart.state_chart.root_state
+        fcstm_state_chart.add_state(root_state, NormalState(name="状态2", min_time_lock=5, max_time_lock=1))
+        assert model.rowCount() == 3
+        assert {model.index(row, 2).data() for row in range(3)} == {"最小时间锁大于最大时间锁", "状态名称 '状态2' 重复"}
+        fcstm_state_chart.undo()
+        assert model.rowCount() == 0
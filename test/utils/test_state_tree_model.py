@@ -0,0 +1,159 @@
+import pytest
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt, QModelIndex
+from pyfcstm.model import CompositeState, NormalState, Statechart
+
+from app.utils.fcstm_state_chart import FcstmStateChart
+from app.utils.state_tree_model import StateTreeModel
+
+
+@pytest.mark.unittest
+class TestStateTreeModel:
+    @pytest.fixture
+    def fcstm_state_chart(self, qtbot):
+        root_state = CompositeState(name="根状态")
+        composite_state = CompositeState(name="复合状态")
+        sub_states = [NormalState(name=f"子状态{i}") for i in range(5)]
+        for sub_state in sub_states:
+            composite_state.states.add(sub_state)
+        composite_state.initial_state = sub_states[1]
+        root_state.states.add(composite_state)
+        states = [root_state, composite_state, *sub_states]
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=states)
+
+        tree_widget = QtWidgets.QTreeWidget()
+        qtbot.addWidget(tree_widget)
+        return FcstmStateChart(tree_widget, state_chart)
+
+    def test_lazy_fetch(self, fcstm_state_chart):
+        """测试子状态按需加载"""
+        model = StateTreeModel(fcstm_state_chart)
+        assert model.rowCount() == 0
+        assert model.canFetchMore(QModelIndex())
+        model.fetchMore(QModelIndex())
+        assert model.rowCount() == 1
+
+        root_index = model.index(0, 0)
+        assert root_index.data(Qt.DisplayRole) == "根状态"
+        assert root_index.data(Qt.UserRole) == fcstm_state_chart.state_chart.root_state_id
+        assert root_index.data(Qt.DecorationRole) is not None
+        assert model.hasChildren(root_index)
+        assert model.rowCount(root_index) == 0
+
+        model.fetchMore(root_index)
+        composite_index = model.index(0, 0, root_index)
+        assert composite_index.data(Qt.DisplayRole) == "复合状态"
+        assert model.parent(composite_index) == root_index
+        assert len(model.d_id_node) == 2
+
+    def test_fetch_in_batches(self, fcstm_state_chart):
+        """测试大量子状态分批加载"""
+        model = StateTreeModel(fcstm_state_chart)
+        model.FETCH_BATCH_SIZE = 2
+        model.fetchMore(QModelIndex())
+        root_index = model.index(0, 0)
+        model.fetchMore(root_index)
+        composite_index = model.index(0, 0, root_index)
+
+        model.fetchMore(composite_index)
+        assert model.rowCount(composite_index) == 2
+        while model.canFetchMore(composite_index):
+            model.fetchMore(composite_index)
+        assert model.rowCount(composite_index) == 5
+
+        initial_index = model.index(1, 0, composite_index)
+        assert initial_index.data(Qt.DisplayRole) == "子状态1"
+        assert initial_index.data(Qt.DecorationRole) is not None
+        assert model.index(2, 0, composite_index).data(Qt.DecorationRole) is None
+
+    def test_index_of_state(self, fcstm_state_chart):
+        """测试按状态id定位节点"""
+        model = StateTreeModel(fcstm_state_chart)
+        sub_state = fcstm_state_chart.state_chart.states.get_by_name("子状态3")
+        index = model.index_of_state(sub_state.id)
+        assert index.isValid()
+        assert index.row() == 3
+        assert model.state_id(index) == sub_state.id
+        assert model.parent(index).data(Qt.DisplayRole) == "复合状态"
+
+    def test_sync(self, fcstm_state_chart):
+        """测试只同步发生变化的子树"""
+        model = StateTreeModel(fcstm_state_chart)
+        root_state = fcstm_state_chart.state_chart.root_state
+        composite_state = fcstm_state_chart.state_chart.states.get_by_name("复合状态")
+        composite_index = model.index_of_state(composite_state.id)
+        while model.canFetchMore(composite_index):
+            model.fetchMore(composite_index)
+        root_node = model.d_id_node[root_state.id]
+
+        # 没有修改时不做任何操作
+        model.sync()
+        assert model.d_id_node[root_state.id] is root_node
+
+        # 在复合状态下添加子状态只重建复合状态的子树
+        new_state = NormalState(name="新状态")
+        fcstm_state_chart.add_state(composite_state, new_state)
+        assert fcstm_state_chart.changed_subtrees_since(model.synced_revision) == {composite_state.id}
+        model.sync()
+        assert model.synced_revision == fcstm_state_chart.revision
+        assert model.d_id_node[root_state.id] is root_node
+        assert model.rowCount(composite_index) == 6
+        assert model.index(5, 0, composite_index).data(Qt.DisplayRole) == "新状态"
+
+        # 删除子状态
+        fcstm_state_chart.del_state(None, new_state)
+        model.sync()
+        assert model.rowCount(composite_index) == 5
+        assert new_state.id not in model.d_id_node
+
+        # 事件的修改不影响层次结构
+        fcstm_state_chart.add_event(None, "事件", "")
+        assert fcstm_state_chart.changed_subtrees_since(model.synced_revision) == set()
+
+    def test_without_tree_items(self, fcstm_state_chart):
+        """测试不创建树节点时，修改、撤销和重做都只通过模型显示"""
+        fcstm_state_chart = FcstmStateChart(None, fcstm_state_chart.state_chart, tree_items=False)
+        assert fcstm_state_chart.d_id_tree_item == {}
+        model = StateTreeModel(fcstm_state_chart)
+        composite_state = fcstm_state_chart.state_chart.states.get_by_name("复合状态")
+        assert fcstm_state_chart.father_state_id(composite_state.id) == fcstm_state_chart.state_chart.root_state_id
+        composite_index = model.index_of_state(composite_state.id)
+
+        new_state = NormalState(name="新状态")
+        fcstm_state_chart.add_state(composite_state, new_state)
+        model.sync()
+        assert model.index_of_state(new_state.id).data(Qt.DisplayRole) == "新状态"
+
+        fcstm_state_chart.del_state(None, composite_state)
+        model.sync()
+        assert not model.index_of_state(new_state.id).isValid()
+        assert new_state.id not in fcstm_state_chart.d_id_father_state
+
+        # 撤销删除时恢复整棵子树的父状态索引
+        assert fcstm_state_chart.undo()
+        model.sync()
+        assert fcstm_state_chart.father_state_id(new_state.id) == composite_state.id
+        index = model.index_of_state(new_state.id)
+        assert index.isValid()
+        assert model.parent(index).data(Qt.DisplayRole) == "复合状态"
+        assert fcstm_state_chart.d_id_tree_item == {}
+
+    def test_change_log_trimmed(self, fcstm_state_chart):
+        """测试修改记录有上限，早于保留记录的模型重建所有顶层状态"""
+        fcstm_state_chart.STATE_CHANGE_LOG_LIMIT = 4
+        model = StateTreeModel(fcstm_state_chart)
+        model.fetchMore(QModelIndex())
+        composite_state = fcstm_state_chart.state_chart.states.get_by_name("复合状态")
+        old_revision = fcstm_state_chart.revision
+        new_states = [NormalState(name=f"新状态{i}") for i in range(5)]
+        for new_state in new_states:
+            fcstm_state_chart.add_state(composite_state, new_state)
+        assert len(fcstm_state_chart._state_change_revisions) <= 4
+        assert fcstm_state_chart.changed_subtrees_since(old_revision) == {None}
+        assert fcstm_state_chart.changed_subtrees_since(fcstm_state_chart.revision - 1) == {composite_state.id}
+
+        model.sync()
+        composite_index = model.index_of_state(composite_state.id)
+        while model.canFetchMore(composite_index):
+            model.fetchMore(composite_index)
+        assert model.rowCount(composite_index) == 10
@@ -0,0 +1,76 @@
+import json
+import os
+
+import pytest
+from PyQt5 import QtWidgets
+from pyfcstm.model import CompositeState, NormalState, Statechart
+
+from app.utils.binary_statechart import read_binary_statechart
+from app.utils.export_cache import ExportCache
+from app.utils.fcstm_state_chart import FcstmStateChart
+from app.utils.statechart_export_worker import StatechartExportWorker, start_export_worker
+from app.utils.statechart_snapshot import StatechartSnapshot
+
+
+@pytest.mark.unittest
+class TestStatechartExportWorker:
+    @pytest.fixture
+    def fcstm_state_chart(self, qtbot):
+        root_state = CompositeState(name="根状态")
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state])
+        tree_widget = QtWidgets.QTreeWidget()
+        qtbot.addWidget(tree_widget)
+        fcstm_state_chart = FcstmStateChart(tree_widget, state_chart)
+        fcstm_state_chart.add_state(root_state, NormalState(name="A"))
+        return fcstm_state_chart
+
+    def test_export_snapshot(self, qtbot, fcstm_state_chart, tmp_path):
+        """测试在工作线程中导出开始导出时的快照，之后的修改不影响导出结果"""
+        file_path = str(tmp_path / 'state_chart.fcstmb')
+        worker = StatechartExportWorker(StatechartSnapshot.capture(fcstm_state_chart), file_path, '.fcstmb')
+        fcstm_state_chart.add_state(fcstm_state_chart.state_chart.root_state, NormalState(name="B"))
+        thread_finished = []
+        with qtbot.waitSignal(worker.finished, timeout=10000) as blocker:
+            thread = start_export_worker(worker)
+            thread.finished.connect(lambda: thread_finished.append(True))
+        qtbot.waitUntil(lambda: len(thread_finished) > 0, timeout=10000)
+        assert blocker.args == [file_path]
+        state_chart = read_binary_statechart(file_path)
+        assert sorted(state.name for state in state_chart.states) == ["A", "根状态"]
+        assert os.listdir(tmp_path) == ['state_chart.fcstmb']
+
+    @pytest.mark.parametrize('export_format', ['.json', '.docx', '.xlsx'])
+    def test_formats(self, qtbot, fcstm_state_chart, tmp_path, export_format):
+        """测试各种导出格式"""
+        file_path = str(tmp_path / ('state_chart' + export_format))
+        worker = StatechartExportWorker(StatechartSnapshot.capture(fcstm_state_chart), file_path, export_format)
+        with qtbot.waitSignal(worker.finished, timeout=10000):
+            worker.run()
+        assert os.path.getsize(file_path) > 0
+        if export_format == '.json':
+            with open(file_path, 'r', encoding='utf-8') as f:
+                assert json.load(f)['name'] == "测试状态图"
+
+    def test_export_cache(self, qtbot, fcstm_state_chart, tmp_path):
+        """测试状态机没有变化时第二次导出使用缓存"""
+        cache = ExportCache(str(tmp_path / 'cache'), max_bytes=1024 * 1024)
+        for file_name, cache_hit in (('first.docx', False), ('second.docx', True)):
+            file_path = str(tmp_path / file_name)
+            worker = StatechartExportWorker(StatechartSnapshot.capture(fcstm_state_chart), file_path, '.docx',
+                                            cache=cache)
+            with qtbot.waitSignal(worker.finished, timeout=10000):
+                worker.run()
+            assert worker.cache_hit == cache_hit
+        with open(str(tmp_path / 'first.docx'), 'rb') as f1, open(str(tmp_path / 'second.docx'), 'rb') as f2:
+            assert f1.read() == f2.read()
+
+    def test_cancel(self, qtbot, fcstm_state_chart, tmp_path):
+        """测试取消导出时目标文件保持原样"""
+        file_path = tmp_path / 'state_chart.json'
+        file_path.write_text('old', encoding='utf-8')
+        worker = StatechartExportWorker(StatechartSnapshot.capture(fcstm_state_chart), str(file_path), '.json')
+        worker.progress.connect(lambda done, total: worker.cancel() if done == 2 else None)
+        with qtbot.waitSignal(worker.canceled, timeout=1000):
+            worker.run()
+        assert file_path.read_text(encoding='utf-8') == 'old'
+        assert os.listdir(tmp_path) == ['state_chart.json']
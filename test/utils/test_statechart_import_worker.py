@@ -0,0 +1,83 @@
+import pytest
+from PyQt5 import QtWidgets
+from pyfcstm.model import CompositeState, Statechart
+
+from app.utils.binary_statechart import write_binary_statechart
+from app.utils.export_to_excel import export_statechart_to_excel
+from app.utils.fcstm_state_chart import FcstmStateChart
+from app.utils.statechart_import_worker import StatechartImportWorker, start_import_worker
+from app.utils.statechart_snapshot import snapshot_model
+
+
+@pytest.mark.unittest
+class TestStatechartImportWorker:
+    @pytest.fixture
+    def json_file(self, tmp_path):
+        root_state = CompositeState(name="根状态")
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state])
+        file_path = str(tmp_path / "state_chart.json")
+        state_chart.to_json(file_path)
+        return file_path
+
+    def test_import(self, qtbot, json_file):
+        """测试在工作线程中导入，并在主线程中挂到树控件上"""
+        worker = StatechartImportWorker(json_file)
+        progress = []
+        worker.progress.connect(lambda read_size, total_size: progress.append((read_size, total_size)))
+        thread_finished = []
+        with qtbot.waitSignal(worker.finished, timeout=10000) as blocker:
+            thread = start_import_worker(worker)
+            thread.finished.connect(lambda: thread_finished.append(True))
+        qtbot.waitUntil(lambda: len(thread_finished) > 0, timeout=10000)
+        fcstm_state_chart = blocker.args[0]
+        assert isinstance(fcstm_state_chart, FcstmStateChart)
+        assert fcstm_state_chart.state_chart.name == "测试状态图"
+        assert progress[-1][0] == progress[-1][1] > 0
+        # 自动保存的基准快照已经在工作线程中生成
+        assert worker.base_model == snapshot_model(fcstm_state_chart)
+
+        tree_widget = QtWidgets.QTreeWidget()
+        qtbot.addWidget(tree_widget)
+        fcstm_state_chart.attach_tree_widget(tree_widget)
+        root_state = fcstm_state_chart.state_chart.root_state
+        assert tree_widget.topLevelItemCount() == 1
+        assert fcstm_state_chart.get_tree_item(root_state.id) is tree_widget.topLevelItem(0)
+
+    def test_cancel(self, qtbot, json_file):
+        """测试取消导入"""
+        worker = StatechartImportWorker(json_file)
+        worker.cancel()
+        with qtbot.waitSignal(worker.canceled, timeout=1000):
+            worker.run()
+
+    def test_failed(self, qtbot, tmp_path):
+        """测试文件格式错误"""
+        file_path = tmp_path / "broken.json"
+        file_path.write_text("{", encoding="utf-8")
+        worker = StatechartImportWorker(str(file_path))
+        with qtbot.waitSignal(worker.failed, timeout=1000):
+            worker.run()
+
+    def test_import_binary(self, qtbot, tmp_path):
+        """测试导入二进制状态机文件"""
+        root_state = CompositeState(name="根状态")
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state])
+        file_path = str(tmp_path / "state_chart.fcstmb")
+        write_binary_statechart(state_chart, file_path)
+        worker = StatechartImportWorker(file_path)
+        with qtbot.waitSignal(worker.finished, timeout=1000) as blocker:
+            worker.run()
+        assert blocker.args[0].state_chart.root_state_id == root_state.id
+        assert worker.reader is None
+
+    def test_import_excel(self, qtbot, tmp_path):
+        """测试导入Excel文件，导入报告保存在worker上"""
+        root_state = CompositeState(name="根状态")
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state])
+        file_path = str(tmp_path / "state_chart.xlsx")
+        assert export_statechart_to_excel(state_chart, file_path)
+        worker = StatechartImportWorker(file_path)
+        with qtbot.waitSignal(worker.finished, timeout=1000) as blocker:
+            worker.run()
+        assert blocker.args[0].state_chart.root_state.name == "根状态"
+        assert worker.excel_report.issues == []
@@ -0,0 +1,43 @@
+import pytest
+from pyfcstm.model import CompositeState, Event, NormalState, Statechart, Transition
+
+from app.utils.fcstm_state_chart import FcstmStateChart
+from app.utils.statechart_snapshot import StatechartSnapshot
+from app.utils.transition_index import transition_key
+
+
+@pytest.mark.unittest
+class TestStatechartSnapshot:
+    @pytest.fixture
+    def fcstm_state_chart(self):
+        root_state = CompositeState(name="根状态")
+        states = [NormalState(name=f"状态{i}") for i in range(4)]
+        for state in states:
+            root_state.states.add(state)
+        root_state.initial_state = states[0]
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state, *states])
+        events = [Event(f"事件{i}", f"x > {i}") for i in range(3)]
+        for event in events:
+            state_chart.events.add(event)
+        for index in range(5):
+            state_chart.transitions.add(Transition(states[index % 4], states[(index + 1) % 4], events[index % 3]))
+        return FcstmStateChart(None, state_chart, tree_items=False)
+
+    def test_to_statechart_keeps_order_and_ids(self, fcstm_state_chart):
+        """测试快照构造的状态机保持迁移的顺序和事件id"""
+        state_chart = fcstm_state_chart.state_chart
+        snapshot = StatechartSnapshot.capture(fcstm_state_chart)
+        # 经过自动保存使用的to_data之后同样保持
+        for loaded in (snapshot.to_statechart(), StatechartSnapshot(snapshot.to_data()).to_statechart()):
+            assert [transition_key(transition) for transition in loaded.transitions] == \
+                   [transition_key(transition) for transition in state_chart.transitions]
+            assert [(event.id, event.name, event.guard) for event in loaded.events] == \
+                   [(event.id, event.name, event.guard) for event in state_chart.events]
+
+    def test_apply_transitions(self, fcstm_state_chart):
+        """测试删除迁移后其余迁移的顺序不变，新的迁移排在最后"""
+        snapshot = StatechartSnapshot.capture(fcstm_state_chart)
+        keys = list(snapshot.transitions)
+        snapshot.apply([['del_transition', list(keys[1])], ['transition', list(keys[1])],
+                        ['del_transition', list(keys[3])]])
+        assert list(snapshot.transitions) == [keys[0], keys[2], keys[4], keys[1]]
@@ -0,0 +1,37 @@
+import pytest
+from pyfcstm.model import CompositeState, NormalState, Statechart
+
+from app.utils.fcstm_state_chart import FcstmStateChart
+from app.utils.statechart_snapshot import StatechartSnapshot
+from app.utils.statechart_validate_worker import StatechartValidateWorker, start_validate_worker
+
+
+@pytest.mark.unittest
+class TestStatechartValidateWorker:
+    @pytest.fixture
+    def fcstm_state_chart(self):
+        root_state = CompositeState(name="根状态")
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state])
+        fcstm_state_chart = FcstmStateChart(None, state_chart, tree_items=False)
+        fcstm_state_chart.add_state(root_state, NormalState(name="A"))
+        return fcstm_state_chart
+
+    def test_validate_in_thread(self, qtbot, fcstm_state_chart):
+        """测试在工作线程中验证快照"""
+        worker = StatechartValidateWorker(StatechartSnapshot.capture(fcstm_state_chart))
+        thread_finished = []
+        with qtbot.waitSignal(worker.finished, timeout=10000):
+            thread = start_validate_worker(worker)
+            thread.finished.connect(lambda: thread_finished.append(True))
+        qtbot.waitUntil(lambda: len(thread_finished) > 0, timeout=10000)
+
+    def test_failed(self, qtbot, fcstm_state_chart, monkeypatch):
+        """测试验证失败时报告错误信息"""
+        def fake_validate(self):
+            raise ValueError("状态名重复")
+
+        worker = StatechartValidateWorker(StatechartSnapshot.capture(fcstm_state_chart))
+        monkeypatch.setattr(Statechart, 'validate', fake_validate)
+        with qtbot.waitSignal(worker.failed, timeout=10000) as blocker:
+            worker.run()
+        assert blocker.args == ["状态名重复"]
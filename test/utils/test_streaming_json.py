@@ -0,0 +1,124 @@
+import io
+import json
+import os
+
+import pytest
+
+from pyfcstm.model import CompositeState, NormalState
+
+from app.utils.streaming_json import StreamingJsonReader, read_statechart_streaming
+
+
+@pytest.mark.unittest
+class TestStreamingJsonReader:
+    def _load(self, data, chunk_size):
+        raw = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        progress = []
+        reader = StreamingJsonReader(io.BytesIO(raw), chunk_size=chunk_size, progress=progress.append)
+        return reader.load(), reader, progress, len(raw)
+
+    @pytest.mark.parametrize('chunk_size', [1, 7, 64, 1024 * 1024])
+    def test_load(self, chunk_size):
+        """测试不同分块大小下的解码结果与json.loads一致"""
+        data = {
+            "name": "测试状态图",
+            "count": 12345,
+            "ratio": -1.5e-3,
+            "flags": [True, False, None],
+            "empty": [],
+            "empty_object": {},
+            "states": [{"id": f"s{i}", "name": f"状态{i}", "children": [i, i + 1]} for i in range(50)],
+        }
+        loaded, reader, progress, raw_size = self._load(data, chunk_size)
+        assert loaded == data
+        assert reader.bytes_read == raw_size
+        assert progress[-1] == raw_size
+        assert reader.element_count == 3 + 50
+
+    def test_bounded_buffer(self):
+        """测试文本缓冲区只与单个元素的大小有关，与文件大小无关"""
+        data = {"states": [{"id": f"s{i}", "name": "x" * 100} for i in range(2000)]}
+        _, reader, _, raw_size = self._load(data, 256)
+        assert reader.peak_buffer_size < 1024
+        assert raw_size > 200 * 1024
+
+    @pytest.mark.parametrize('text', ['[1, 2]', '{"a": 1', '{"a": [1 2]}', '{"a": 1} x', '{1: 2}'])
+    def test_invalid(self, text):
+        """测试格式错误"""
+        reader = StreamingJsonReader(io.BytesIO(text.encode('utf-8')), chunk_size=4)
+        with pytest.raises(ValueError):
+            reader.load()
+
+
+def _state(state_id: str, name: str, **kwargs):
+    return dict(id=state_id, name=name, type='Normal', on_entry="a = 1;", **kwargs)
+
+
+@pytest.mark.unittest
+class TestReadStatechartStreaming:
+    def _write(self, tmp_path, data) -> str:
+        file_path = str(tmp_path / 'state_chart.json')
+        with open(file_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        return file_path
+
+    def test_flat_layout(self, tmp_path):
+        """测试逐个元素构造状态机，引用可以出现在被引用的元素之前"""
+        count = 2000
+        data = {
+            "name": "测试状态图",
+            "preamble": ["int a;"],
+            "root_state_id": "root",
+            # 迁移在状态和事件之前
+            "transitions": [{"src_state_id": f"s{i}", "dst_state_id": f"s{i + 1}", "event_id": "e0"}
+                            for i in range(count - 1)],
+            "states": [dict(id="root", name="根状态", type='Composite', states=[f"s{i}" for i in range(count)],
+                            initial_state_id="s1")] + [_state(f"s{i}", f"状态{i}") for i in range(count)],
+            "events": [{"id": "e0", "name": "开始", "guard": "x > 0"}],
+        }
+        file_path = self._write(tmp_path, data)
+        state_chart, reader = read_statechart_streaming(file_path, chunk_size=256)
+        assert reader.streamed
+        # 文本缓冲区只需要容纳最大的单个元素（列出所有子状态id的根状态），不需要容纳整个文件
+        assert reader.peak_buffer_size < os.path.getsize(file_path) // 4
+        assert state_chart.name == "测试状态图"
+        assert list(state_chart.preamble) == ["int a;"]
+        root_state = state_chart.root_state
+        assert isinstance(root_state, CompositeState)
+        assert [state.id for state in root_state.states] == [f"s{i}" for i in range(count)]
+        assert root_state.initial_state_id == "s1"
+        state = next(state for state in state_chart.states if state.id == "s5")
+        assert isinstance(state, NormalState)
+        assert (state.name, state.on_entry) == ("状态5", "a = 1;")
+        (event,) = list(state_chart.events)
+        assert (event.id, event.name, event.guard) == ("e0", "开始", "x > 0")
+        transitions = list(state_chart.transitions)
+        assert [(t.src_state_id, t.dst_state_id) for t in transitions[:2]] == [("s0", "s1"), ("s1", "s2")]
+        assert all(t.event is event for t in transitions)
+
+    def test_nested_layout(self, tmp_path):
+        """测试子状态以嵌套对象给出，没有root_state_id时顶层状态为根状态"""
+        data = {"name": "嵌套", "states": [dict(id="root", name="根状态", type='composite', states=[
+            dict(id="c", name="复合状态", type='composite', states=[_state("a", "A")], initial_state_id="a"),
+            _state("b", "B"),
+        ])]}
+        state_chart, reader = read_statechart_streaming(self._write(tmp_path, data))
+        assert reader.streamed
+        assert state_chart.root_state_id == "root"
+        assert {state.id for state in state_chart.states} == {"root", "c", "a", "b"}
+        composite_state = next(state for state in state_chart.states if state.id == "c")
+        assert composite_state.initial_state.name == "A"
+
+    def test_unsupported_layout(self, tmp_path):
+        """测试无法识别的布局完整解码后交给Statechart.from_json"""
+        data = {"name": "其他布局", "root": {"label": "x"}}
+        state_chart, reader = read_statechart_streaming(self._write(tmp_path, data))
+        assert not reader.streamed
+        assert state_chart.name == "其他布局"
+
+    def test_dangling_reference(self, tmp_path):
+        """测试迁移引用了不存在的状态"""
+        data = {"name": "x", "states": [_state("a", "A")],
+                "transitions": [{"src_state_id": "a", "dst_state_id": "missing", "event_id": None}]}
+        with pytest.raises(ValueError):
+            read_statechart_streaming(self._write(tmp_path, data))
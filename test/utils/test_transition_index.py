@@ -0,0 +1,75 @@
+import pytest
+from pyfcstm.model import NormalState, Event, Transition
+
+from app.utils.transition_index import TransitionIndex, transition_key
+
+
+@pytest.mark.unittest
+class TestTransitionIndex:
+    @pytest.fixture
+    def transitions(self):
+        state1 = NormalState(name="状态1")
+        state2 = NormalState(name="状态2")
+        event1 = Event("事件1", "")
+        event2 = Event("事件2", "")
+        return [
+            Transition(state1, state2, event1),
+            Transition(state2, state1, event1),
+            Transition(state1, state2, event2),
+        ]
+
+    def test_get(self, transitions):
+        """测试按三元组查找迁移"""
+        index = TransitionIndex(transitions)
+        assert len(index) == 3
+        for transition in transitions:
+            assert index.get(*transition_key(transition)) is transition
+            assert transition_key(transition) in index
+        assert index.get("not", "exist", "key") is None
+
+    def test_transitions_of_event(self, transitions):
+        """测试按事件查找迁移"""
+        index = TransitionIndex(transitions)
+        event1_transitions = index.transitions_of_event(transitions[0].event_id)
+        assert len(event1_transitions) == 2
+        assert transitions[0] in event1_transitions
+        assert transitions[1] in event1_transitions
+        assert index.transitions_of_event(transitions[2].event_id) == [transitions[2]]
+
+    def test_remove(self, transitions):
+        """测试移出索引"""
+        index = TransitionIndex(transitions)
+        assert index.remove(transitions[2])
+        assert not index.remove(transitions[2])
+        assert index.get(*transition_key(transitions[2])) is None
+        assert index.transitions_of_event(transitions[2].event_id) == []
+        assert transitions[2].event_id not in index.d_event_id_keys
+        assert len(index) == 2
+
+    def test_adjacency(self, transitions):
+        """测试出边/入边索引"""
+        index = TransitionIndex(transitions)
+        state1_id = transitions[0].src_state_id
+        state2_id = transitions[0].dst_state_id
+        assert len(index.outgoing_transitions(state1_id)) == 2
+        assert index.incoming_transitions(state1_id) == [transitions[1]]
+        assert len(index.transitions_of_states([state1_id])) == 3
+        assert len(index.transitions_of_states([state1_id, state2_id])) == 3
+
+        index.remove(transitions[1])
+        assert index.incoming_transitions(state1_id) == []
+        assert index.outgoing_transitions(state2_id) == []
+
+    def test_add_duplicate(self, transitions):
+        """测试三元组相同的其他迁移不会覆盖已有的迁移"""
+        index = TransitionIndex(transitions)
+        first = transitions[0]
+        # 同一个迁移重复加入不报错
+        index.add(first)
+        duplicate = Transition(first.src_state, first.dst_state, first.event)
+        with pytest.raises(ValueError):
+            index.add(duplicate)
+        assert index.get(*transition_key(first)) is first
+        assert len(index) == 3
+        with pytest.raises(ValueError):
+            TransitionIndex([first, duplicate])
@@ -0,0 +1,111 @@
+import pytest
+from PyQt5 import QtWidgets
+from pyfcstm.model import CompositeState, NormalState, Statechart
+
+from app.utils.fcstm_state_chart import FcstmStateChart
+from app.utils.undo_history import Delta, UndoHistory
+
+
+class _NoopDelta(Delta):
+    def undo(self, fcstm_state_chart):
+        pass
+
+    def redo(self, fcstm_state_chart):
+        pass
+
+
+@pytest.mark.unittest
+class TestUndoHistory:
+    @pytest.fixture
+    def fcstm_state_chart(self, qtbot):
+        root_state = CompositeState(name="根状态")
+        state1 = NormalState(name="状态1")
+        state2 = NormalState(name="状态2")
+        root_state.states.add(state1)
+        root_state.states.add(state2)
+        state_chart = Statechart(name="测试状态图", root_state=root_state, states=[root_state, state1, state2])
+
+        tree_widget = QtWidgets.QTreeWidget()
+        qtbot.addWidget(tree_widget)
+        return FcstmStateChart(tree_widget, state_chart)
+
+    def test_undo_redo_event(self, fcstm_state_chart):
+        """测试事件的撤销和重做"""
+        fcstm_state_chart.add_event(None, "event", "x > 0")
+        event = fcstm_state_chart.state_chart.events.get_by_name("event")
+        assert fcstm_state_chart.undo()
+        assert fcstm_state_chart.state_chart.events.get_by_name("event") is None
+        assert fcstm_state_chart.get_event(event.id) is None
+        assert fcstm_state_chart.redo()
+        assert fcstm_state_chart.state_chart.events.get_by_name("event") is event
+        assert not fcstm_state_chart.redo()
+
+    def test_merge_consecutive_edits(self, fcstm_state_chart):
+        """测试同一事件的连续修改合并为一步"""
+        fcstm_state_chart.add_event(None, "event", "")
+        fcstm_state_chart.edit_event(None, "event1", "", "event")
+        fcstm_state_chart.edit_event(None, "event2", "x > 0", "event1")
+        fcstm_state_chart.undo()
+        event = fcstm_state_chart.state_chart.events.get_by_name("event")
+        assert event is not None and event.guard == ""
+        fcstm_state_chart.redo()
+        assert event.name == "event2" and event.guard == "x > 0"
+
+    def test_undo_del_state(self, fcstm_state_chart):
+        """测试撤销删除复合状态时恢复子状态和被级联删除的迁移"""
+        state_chart = fcstm_state_chart.state_chart
+        root_state = state_chart.root_state
+        state1 = state_chart.states.get_by_name("状态1")
+        state2 = state_chart.states.get_by_name("状态2")
+        sub_state = CompositeState(name="子状态")
+        fcstm_state_chart.add_state(root_state, sub_state)
+        leaf_state = NormalState(name="叶状态")
+        fcstm_state_chart.add_state(sub_state, leaf_state)
+        fcstm_state_chart.add_event(None, "event", "")
+        event = state_chart.events.get_by_name("event")
+        fcstm_state_chart.add_transition(None, leaf_state, state1, event)
+        fcstm_state_chart.add_transition(None, state2, sub_state, event)
+        fcstm_state_chart.add_transition(None, state1, state2, event)
+
+        fcstm_state_chart.del_state(None, sub_state)
+        assert len(fcstm_state_chart.transition_index) == 1
+        assert fcstm_state_chart.get_tree_item(leaf_state.id) is None
+
+        fcstm_state_chart.undo()
+        assert len(fcstm_state_chart.transition_index) == 3
+        assert fcstm_state_chart.transition_index.get(leaf_state.id, state1.id, event.id) is not None
+        assert fcstm_state_chart.get_state(leaf_state.id) is leaf_state
+        assert fcstm_state_chart.d_id_father_state[leaf_state.id] is sub_state
+        assert fcstm_state_chart.d_id_father_state[sub_state.id] is root_state
+        assert fcstm_state_chart.get_tree_item(leaf_state.id).parent() is fcstm_state_chart.get_tree_item(sub_state.id)
+
+        fcstm_state_chart.redo()
+        assert len(fcstm_state_chart.transition_index) == 1
+        assert sub_state not in state_chart.states
+
+    def test_batch_is_one_step(self, fcstm_state_chart):
+        """测试batch中的修改作为一步撤销"""
+        with fcstm_state_chart.batch():
+            fcstm_state_chart.add_event(None, "event1", "")
+            fcstm_state_chart.add_event(None, "event2", "")
+        fcstm_state_chart.undo()
+        assert len(fcstm_state_chart.state_chart.events) == 0
+        assert not fcstm_state_chart.history.can_undo()
+
+    def test_memory_budget(self):
+        """测试历史记录按内存预算而不是步数丢弃最早的记录"""
+        # 基类没有实现undo和redo，不能直接创建
+        with pytest.raises(TypeError):
+            Delta()
+
+        history = UndoHistory(memory_budget=0)
+        for _ in range(3):
+            history.push(_NoopDelta())
+        assert history.can_undo()
+        assert len(history._undo_stack) == 1
+
+        history = UndoHistory(memory_budget=10 * _NoopDelta().size)
+        for _ in range(20):
+            history.push(_NoopDelta())
+        assert len(history._undo_stack) == 10
+        assert history.memory_usage <= history.memory_budget
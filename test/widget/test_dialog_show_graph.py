@@ -0,0 +1,86 @@
+import os
+
+import pytest
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from app.utils import show_state_graph
+from app.utils.plantuml_daemon import PlantumlRenderCanceled
+from app.widget import dialog_show_graph
+from app.widget.dialog_show_graph import DialogShowGraph
+
+
+def _png_data(width: int, height: int) -> bytes:
+    image = QtGui.QImage(width, height, QtGui.QImage.Format_RGB32)
+    image.fill(QtCore.Qt.white)
+    buffer = QtCore.QBuffer()
+    buffer.open(QtCore.QIODevice.WriteOnly)
+    image.save(buffer, 'PNG')
+    return bytes(buffer.data())
+
+
+def _is_thread_done(thread) -> bool:
+    try:
+        return thread is None or thread.isFinished()
+    except RuntimeError:
+        # 线程结束后已经被deleteLater释放
+        return True
+
+
+@pytest.mark.unittest
+class TestDialogShowGraph:
+    @pytest.fixture
+    def dialog(self, qtbot, monkeypatch):
+        png_data = _png_data(40, 30)
+
+        class _Daemon:
+            def render(self, plantuml_code, cancel_event=None):
+                if 'HANG' in plantuml_code:
+                    cancel_event.wait(10)
+                    raise PlantumlRenderCanceled()
+                return png_data
+
+        monkeypatch.setattr(show_state_graph, 'get_plantuml_daemon', lambda: _Daemon())
+        monkeypatch.setattr(show_state_graph.ShowStateGraph, 'generate_plantuml_statechart',
+                            classmethod(lambda cls, plantuml_code: plantuml_code))
+        # 渲染线程属于父窗口，测试结束前父窗口必须一直存在
+        parent = QtWidgets.QWidget()
+        dialog = DialogShowGraph(parent, "@startuml\n@enduml")
+        yield dialog, png_data
+        dialog.done(0)
+        qtbot.waitUntil(lambda: _is_thread_done(dialog._render_thread), timeout=10000)
+        parent.deleteLater()
+
+    def test_render_in_memory(self, qtbot, dialog, tmp_path, monkeypatch):
+        """测试渲染结果直接在内存中显示，只保留一张图片，导出时写入原始数据"""
+        dialog, png_data = dialog
+        qtbot.waitUntil(lambda: not dialog.is_rendering, timeout=10000)
+        items = dialog.graphics_view_show_graph.scene().items()
+        assert len(items) == 1
+        assert items[0].pixmap().size() == QtCore.QSize(40, 30)
+        assert items[0].sceneBoundingRect().size() == QtCore.QSizeF(80, 60)
+        assert dialog.button_export_graph.isEnabled()
+        assert not os.path.exists(os.path.join(os.path.dirname(dialog_show_graph.__file__), 'temp_state_graph.png'))
+
+        file_path = str(tmp_path / 'graph.png')
+        monkeypatch.setattr(QtWidgets.QFileDialog, 'getSaveFileName', lambda *args, **kwargs: (file_path, ''))
+        dialog.export_graph()
+        with open(file_path, 'rb') as f:
+            assert f.read() == png_data
+
+    def test_cancel_and_rerender(self, qtbot, dialog):
+        """测试取消渲染后可以重新渲染"""
+        dialog, _ = dialog
+        qtbot.waitUntil(lambda: not dialog.is_rendering, timeout=10000)
+        dialog.fcstm_state_chart = "@startuml\nHANG\n@enduml"
+        dialog.show_state_graph()
+        assert dialog.is_rendering
+        assert not dialog.button_export_graph.isEnabled()
+        dialog.cancel_render()
+        qtbot.waitUntil(lambda: not dialog.is_rendering, timeout=10000)
+        assert dialog.button_rerender_graph.isEnabled()
+        assert not dialog.button_export_graph.isEnabled()
+
+        dialog.fcstm_state_chart = "@startuml\n@enduml"
+        dialog.button_rerender_graph.click()
+        qtbot.waitUntil(lambda: not dialog.is_rendering, timeout=10000)
+        assert dialog.button_export_graph.isEnabled()
@@ -39,15 +39,15 @@ class TestMainWindow:
     def test_state_option(self, new_state_chart):
         qtbot, window = new_state_chart
         #获取根状态节点
-        root_item = window.tree_state_machine_all_state.topLevelItem(0)
-        assert root_item is not None
+        root_index = window.tree_state_machine_all_state.model().index(0, 0)
+        assert root_index.isValid()
 
         #模拟右键点击根状态节点
         #pos = window.tree_state_machine_all_state.visualItemRect(root_item).center()
         #print(pos)
         #qtbot.mouseClick(window.tree_state_machine_all_state.viewport(), Qt.RightButton, pos=pos)
         global_pos = window.tree_state_machine_all_state.viewport().mapToGlobal(
-            window.tree_state_machine_all_state.visualItemRect(root_item).center()
+            window.tree_state_machine_all_state.visualRect(root_index).center()
         )
         local_pos = window.mapFromGlobal(global_pos)
 
@@ -99,12 +99,12 @@ class TestMainWindow:
 
         # 8. 验证子状态是否添加成功
         # 检查树中是否有新添加的子状态
-        child_item = root_item.child(0)
-        assert child_item is not None
-        assert child_item.text(0) == "test_add_state"
+        child_index = window.tree_state_machine_all_state.model().index(0, 0, root_index)
+        assert child_index.isValid()
+        assert child_index.data(Qt.DisplayRole) == "test_add_state"
 
         # 检查状态对象是否正确创建
-        child_state = child_item.data(0, Qt.UserRole)
+        child_state = window.fcstm_state_chart.get_state(child_index.data(Qt.UserRole))
         assert child_state is not None
         assert isinstance(child_state, NormalState)
         assert child_state.name == "test_add_state"
@@ -137,3 +137,28 @@ class TestMainWindow:
         assert "".join(window.state_chart.preamble) == ""
         assert window.state_chart.root_state.name == "start2"
 
+
+    def test_import_binary_preview(self, get_window, tmp_path):
+        """测试导入二进制文件期间按需显示只读预览，导入完成后换回可编辑的模型"""
+        from app.utils.binary_statechart import BinaryStatechartView, write_binary_statechart
+        from pyfcstm.model import Statechart
+
+        qtbot, window = get_window
+        root_state = CompositeState(name="根状态")
+        state = NormalState(name="A")
+        root_state.states.add(state)
+        file_path = str(tmp_path / 'state_chart.fcstmb')
+        write_binary_statechart(Statechart(name="二进制", root_state=root_state, states=[root_state, state]),
+                                file_path)
+
+        window._start_import(file_path)
+        preview_model = window.tree_state_machine_all_state.model()
+        assert isinstance(preview_model.fcstm_state_chart, BinaryStatechartView)
+        assert window.stackedWidget_state_machine.currentIndex() == 1
+        preview_model.fetchMore(QtCore.QModelIndex())
+        assert preview_model.index(0, 0).data(Qt.DisplayRole) == "根状态"
+
+        qtbot.waitUntil(lambda: window._import_worker is None, timeout=10000)
+        assert window.tree_state_machine_all_state.model() is window.state_tree_model
+        assert window._import_preview_reader is None
+        assert window.fcstm_state_chart.state_chart.name == "二进制"